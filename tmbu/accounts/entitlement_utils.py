@@ -0,0 +1,83 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+from django.conf import settings
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from solutions.cache_utils import cache_get_or_set, acache_get_or_set, bump_namespace_on_commit
+from payments.models import UserSubscription
+from .models import UserFreeTrial, UserFreeTrialQuickSolution, UserFreeTrialScenarioMining
+
+
+# What a user may use, computed once from the active subscription and the three free trials and cached:
+#   {"subscribed": bool, "free_trials": {product: True while uses are left}}
+# Each user has a cache namespace (solutions.cache_utils). Stripe webhooks, free trial saves and free use
+# counts bump its version, so the next request of any process recomputes.
+
+FREE_TRIAL_MODELS = {
+    "scenario_process": UserFreeTrial,
+    "quick_solution": UserFreeTrialQuickSolution,
+    "scenario_mining": UserFreeTrialScenarioMining,
+}
+
+MAX_FREE_USES = 20  # uses of each free trial, counted by the views and the advice jobs
+
+
+def _namespace(user_id):
+    return f"entitlements:{user_id}"
+
+
+def compute_entitlements(user_id):
+    """Two queries: the active subscription and the free trials left (one UNION of the three tables)."""
+    subscribed = UserSubscription.objects.filter(user_id=user_id, subscription_status="active").exists()
+
+    trials = [
+        model.objects.filter(user_id=user_id, has_used_free_trial=False).annotate(product=Value(product, output_field=CharField())).values_list("product", flat=True)
+        for product, model in FREE_TRIAL_MODELS.items()
+    ]
+    left = set(trials[0].union(*trials[1:], all=True))
+    return {"subscribed": subscribed, "free_trials": {product: product in left for product in FREE_TRIAL_MODELS}}
+
+
+def get_entitlements(user):
+    return cache_get_or_set(_namespace(user.pk), ["rights"], lambda: compute_entitlements(user.pk), settings.ENTITLEMENT_CACHE_SECONDS, saves=2)
+
+
+async def aget_entitlements(user):
+    return await acache_get_or_set(_namespace(user.pk), ["rights"], sync_to_async(lambda: compute_entitlements(user.pk)), settings.ENTITLEMENT_CACHE_SECONDS, saves=2)
+
+
+def invalidate_entitlements(user_id):
+    """Recompute on the next request, once the current transaction commits."""
+    bump_namespace_on_commit(_namespace(user_id))
+
+
+def can_use(entitlements, product):
+    return bool(entitlements) and (entitlements["subscribed"] or entitlements["free_trials"].get(product, False))
+
+
+def charges_free_use(entitlements, product):
+    """A use is counted against the free trial only without a subscription."""
+    return bool(entitlements) and not entitlements["subscribed"] and entitlements["free_trials"].get(product, False)
+
+
+def count_free_use(product, user_id, max_free_uses):
+    """
+    Count one free use in a single UPDATE, so parallel submissions never lose one or pass the limit.
+    The trial is marked used by the same statement that counts the last use.
+    """
+    last_use = Q(scenario_creation_attempts__gte=max_free_uses - 1)  # evaluated on the row before the update
+    counted = FREE_TRIAL_MODELS[product].objects.filter(user_id=user_id, has_used_free_trial=False).update(
+        scenario_creation_attempts=F("scenario_creation_attempts") + 1,
+        has_used_free_trial=Case(When(last_use, then=Value(True)), default=Value(False)),
+        used_at=Case(When(last_use, then=Value(timezone.now())), default=F("used_at")),
+    )
+    if counted:
+        invalidate_entitlements(user_id)
+    return counted > 0
@@ -12,6 +12,7 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import Profile, UserFreeTrial, UserFreeTrialScenarioMining, UserFreeTrialQuickSolution
+from .entitlement_utils import invalidate_entitlements
 
 
 #Create a user profile when a new user is created and active
@@ -37,5 +38,12 @@ def create_free_trial_for_new_user(sender, instance, created, **kwargs):
     if created:
         UserFreeTrial.objects.create(user=instance.user)
         UserFreeTrialQuickSolution.objects.create(user=instance.user)
-        UserFreeTrialScenarioMining.objects.create(user=instance.user)  
-        
+        UserFreeTrialScenarioMining.objects.create(user=instance.user)
+
+
+#Recompute the cached entitlements when a free trial is created or changed (accounts.entitlement_utils)
+@receiver(post_save, sender=UserFreeTrial)
+@receiver(post_save, sender=UserFreeTrialQuickSolution)
+@receiver(post_save, sender=UserFreeTrialScenarioMining)
+def invalidate_entitlements_on_free_trial_change(sender, instance, **kwargs):
+    invalidate_entitlements(instance.user_id)
@@ -10,7 +10,10 @@ done
 echo "Milvus is up!"
 
 python3 manage.py migrate
+python3 manage.py createcachetable  # for CACHE_BACKEND=db
 python3 manage.py load_milvus_collection
 
 # Start your Django app (change "yourproject" to your Django project name!)
-exec gunicorn --config tmbu/gunicorn.conf.py tmbu.wsgi:application 
+# The threaded WSGI app; the async views run in the app-async service of docker-compose (tmbu.asgi with
+# GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker), to which nginx routes their paths
+exec gunicorn --config tmbu/gunicorn.conf.py ${GUNICORN_APP:-tmbu.wsgi:application} 
@@ -16,6 +16,7 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from .models import UserSubscription
 from accounts.models import Profile, UserFreeTrial
+from accounts.entitlement_utils import invalidate_entitlements
 from solutions.models import Scenario
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -288,6 +289,7 @@ def handle_checkout_session_completed(session):
                 # created_at=timezone.now(),
                 # updated_at=timezone.now(),
         )
+        invalidate_entitlements(user.pk)
         logger.info(f"Created new subscription for user {user.username} (ID: {user_id}).")
     except Exception as e:
         logger.error(f"Error creating new subscription for user {user.username} (ID: {user_id}): {e}")
@@ -345,6 +347,7 @@ def handle_invoice_payment_failed(invoice):
             user_subscription = UserSubscription.objects.get(subscription_id=subscription_id)
             user_subscription.subscription_status = 'canceled'  # Suspend the subscription
             user_subscription.save()
+            invalidate_entitlements(user_subscription.user_id)
             logger.info(f"UserSubscription status updated to 'canceled' for subscription_id: {subscription_id}")
             return  # Success
 
@@ -372,6 +375,7 @@ def handle_subscription_deleted(subscription):
     
         user_subscription.subscription_status = status
         user_subscription.save(update_fields=["subscription_status"])
+        invalidate_entitlements(user_subscription.user_id)
 
         logger.info(f"Subscription {subscription_id} canceled for user {user_subscription.user.username}.")
 
@@ -11,10 +11,11 @@ Unauthorized copying, distribution, or modification of this software is strictly
 import os
 import logging
 from django.contrib import admin
-from .models import Scenario, CorekbUpload, ScenarioForMining, ScenarioActors, ScenarioDynamics, ScenarioNeeds, ScenarioSkillsResources, ScenarioAnalysisPrediction, ScenarioQuickSolution, Actors, IndividualTraits, GroupTraits, IndividualProfile, GroupProfile, Interactions, InteractionRelations, GlobalActorsProfiles, SocialNetworkGraphCache, GeneratedSimulation, LiveSimulation
+from .models import Scenario, CorekbUpload, ScenarioForMining, ScenarioActors, ScenarioDynamics, ScenarioNeeds, ScenarioSkillsResources, ScenarioAnalysisPrediction, ScenarioQuickSolution, Actors, IndividualTraits, GroupTraits, IndividualProfile, GroupProfile, Interactions, InteractionRelations, GlobalActorsProfiles, SocialNetworkGraphCache, GeneratedSimulation, LiveSimulation, OpenAIRateLimitBucket, LLMBatchJob, LLMBatchRequest, LLMOutputParseStats, LLMUsageRecord, SingleflightLease, ScenarioArtifact, SpeculativeFactorAdvice, AdviceJob, ScenarioPipelineStatus
 from django.contrib import messages
 from .corekb_milvus_setup_utils import process_text, generate_insert_kb_embeddings_into_milvus
 from .milvus_connection_utils import ensure_connection
+from .llm_ledger_utils import feature_latency_summary, daily_token_totals
 from django.http import HttpResponseRedirect
 from django.urls import path
 from django.utils.html import format_html
@@ -43,8 +44,93 @@ admin.site.register(GlobalActorsProfiles)
 admin.site.register(SocialNetworkGraphCache)
 admin.site.register(GeneratedSimulation)
 admin.site.register(LiveSimulation)
+admin.site.register(OpenAIRateLimitBucket)
+admin.site.register(LLMBatchJob)
+admin.site.register(LLMBatchRequest)
 
 
+@admin.register(ScenarioArtifact)
+class ScenarioArtifactAdmin(admin.ModelAdmin):
+    list_display = ('scenario_type', 'scenario_id', 'user', 'query_mode', 'reuse_count', 'created_at', 'last_used_at')
+    list_filter = ('scenario_type', 'query_mode')
+    readonly_fields = ('input_hash',)
+    exclude = ('query_embeddings',)
+
+
+@admin.register(ScenarioPipelineStatus)
+class ScenarioPipelineStatusAdmin(admin.ModelAdmin):
+    list_display = ('scenario', 'user', 'actors_status', 'dynamics_status', 'needs_status', 'skills_resources_status', 'analysis_prediction_status', 'version', 'updated_at')
+    list_filter = ('actors_status', 'analysis_prediction_status')
+    date_hierarchy = 'updated_at'
+    list_select_related = ('scenario', 'user')
+
+
+@admin.register(AdviceJob)
+class AdviceJobAdmin(admin.ModelAdmin):
+    list_display = ('job_id', 'kind', 'scenario_id', 'user', 'status', 'progress', 'free_use_counted', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('job_id', 'scenario_id')
+    date_hierarchy = 'created_at'
+
+
+@admin.register(SpeculativeFactorAdvice)
+class SpeculativeFactorAdviceAdmin(admin.ModelAdmin):
+    list_display = ('scenario', 'user', 'status', 'outcome', 'similarity', 'cost_usd', 'compute_seconds', 'created_at', 'used_at')
+    list_filter = ('status', 'outcome', 'query_mode')
+    date_hierarchy = 'created_at'
+    list_select_related = ('scenario', 'user')
+
+
+@admin.register(SingleflightLease)
+class SingleflightLeaseAdmin(admin.ModelAdmin):
+    list_display = ('name', 'key', 'status', 'owner', 'expires_at', 'completed_at')
+    list_filter = ('name', 'status')
+
+
+
+@admin.register(LLMOutputParseStats)
+class LLMOutputParseStatsAdmin(admin.ModelAdmin):
+    list_display = ('helper', 'calls', 'parse_failures', 'parse_failure_rate', 'repair_attempts', 'repair_success_rate', 'last_failure_at')
+    readonly_fields = ('helper', 'calls', 'parse_failures', 'repair_attempts', 'repair_successes', 'last_error', 'last_failure_at')
+
+    def parse_failure_rate(self, obj):
+        return f"{obj.parse_failures / obj.calls:.1%}" if obj.calls else "-"
+
+    def repair_success_rate(self, obj):
+        return f"{obj.repair_successes / obj.repair_attempts:.1%}" if obj.repair_attempts else "-"
+
+
+@admin.register(LLMUsageRecord)
+class LLMUsageRecordAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/solutions/llmusagerecord/change_list.html'
+    list_display = ('created_at', 'feature', 'helper', 'source', 'user', 'model', 'prompt_tokens', 'cached_tokens', 'completion_tokens', 'latency_seconds', 'cost_usd', 'outcome')
+    list_filter = ('feature', 'helper', 'outcome', 'model')
+    search_fields = ('request_id', 'task_id', 'source')
+    date_hierarchy = 'created_at'
+    list_select_related = ('user',)
+
+    # The ledger is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    # Per-feature p50/p95 latency and daily token totals for the current filters
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context=extra_context)
+        try:
+            queryset = response.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            return response
+
+        response.context_data['feature_summary'] = feature_latency_summary(queryset)
+        response.context_data['daily_totals'] = daily_token_totals(queryset)
+        return response
+
 
 #@ensure_connection
 @admin.register(CorekbUpload)
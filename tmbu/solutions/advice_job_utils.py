@@ -0,0 +1,206 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone, translation
+from .scenario_workflow_utils import apply_if_unchanged
+from .event_stream_utils import publish_user_event
+from .llm_ledger_utils import update_llm_call_context
+
+logger = logging.getLogger(__name__)
+
+
+# Advice generation of the comprehensive and quick solution views, and the info extraction of experience
+# mining, as Celery jobs. The view saves the submission and enqueues an AdviceJob; a worker generates the
+# advice and applies it like the views did (solutions.scenario_workflow_utils); the page polls
+# advice_job_status_view until the job ends.
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# kind -> (model name, input field, result field, submission counter, free trial product)
+# An experience mining result is saved to the actor and interaction tables (solutions.scenario_mining_utils)
+ADVICE_TARGETS = {
+    "element_advice": ("Scenario", "scenario_input", "scenario_element_advice", "scenario_form_submission_count", "scenario_process"),
+    "factor_advice": ("Scenario", "scenario_input", "scenario_factor_advice", "scenario_form_submission_count", "scenario_process"),
+    "solution_advice": ("Scenario", "scenario_solution_input", "scenario_solution_advice", "solution_form_submission_count", None),
+    "quick_solution": ("ScenarioQuickSolution", "scenario_input", "scenario_quick_solution", "scenario_form_submission_count", "quick_solution"),
+    "scenario_mining": ("ScenarioForMining", "scenario_input", None, "scenario_form_submission_count", "scenario_mining"),
+}
+
+# Kinds whose view counts the submission when it enqueues the job; a failed job gives it back
+COUNTED_ON_SUBMIT = ("element_advice", "factor_advice", "solution_advice")
+
+
+def _scenario_model(kind):
+    from . import models
+    return getattr(models, ADVICE_TARGETS[kind][0])
+
+
+def generate_advice(kind, scenario):
+    """Run the LLM helper for the job kind on the scenario's current input."""
+    from .milvus_llm_utils import generate_element_advice, generate_factor_advice, generate_solution_advice, generate_quick_solution, extract_info_from_scenario
+    from .factor_query_utils import get_factor_query_mode
+    from .speculation_utils import take_speculative_factor_advice
+
+    if kind == "element_advice":
+        return generate_element_advice(scenario.scenario_input)
+    if kind == "factor_advice":
+        query_mode = get_factor_query_mode("scenario_process")
+        return (
+            take_speculative_factor_advice(scenario, scenario.scenario_input, query_mode)
+            or generate_factor_advice(scenario.scenario_input, query_mode=query_mode, scenario=scenario)
+        )
+    if kind == "solution_advice":
+        return generate_solution_advice(scenario.scenario_solution_input)
+    if kind == "quick_solution":
+        return generate_quick_solution(scenario.scenario_input, query_mode=get_factor_query_mode("scenario_quick_solution"), scenario=scenario)
+    if kind == "scenario_mining":
+        return extract_info_from_scenario(scenario.scenario_input)
+    raise ValueError(f"Unknown advice job kind: {kind}")
+
+
+def apply_advice(kind, scenario_pk, input_text, advice, submission_count=None):
+    """Write the advice if the input it was generated for is still current. Returns False when it was dropped."""
+    from .scenario_mining_utils import apply_extracted_info
+
+    _, input_field, result_field, counter_field, _ = ADVICE_TARGETS[kind]
+
+    if kind == "scenario_mining":
+        # The input is only saved with its extracted info, unless a parallel submission was applied first
+        return apply_extracted_info(scenario_pk, input_text, submission_count, advice)
+    if kind == "quick_solution":
+        # Regenerated on every submission
+        return apply_if_unchanged(
+            _scenario_model(kind), scenario_pk,
+            {input_field: input_text},
+            {result_field: advice, counter_field: F(counter_field) + 1, "scenario_submitted": True},
+        )
+    return apply_if_unchanged(_scenario_model(kind), scenario_pk, {f"{result_field}__isnull": True, input_field: input_text}, {result_field: advice})
+
+
+def enqueue_advice_job(kind, scenario, charge_free_use):
+    """Create the job and start it once the caller's transaction commits. A double click joins the active job."""
+    from .models import AdviceJob
+    from .tasks import run_advice_job_task
+
+    _, input_field, _, counter_field, _ = ADVICE_TARGETS[kind]
+    try:
+        with transaction.atomic():
+            job = AdviceJob.objects.create(
+                user_id=scenario.user_id,
+                kind=kind,
+                scenario_id=scenario.pk,
+                input_text=getattr(scenario, input_field),
+                submission_count=getattr(scenario, counter_field),
+                charge_free_use=charge_free_use,
+                language=translation.get_language() or "",
+            )
+    except IntegrityError:
+        return AdviceJob.objects.filter(kind=kind, scenario_id=scenario.pk, status__in=ACTIVE_STATUSES).first()
+
+    transaction.on_commit(lambda: run_advice_job_task.apply_async(args=[str(job.pk)], queue=settings.ADVICE_JOB_QUEUE))
+    return job
+
+
+def fail_advice_job(job, error):
+    """Mark the job failed and give the submission back, so the user can submit again."""
+    from .models import AdviceJob
+
+    failed = AdviceJob.objects.filter(pk=job.pk, status__in=ACTIVE_STATUSES).update(
+        status="failed", progress="failed", error=error, finished_at=timezone.now()
+    )
+    if not failed:
+        return False
+
+    counter_field = ADVICE_TARGETS[job.kind][3]
+    if job.kind in COUNTED_ON_SUBMIT:
+        apply_if_unchanged(_scenario_model(job.kind), job.scenario_id, {counter_field: job.submission_count}, {counter_field: job.submission_count - 1})
+    logger.warning(f"Advice job {job.pk} ({job.kind}, scenario {job.scenario_id}) failed: {error}")
+    publish_user_event(job.user_id, "advice_job", {"job_id": str(job.pk), "status": "failed"})
+    return True
+
+
+def expire_stale_advice_jobs(jobs):
+    """Fail jobs queued or running for longer than ADVICE_JOB_STALE_SECONDS (e.g. their worker died)."""
+    cutoff = timezone.now() - timedelta(seconds=settings.ADVICE_JOB_STALE_SECONDS)
+    for job in jobs:
+        if job.status in ACTIVE_STATUSES and job.created_at < cutoff and fail_advice_job(job, "Timed out"):
+            job.status = "failed"
+
+
+def latest_advice_job(kinds, scenario_id, user):
+    from .models import AdviceJob
+
+    if scenario_id is None:
+        return None
+    job = AdviceJob.objects.filter(kind__in=kinds, scenario_id=scenario_id, user=user).order_by("-created_at").first()
+    if job is not None:
+        expire_stale_advice_jobs([job])
+    return job
+
+
+def run_advice_job(job_id):
+    """Body of run_advice_job_task. Runs each job at most once, also when the task is delivered twice."""
+    from .models import AdviceJob
+
+    if not AdviceJob.objects.filter(pk=job_id, status="queued").update(status="running", progress="generating", started_at=timezone.now()):
+        return "not queued"
+    job = AdviceJob.objects.get(pk=job_id)
+
+    # The task only gets the job id: attribute its OpenAI calls to the job's user, and write the advice
+    # in the language of the request that submitted it
+    update_llm_call_context(user_id=job.user_id)
+    with translation.override(job.language or settings.LANGUAGE_CODE):
+        return _run_claimed_advice_job(job)
+
+
+def _run_claimed_advice_job(job):
+    from .models import AdviceJob
+    from .speculation_utils import schedule_factor_advice_speculation
+    from .factor_query_utils import get_factor_query_mode
+    from accounts.entitlement_utils import count_free_use, MAX_FREE_USES
+
+    scenario = _scenario_model(job.kind).objects.filter(pk=job.scenario_id).first()
+    if scenario is None:
+        fail_advice_job(job, "Scenario deleted")
+        return "failed"
+
+    if job.kind == "scenario_mining":
+        # An edited experience is extracted from the job's input; the scenario keeps the submitted one until then
+        scenario.scenario_input = job.input_text
+
+    try:
+        advice = generate_advice(job.kind, scenario)
+    except Exception as e:
+        fail_advice_job(job, f"{type(e).__name__}: {e}")
+        return "failed"
+
+    with transaction.atomic():
+        # An expired job's late result is dropped
+        if not AdviceJob.objects.filter(pk=job.pk, status="running").update(progress="saving"):
+            return "expired"
+
+        applied = apply_advice(job.kind, scenario.pk, job.input_text, advice, job.submission_count)
+        AdviceJob.objects.filter(pk=job.pk).update(status="succeeded" if applied else "superseded", progress="done", finished_at=timezone.now())
+        publish_user_event(job.user_id, "advice_job", {"job_id": str(job.pk), "status": "succeeded" if applied else "superseded"})
+        if not applied:
+            return "superseded"
+
+        # The flag is claimed in the same transaction as the count, so retries never count twice
+        if job.charge_free_use and AdviceJob.objects.filter(pk=job.pk, free_use_counted=False).update(free_use_counted=True):
+            count_free_use(ADVICE_TARGETS[job.kind][4], job.user_id, MAX_FREE_USES)
+
+        if job.kind == "element_advice":
+            # Start on the factor advice while the user reads the element advice
+            scenario.scenario_element_advice = advice
+            schedule_factor_advice_speculation(scenario, get_factor_query_mode("scenario_process"))
+    return "succeeded"
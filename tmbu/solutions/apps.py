@@ -13,8 +13,9 @@ class SolutionsConfig(AppConfig):
     name = 'solutions'
 
     def ready(self):
-        #import solutions.signals
-        pass
+        # Import the signals module to connect the signals
+        import solutions.signals
+        import solutions.db_connection_utils  # noqa: F401 -- connects the connection usage counters
 
         
 
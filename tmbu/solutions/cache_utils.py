@@ -0,0 +1,104 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from .request_stats_utils import record_saved_queries
+
+
+# Namespaced, versioned cache entries on the two tiers of settings.CACHES:
+#   "default"  shared by all processes (Redis, or the database/file stand-ins)
+#   "local"    per process, in front of the shared tier for hot values (local_timeout)
+# A key is namespace:part:part..., stored under the namespace's current version. bump_namespace() moves
+# the namespace to a new version, so every entry in it is invalidated at once without finding its keys.
+# Local entries are keyed by the version too, so they miss after a bump as soon as the version is read.
+# None is never cached; compute functions return something else for "nothing".
+
+SHARED = "default"
+LOCAL = "local"
+DATABASE_CACHE = "django.core.cache.backends.db.DatabaseCache"
+
+
+def make_key(namespace, *parts):
+    return ":".join([namespace, *(str(part) for part in parts)])
+
+
+def saves_queries(alias=SHARED):
+    """A hit on the tier saves queries only when it is not itself a database table (CACHE_BACKEND=db)."""
+    return settings.CACHES[alias]["BACKEND"] != DATABASE_CACHE
+
+
+def namespace_version(namespace):
+    return caches[SHARED].get_or_set(make_key("version", namespace), 1, None)
+
+
+async def anamespace_version(namespace):
+    return await caches[SHARED].aget_or_set(make_key("version", namespace), 1, None)
+
+
+def bump_namespace(namespace):
+    try:
+        caches[SHARED].incr(make_key("version", namespace))
+    except ValueError:  # no version yet: nothing cached in the namespace
+        pass
+
+
+def bump_namespace_on_commit(namespace):
+    """Invalidate after the current transaction commits, so no request re-caches the state it replaces."""
+    transaction.on_commit(lambda: bump_namespace(namespace))
+
+
+def cache_get(namespace, *parts):
+    return caches[SHARED].get(make_key(namespace, *parts), version=namespace_version(namespace))
+
+
+def cache_set(namespace, parts, value, timeout=None):
+    caches[SHARED].set(make_key(namespace, *parts), value, timeout or settings.CACHE_DEFAULT_TIMEOUT, version=namespace_version(namespace))
+
+
+def cache_get_or_set(namespace, parts, compute, timeout=None, local_timeout=None, saves=1):
+    """
+    The cached value of namespace:parts, else compute() stored on the shared tier (and on the local tier
+    for local_timeout seconds when given). `saves` is the number of queries compute() runs, counted as
+    saved on a hit unless the shared tier is the database.
+    """
+    version = namespace_version(namespace)
+    key = make_key(namespace, *parts)
+
+    value = caches[LOCAL].get(key, version=version) if local_timeout else None
+    if value is None:
+        value = caches[SHARED].get(key, version=version)
+        if value is None:
+            value = compute()
+            caches[SHARED].set(key, value, timeout or settings.CACHE_DEFAULT_TIMEOUT, version=version)
+            saves = 0
+        if local_timeout:
+            caches[LOCAL].set(key, value, local_timeout, version=version)
+    if saves_queries():
+        record_saved_queries(saves)
+    return value
+
+
+async def acache_get_or_set(namespace, parts, acompute, timeout=None, local_timeout=None, saves=1):
+    """cache_get_or_set for async views; acompute is a coroutine function."""
+    version = await anamespace_version(namespace)
+    key = make_key(namespace, *parts)
+
+    value = await caches[LOCAL].aget(key, version=version) if local_timeout else None
+    if value is None:
+        value = await caches[SHARED].aget(key, version=version)
+        if value is None:
+            value = await acompute()
+            await caches[SHARED].aset(key, value, timeout or settings.CACHE_DEFAULT_TIMEOUT, version=version)
+            saves = 0
+        if local_timeout:
+            await caches[LOCAL].aset(key, value, local_timeout, version=version)
+    if saves_queries():
+        record_saved_queries(saves)
+    return value
@@ -0,0 +1,14 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+from .event_stream_utils import event_stream_enabled
+
+
+# Pages only open the push channel (solutions/js/user_events.js) when it is served
+def event_stream(request):
+    return {"event_stream_enabled": event_stream_enabled() and request.user.is_authenticated}
@@ -17,6 +17,7 @@ from nltk.tokenize import sent_tokenize
 from pymilvus import MilvusClient, connections, db, Collection, CollectionSchema, FieldSchema, DataType
 from .milvus_llm_utils import generate_embeddings
 from .milvus_connection_utils import ensure_milvus_connection, ensure_connection
+from .kb_language_utils import kb_collection_name, detect_language
 from functools import wraps
 from django.conf import settings
 
@@ -29,7 +30,7 @@ def clean_text(text):
         raise ValueError("Input must be a string")
 
     text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-    text = re.sub(r"[^a-zA-Z0-9\s,.!?'-]", '', text)  # Remove special characters (you can adjust this based on requirements)
+    text = re.sub(r"[^a-zA-Z0-9\s,.!?'\-\u4e00-\u9fff\u3400-\u4dbf\u3000-\u303f\uff00-\uffef]", '', text)  # Remove special characters, keeping Chinese text and punctuation
     text = text.strip()  # Remove leading/trailing whitespace
     return text
 
@@ -39,6 +40,8 @@ def chunk_text(text, max_length=550):
         raise ValueError("Input must be a string")
 
     sentences = sent_tokenize(text)  # Split text into sentences
+    # sent_tokenize does not know the Chinese sentence ends
+    sentences = [part for sentence in sentences for part in re.split(r"(?<=[。！？])", sentence) if part.strip()]
     chunks = []
     current_chunk = ""
     
@@ -84,13 +87,15 @@ def process_text(file_path):
       
 # Function to create a collection in Milvus (for both development and production);uncomment later.
 @ensure_connection
-def create_milvus_kb_collection(milvus_client=None):
+def create_milvus_kb_collection(collection_name=None, partition_by_language=None, milvus_client=None):
     if milvus_client is None:
         raise ConnectionError("Milvus client not provided by decorator.") # Safeguard
     
     #milvus_client = ensure_milvus_connection()
     
-    collection_name = "kb_embeddings_collection"
+    collection_name = collection_name or kb_collection_name()
+    if partition_by_language is None:
+        partition_by_language = collection_name == settings.KB_PARTITIONED_COLLECTION_NAME
 
     existing_collections = milvus_client.list_collections()
 
@@ -110,11 +115,15 @@ def create_milvus_kb_collection(milvus_client=None):
         schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
         schema.add_field(field_name="factor_vector", datatype=DataType.FLOAT_VECTOR, dim=384)
         schema.add_field(field_name="factor_text", datatype=DataType.VARCHAR, max_length=2000)
+        if partition_by_language:
+            # Searches filtered on the language only scan the partitions holding it
+            schema.add_field(field_name="language", datatype=DataType.VARCHAR, max_length=16, is_partition_key=True)
 
         # Create collection
         milvus_client.create_collection(
         collection_name=collection_name, 
         schema=schema, 
+        **({"num_partitions": 16} if partition_by_language else {}),
         )
 
         print(f"Collection '{collection_name}' created successfully!")
@@ -170,7 +179,8 @@ def generate_insert_kb_embeddings_into_milvus(cleaned_factor_texts, milvus_clien
         #ids = [generate_uuid() for _ in range(len(cleaned_factor_texts))]
     
         #step 3: create collection if it doesn't exist
-        create_milvus_kb_collection()
+        collection_name = kb_collection_name()
+        create_milvus_kb_collection(collection_name)
 
         #step 4: load the collection (not necessary for data insertion, only required for search/query)
         #milvus_client.load_collection("kb_embeddings_collection")
@@ -179,16 +189,17 @@ def generate_insert_kb_embeddings_into_milvus(cleaned_factor_texts, milvus_clien
         data_to_insert = [{
                 # "id":i,
                 "factor_vector": kb_embeddings[i], # List of embeddings
-                "factor_text": cleaned_factor_texts[i] # List of original text paragraphs
+                "factor_text": cleaned_factor_texts[i], # List of original text paragraphs
+                "language": detect_language(cleaned_factor_texts[i], default="en"), # partition key, or a dynamic field in the flat collection
         }
         for i in range(len(kb_embeddings))
         ]
    
         
         #step 6: insert the data into the collection
-        milvus_client.insert("kb_embeddings_collection", data_to_insert)
+        milvus_client.insert(collection_name, data_to_insert)
     
-        logging.info(f"Inserted {len(cleaned_factor_texts)} records into 'kb_embeddings_collection'")
+        logging.info(f"Inserted {len(cleaned_factor_texts)} records into '{collection_name}'")
 
     except Exception as e:
         logging.error(f"Error during Milvus insertion: {e}")
@@ -0,0 +1,120 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import os
+import time
+import threading
+from celery.signals import task_prerun
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Database connection usage of this process. Web processes borrow connections from a psycopg pool per alias
+# (settings.DB_POOL_ENABLED): pool_stats() has its size and how long requests waited for a connection. Celery
+# processes keep persistent connections (settings.DB_CONN_MAX_AGE): the counters below count the connections
+# opened and the tasks that started on an already open one; a reuse ratio near 1 means tasks no longer pay for
+# a Postgres connect. The Postgres side is in postgres_backend_stats().
+
+_stats_lock = threading.Lock()
+_stats = {}
+_started_at = time.time()
+
+
+def _alias_stats(alias):
+    return _stats.setdefault(alias, {"opened": 0, "units": 0, "reused": 0})
+
+
+@receiver(connection_created)
+def count_opened_connection(sender, connection, **kwargs):
+    with _stats_lock:
+        _alias_stats(connection.alias)["opened"] += 1
+
+
+def _count_unit_of_work(**kwargs):
+    # Runs after Django (request_started) or Celery (task_prerun) closed the obsolete connections; a pooled
+    # connection is always back in its pool by then, so only persistent ones count as reused
+    with _stats_lock:
+        for alias in connections:
+            stats = _alias_stats(alias)
+            stats["units"] += 1
+            stats["reused"] += connections[alias].connection is not None
+
+
+request_started.connect(_count_unit_of_work, dispatch_uid="db_connection_units_request")
+task_prerun.connect(_count_unit_of_work, dispatch_uid="db_connection_units_task", weak=False)
+
+
+def connection_budget():
+    """
+    Postgres backends this deployment keeps open at most, by source (settings, "Database connections"):
+    the threaded web app, the async app with its event stream listeners, and Celery; each per alias.
+    """
+    aliases = len(settings.DATABASES)
+    web = settings.GUNICORN_WORKERS * settings.GUNICORN_THREADS * aliases
+    listeners = 1 if settings.EVENT_STREAM_ENABLED and settings.EVENT_STREAM_BACKEND == "postgres" else 0
+    async_web = settings.GUNICORN_ASYNC_WORKERS * (settings.DB_ASYNC_POOL_MAX_SIZE * aliases + listeners)
+    celery = settings.CELERY_WORKER_CONCURRENCY * aliases
+    return {"aliases": list(settings.DATABASES), "web": web, "async": async_web, "celery": celery, "total": web + async_web + celery}
+
+
+def pool_stats(alias):
+    """Size and wait metrics of the alias' connection pool in this process, None without a pool."""
+    pool = connections[alias].pool
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    queued = stats.get("requests_queued", 0)
+    stats["avg_wait_ms"] = round(stats.get("requests_wait_ms", 0) / queued, 1) if queued else 0.0
+    return stats
+
+
+def connection_stats():
+    """This process's counters and pools, for the ops endpoint and the benchmark."""
+    with _stats_lock:
+        aliases = {alias: dict(stats) for alias, stats in _stats.items()}
+    for alias, stats in aliases.items():
+        stats["reuse_ratio"] = round(stats["reused"] / stats["units"], 3) if stats["units"] else None
+    for alias in connections:
+        aliases.setdefault(alias, {})["pool"] = pool_stats(alias)
+    return {
+        "pid": os.getpid(),
+        "role": settings.DB_PROCESS_ROLE,
+        "pooled": settings.DB_POOL_ENABLED,
+        "conn_max_age": settings.DB_CONN_MAX_AGE,
+        "uptime_seconds": round(time.time() - _started_at),
+        "aliases": aliases,
+    }
+
+
+def reset_connection_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def postgres_backend_stats():
+    """
+    Backends of this database by application name (tmbu-web, tmbu-async, tmbu-async-events, tmbu-celery)
+    and state, against max_connections and the budget.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW max_connections")
+        max_connections = int(cursor.fetchone()[0])
+        cursor.execute(
+            "SELECT coalesce(application_name, ''), coalesce(state, ''), count(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() GROUP BY 1, 2 ORDER BY 1, 2"
+        )
+        backends = [{"application_name": name, "state": state, "count": count} for name, state, count in cursor.fetchall()]
+    return {
+        "max_connections": max_connections,
+        "total": sum(backend["count"] for backend in backends),
+        "backends": backends,
+        "budget": connection_budget(),
+    }
@@ -0,0 +1,210 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+# Per-user push channel. Tasks and views call publish_user_event(); user_events_view streams the events of the
+# logged-in user as Server-Sent Events. Events only say that something changed (a mining section, an advice job,
+# the social graph): the page then fetches the data from its usual endpoint, so a missed event costs nothing but
+# the wait for the next fallback poll.
+#
+# Backends (EVENT_STREAM_BACKEND):
+#   postgres: NOTIFY on the default database, no extra service; one listening connection per process
+#   redis:    pub/sub on EVENT_STREAM_REDIS_URL
+#   memory:   in-process queues, for tests and runserver with eager Celery
+
+
+def event_stream_enabled():
+    return getattr(settings, "EVENT_STREAM_ENABLED", False)
+
+
+def user_channel(user_id):
+    return f"user_events_{int(user_id)}"
+
+
+def publish_user_event(user_id, event, data=None):
+    """Publish `event` to the user's open pages. Never raises: push is best effort."""
+    if not event_stream_enabled() or not user_id:
+        return
+    payload = json.dumps({"event": event, "data": data or {}}, ensure_ascii=False)
+
+    # Sent once the change it announces is committed, so the page's refetch sees it
+    def publish():
+        try:
+            _backend().publish(user_channel(user_id), payload)
+        except Exception as e:
+            logger.warning(f"Could not publish {event} to user {user_id}: {e}")
+
+    transaction.on_commit(publish)
+
+
+class MemoryEventBackend:
+    """One process only. Subscribers are asyncio queues, fed thread-safely from sync publishers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}  # channel -> {(loop, queue)}
+
+    def publish(self, channel, payload):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, payload)
+
+    async def listen(self, channel, timeout):
+        """Yield payloads; yield None after `timeout` seconds without one (heartbeat)."""
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(entry)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(entry[1].get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self.lock:
+                self.subscribers.get(channel, set()).discard(entry)
+
+
+class PostgresEventBackend:
+    """
+    LISTEN/NOTIFY on the default database. Each process (event loop) holds one listening connection, however
+    many pages are open: all users' events go over one channel, and the listener hands each to the streams
+    of its user through in-process queues.
+    """
+
+    NOTIFY_CHANNEL = "user_events"
+    RECONNECT_SECONDS = 5
+
+    def __init__(self):
+        self.streams = MemoryEventBackend()  # fan-out to the open streams of this process
+        self.listeners = weakref.WeakKeyDictionary()  # event loop -> listener task
+        self.lock = threading.Lock()
+
+    def publish(self, channel, payload):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.NOTIFY_CHANNEL, f"{channel} {payload}"])
+
+    async def listen(self, channel, timeout):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if loop not in self.listeners or self.listeners[loop].done():
+                self.listeners[loop] = loop.create_task(self._listen_for_all())
+
+        events = self.streams.listen(channel, timeout)
+        try:
+            async for payload in events:
+                yield payload
+        finally:
+            await events.aclose()
+
+    async def _listen_for_all(self):
+        import psycopg
+
+        database = settings.DATABASES["default"]
+        while True:
+            try:
+                listener = await psycopg.AsyncConnection.connect(
+                    dbname=database["NAME"],
+                    user=database["USER"],
+                    password=database["PASSWORD"],
+                    host=database["HOST"],
+                    port=database["PORT"],
+                    application_name=f"{settings.DB_APPLICATION_NAME}-events",
+                    autocommit=True,
+                )
+                try:
+                    await listener.execute(f"LISTEN {self.NOTIFY_CHANNEL}")
+                    async for notify in listener.notifies():
+                        channel, _, payload = notify.payload.partition(" ")
+                        self.streams.publish(channel, payload)
+                finally:
+                    await listener.close()
+            except Exception as e:
+                logger.warning(f"Event listener connection lost, reconnecting: {e}")
+                await asyncio.sleep(self.RECONNECT_SECONDS)
+
+
+class RedisEventBackend:
+    """Pub/sub, for deployments that already run Redis."""
+
+    def __init__(self):
+        import redis  # Only required when EVENT_STREAM_BACKEND = "redis"
+        self.client = redis.Redis.from_url(settings.EVENT_STREAM_REDIS_URL)
+
+    def publish(self, channel, payload):
+        self.client.publish(channel, payload)
+
+    async def listen(self, channel, timeout):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(settings.EVENT_STREAM_REDIS_URL)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+                yield message["data"].decode("utf-8") if message else None
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_BACKENDS = {"memory": MemoryEventBackend, "postgres": PostgresEventBackend, "redis": RedisEventBackend}
+_backend_instances = {}
+_backend_lock = threading.Lock()
+
+
+def _backend():
+    name = getattr(settings, "EVENT_STREAM_BACKEND", "postgres")
+    with _backend_lock:
+        if name not in _backend_instances:
+            _backend_instances[name] = _BACKENDS[name]()
+        return _backend_instances[name]
+
+
+def sse_message(event=None, data=None, comment=None):
+    if comment is not None:
+        return f": {comment}\n\n"
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def user_event_stream(user_id):
+    """
+    Server-Sent Events of one user: a comment line as heartbeat, and a reconnect after
+    EVENT_STREAM_MAX_SECONDS so a stream never outlives a deploy for long.
+    """
+    deadline = time.monotonic() + settings.EVENT_STREAM_MAX_SECONDS
+    yield "retry: 5000\n" + sse_message(comment="connected")
+
+    events = _backend().listen(user_channel(user_id), settings.EVENT_STREAM_HEARTBEAT_SECONDS)
+    try:
+        async for payload in events:
+            if payload is None:
+                yield sse_message(comment="heartbeat")
+            else:
+                try:
+                    message = json.loads(payload)
+                    yield sse_message(message["event"], message.get("data") or {})
+                except (ValueError, KeyError):
+                    logger.warning(f"Dropped malformed event for user {user_id}: {payload[:200]}")
+            if time.monotonic() >= deadline:
+                break
+    finally:
+        await events.aclose()
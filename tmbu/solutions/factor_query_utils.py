@@ -0,0 +1,83 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import re
+from django.conf import settings
+
+
+# Query modes for the Milvus factor search:
+#   "llm"    an LLM summarizes the scenario into bullet points (one extra round-trip)
+#   "local"  the scenario is split into sentences and clauses locally
+FACTOR_QUERY_MODES = ("llm", "local")
+
+# Sentence ends in Latin and CJK text
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=\S)|(?<=[。！？])|\n+")
+
+# Clause breaks used to split long sentences
+_CLAUSE_BREAK = re.compile(
+    r"(?<=[;；:：])\s*"
+    r"|(?<=[,，])\s*(?=(?:but|however|although|while|because|so|and then)\b)"
+    r"|(?<=[,，])\s*(?=但|然而|因为|所以|而且)",
+    re.IGNORECASE,
+)
+
+MIN_SEGMENT_CHARS = 12  # shorter fragments are merged into their neighbour
+LONG_SENTENCE_CHARS = 160  # longer sentences are split into clauses
+
+
+def get_factor_query_mode(view_name):
+    mode = settings.FACTOR_QUERY_MODES.get(view_name, settings.FACTOR_QUERY_MODE)
+    return mode if mode in FACTOR_QUERY_MODES else "llm"
+
+
+def _is_cjk(text):
+    return any("一" <= ch <= "鿿" for ch in text)
+
+
+def _too_short(segment):
+    # A CJK character carries roughly a word, so CJK fragments may be shorter
+    return len(segment) < (MIN_SEGMENT_CHARS // 3 if _is_cjk(segment) else MIN_SEGMENT_CHARS)
+
+
+def _merge_short(segments):
+    merged = []
+    for segment in segments:
+        if merged and (_too_short(segment) or _too_short(merged[-1])):
+            merged[-1] = f"{merged[-1]} {segment}"
+        else:
+            merged.append(segment)
+    return merged
+
+
+def _limit_count(segments, max_segments):
+    # Join neighbouring segments until the count fits, so no part of the scenario is dropped
+    while len(segments) > max_segments:
+        segments = [" ".join(segments[i:i + 2]) for i in range(0, len(segments), 2)]
+    return segments
+
+
+def segment_scenario(scenario_input, max_segments=None):
+    """
+    Split a scenario into search queries without an LLM call: sentences first, then clauses
+    of long sentences, with tiny fragments merged and at most `max_segments` queries.
+    """
+    max_segments = max_segments or settings.FACTOR_QUERY_MAX_SEGMENTS
+    if not scenario_input or not scenario_input.strip():
+        return []
+
+    segments = []
+    for sentence in _SENTENCE_END.split(scenario_input):
+        sentence = re.sub(r"\s+", " ", sentence).strip()
+        if not sentence:
+            continue
+        if len(sentence) > LONG_SENTENCE_CHARS:
+            segments.extend(clause.strip() for clause in _CLAUSE_BREAK.split(sentence) if clause and clause.strip())
+        else:
+            segments.append(sentence)
+
+    return _limit_count(_merge_short(segments), max_segments)
@@ -0,0 +1,171 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import os
+import time
+import logging
+import threading
+from django.conf import settings
+from .prompt_budget_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# Optional second stage of the factor search: Milvus returns FACTOR_RERANK_CANDIDATES approximate
+# hits per query, a small local cross-encoder scores every (query, factor) pair in one batch on CPU,
+# and the best factors are kept under a token budget. Under load the stage is skipped and the
+# Milvus order is used, as without re-ranking.
+
+_model = None
+_model_failed = False
+_model_lock = threading.Lock()
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+# Moving average of the cross-encoder time per pair, for the latency guard
+_seconds_per_pair = None
+
+_stats = {"reranked": 0, "skipped_load": 0, "skipped_latency": 0, "skipped_model": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def get_rerank_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["seconds_per_pair"] = _seconds_per_pair
+    return stats
+
+
+def rerank_enabled():
+    return settings.FACTOR_RERANK_ENABLED and not _model_failed
+
+
+def retrieval_signature(embedding_model_name):
+    """Identifies the retrieval pipeline, so stored artifacts from another pipeline are not reused."""
+    signature = embedding_model_name
+    if settings.KB_LANGUAGE_PARTITIONING:
+        signature = f"{signature}@{settings.KB_PARTITIONED_COLLECTION_NAME}"
+    if rerank_enabled():
+        signature = f"{signature}+{settings.FACTOR_RERANK_MODEL}:{settings.FACTOR_RERANK_KEEP_PER_QUERY}:{settings.FACTOR_RERANK_TOKEN_BUDGET}"
+    return signature
+
+
+def candidate_limit():
+    return settings.FACTOR_RERANK_CANDIDATES if rerank_enabled() else 1
+
+
+def get_cross_encoder():
+    global _model, _model_failed
+    if _model is None and not _model_failed:
+        with _model_lock:
+            if _model is None and not _model_failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    _model = CrossEncoder(settings.FACTOR_RERANK_MODEL, device="cpu", max_length=256)
+                except Exception as e:
+                    _model_failed = True
+                    logger.warning(f"Cross-encoder {settings.FACTOR_RERANK_MODEL} unavailable, factor re-ranking disabled: {e}")
+    return _model
+
+
+def _under_load():
+    with _in_flight_lock:
+        if _in_flight >= settings.FACTOR_RERANK_MAX_CONCURRENT:
+            return True
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):  # not available on this platform
+        return False
+    return load > settings.FACTOR_RERANK_MAX_LOAD
+
+
+def _skip_reason(pair_count):
+    if _under_load():
+        return "skipped_load"
+    if _seconds_per_pair is not None and _seconds_per_pair * pair_count > settings.FACTOR_RERANK_MAX_SECONDS:
+        return "skipped_latency"
+    return None
+
+
+def _milvus_order(hits):
+    return [factors[:1] for factors in hits]
+
+
+def _score_pairs(model, pairs):
+    global _in_flight, _seconds_per_pair
+    with _in_flight_lock:
+        _in_flight += 1
+    try:
+        start = time.monotonic()
+        scores = model.predict(pairs, batch_size=settings.FACTOR_RERANK_BATCH_SIZE, show_progress_bar=False)
+        per_pair = (time.monotonic() - start) / len(pairs)
+    finally:
+        with _in_flight_lock:
+            _in_flight -= 1
+
+    _seconds_per_pair = per_pair if _seconds_per_pair is None else 0.8 * _seconds_per_pair + 0.2 * per_pair
+    return [float(score) for score in scores]
+
+
+def select_under_budget(hits, keep_per_query, token_budget):
+    """
+    Keep up to keep_per_query factors per query, best first. The best factor of every query is kept
+    first; further factors are added by score while the total stays within token_budget.
+    """
+    ranked = [sorted(factors, key=lambda factor: factor["rerank_score"], reverse=True)[:keep_per_query] for factors in hits]
+    kept = [factors[:1] for factors in ranked]
+    used = sum(count_tokens(factors[0]["factor_text"]) for factors in kept if factors)
+
+    extras = sorted(
+        ((factor["rerank_score"], index, factor) for index, factors in enumerate(ranked) for factor in factors[1:]),
+        key=lambda item: item[0],
+        reverse=True,
+    )
+    for _, index, factor in extras:
+        tokens = count_tokens(factor["factor_text"])
+        if used + tokens > token_budget:
+            continue
+        kept[index].append(factor)
+        used += tokens
+    return kept
+
+
+def rerank_factor_hits(queries, hits, keep_per_query=None, token_budget=None, force=False):
+    """
+    Re-rank per-query Milvus candidates ({"id", "factor_text", "score"}) with the cross-encoder.
+    Returns per-query lists in the same format with a "rerank_score" added. Without the model, or
+    when the latency guard trips (unless `force`), each query keeps its top Milvus hit.
+    """
+    keep_per_query = keep_per_query or settings.FACTOR_RERANK_KEEP_PER_QUERY
+    token_budget = token_budget or settings.FACTOR_RERANK_TOKEN_BUDGET
+
+    pairs = [(query, factor["factor_text"]) for query, factors in zip(queries, hits) for factor in factors]
+    if not pairs:
+        return hits
+
+    model = get_cross_encoder()
+    if model is None:
+        _count("skipped_model")
+        return _milvus_order(hits)
+
+    reason = None if force else _skip_reason(len(pairs))
+    if reason:
+        _count(reason)
+        logger.info(f"Factor re-ranking {reason} for {len(pairs)} pairs")
+        return _milvus_order(hits)
+
+    scores = iter(_score_pairs(model, pairs))
+    scored = [[{**factor, "rerank_score": next(scores)} for factor in factors] for factors in hits]
+    _count("reranked")
+    return select_under_budget(scored, keep_per_query, token_budget)
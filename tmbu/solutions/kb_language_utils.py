@@ -0,0 +1,86 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import time
+import logging
+import threading
+from django.conf import settings
+from django.utils.translation import get_language
+
+logger = logging.getLogger(__name__)
+
+
+# Knowledge base factors carry a "language" field. In the partitioned collection it is the Milvus
+# partition key, so a search filtered on it only scans that language's partitions.
+
+KB_LANGUAGES = ("en", "zh")
+
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def kb_collection_name():
+    if settings.KB_LANGUAGE_PARTITIONING:
+        return settings.KB_PARTITIONED_COLLECTION_NAME
+    return settings.KB_COLLECTION_NAME
+
+
+def normalize_language(code):
+    """Django language code ("zh-hans", "en-us") -> KB language ("zh", "en"), or None."""
+    if not code:
+        return None
+    code = code.lower().split("-")[0].split("_")[0]
+    return code if code in KB_LANGUAGES else None
+
+
+def _is_cjk(ch):
+    return "一" <= ch <= "鿿" or "㐀" <= ch <= "䶿"
+
+
+def detect_language(text, default=None):
+    """"zh" when CJK characters make up a real share of the letters, "en" for other text, `default` without letters."""
+    letters = [ch for ch in text or "" if ch.isalpha()]
+    if not letters:
+        return default or normalize_language(get_language()) or "en"
+    cjk = sum(1 for ch in letters if _is_cjk(ch))
+    # A CJK character carries about as much as a Latin word, so a small share is already a Chinese text
+    return "zh" if cjk / len(letters) >= 0.2 else "en"
+
+
+def language_filter(language):
+    return f'language == "{language}"'
+
+
+def language_factor_count(milvus_client, language):
+    """Factors stored for the language, cached for KB_LANGUAGE_COUNT_TTL seconds."""
+    collection_name = kb_collection_name()
+    key = (collection_name, language)
+    with _counts_lock:
+        cached = _counts.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+    try:
+        rows = milvus_client.query(collection_name=collection_name, filter=language_filter(language), output_fields=["count(*)"])
+        count = rows[0]["count(*)"] if rows else 0
+    except Exception as e:
+        logger.warning(f"Could not count {language} factors in {collection_name}: {e}")
+        count = 0
+
+    with _counts_lock:
+        _counts[key] = (count, time.monotonic() + settings.KB_LANGUAGE_COUNT_TTL)
+    return count
+
+
+def search_filter_for(milvus_client, language):
+    """Filter that routes the search to the language's partition, or None for a cross-language search."""
+    if not settings.KB_LANGUAGE_PARTITIONING or language is None:
+        return None
+    if language_factor_count(milvus_client, language) < settings.KB_LANGUAGE_MIN_FACTORS:
+        return None  # too few factors in this language to search it alone
+    return language_filter(language)
@@ -0,0 +1,263 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import uuid
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from openai import OpenAIError
+from .models import LLMBatchJob, LLMBatchRequest, ScenarioActors, ScenarioDynamics, ScenarioNeeds, ScenarioSkillsResources, ScenarioAnalysisPrediction
+from .milvus_llm_utils import openai_client, build_chat_request, create_chat_completion, clean_llm_output, split_scenario_analysis_sections
+from .prompt_registry import SCENARIO_ANALYSIS_SECTIONS
+from .pipeline_status_utils import mark_sections
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# target -> (result model, result field, helper name)
+SCENARIO_BATCH_TARGETS = {
+    "actors": (ScenarioActors, "scenario_actors_traits", "generate_scenario_actors"),
+    "dynamics": (ScenarioDynamics, "scenario_dynamics", "generate_scenario_dynamics"),
+    "needs": (ScenarioNeeds, "scenario_needs", "generate_scenario_needs"),
+    "skills_resources": (ScenarioSkillsResources, "scenario_skills_resources", "generate_scenario_skills_resources"),
+    "analysis_prediction": (ScenarioAnalysisPrediction, "scenario_analysis_prediction", "generate_analysis_prediction"),
+}
+
+# The consolidated engine answers all five targets with one request
+CONSOLIDATED_TARGET = "consolidated"
+CONSOLIDATED_HELPER = "generate_consolidated_scenario_analysis"
+
+
+# Creating the Scenario* row is what marks the result ready for the polling views
+def save_scenario_result(scenario, target, output):
+    result_model, result_field, _ = SCENARIO_BATCH_TARGETS[target]
+    result_model.objects.update_or_create(
+        scenario=scenario,
+        user=scenario.user,
+        defaults={result_field: output}
+    )
+
+
+def save_scenario_analysis_sections(scenario, sections):
+    for target in SCENARIO_ANALYSIS_SECTIONS:
+        save_scenario_result(scenario, target, sections.get(target) or "No information available.")
+
+
+def helper_for_target(target):
+    if target == CONSOLIDATED_TARGET:
+        return CONSOLIDATED_HELPER
+    return SCENARIO_BATCH_TARGETS[target][2]
+
+
+def queue_scenario_batch_request(scenario, target, messages, **request_options):
+    """
+    Queue one scenario mining request for the next batch submission.
+    `messages` is None when the scenario has nothing to analyse; that result is saved right away.
+    """
+    targets = list(SCENARIO_ANALYSIS_SECTIONS) if target == CONSOLIDATED_TARGET else [target]
+
+    if messages is None:
+        for section_target in targets:
+            save_scenario_result(scenario, section_target, "No information available.")
+        return None
+
+    with transaction.atomic():
+        # A re-mined scenario shows as pending again until its new batch result arrives
+        for section_target in targets:
+            SCENARIO_BATCH_TARGETS[section_target][0].objects.filter(scenario=scenario).delete()
+        LLMBatchRequest.objects.filter(scenario=scenario, target=target, status="queued").delete()
+
+        return LLMBatchRequest.objects.create(
+            user=scenario.user,
+            scenario=scenario,
+            target=target,
+            custom_id=f"{target}-{scenario.scenario_id}-{uuid.uuid4().hex[:12]}",
+            body=build_chat_request(messages, helper=helper_for_target(target), **request_options),
+        )
+
+
+# A submission that died between claiming its requests and recording the batch leaves them "submitting";
+# after this long they go back to the queue (an upload takes seconds)
+STALE_CLAIM_SECONDS = 3600
+
+
+def _claim_queued_requests():
+    """
+    Take up to OPENAI_BATCH_MAX_REQUESTS queued requests for this submission. Rows another submission has
+    locked are skipped and the claimed ones leave the queue on commit, so overlapping beat runs never
+    upload (and pay for) the same request twice.
+    """
+    stale = timezone.now() - timedelta(seconds=STALE_CLAIM_SECONDS)
+    LLMBatchRequest.objects.filter(status="submitting", claimed_at__lt=stale).update(status="queued", claimed_at=None)
+
+    with transaction.atomic():
+        pending = list(
+            LLMBatchRequest.objects.select_for_update(skip_locked=True)
+            .filter(status="queued").order_by("created_at")[:settings.OPENAI_BATCH_MAX_REQUESTS]
+        )
+        LLMBatchRequest.objects.filter(pk__in=[r.pk for r in pending]).update(status="submitting", claimed_at=timezone.now())
+    return pending
+
+
+def submit_pending_batches():
+    pending = _claim_queued_requests()
+    if not pending:
+        return None
+
+    lines = [
+        json.dumps({"custom_id": r.custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": r.body}, ensure_ascii=False)
+        for r in pending
+    ]
+
+    try:
+        input_file = openai_client.files.create(
+            file=("scenario_mining_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = openai_client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+            metadata={"source": "scenario_mining"},
+        )
+    except OpenAIError:
+        LLMBatchRequest.objects.filter(pk__in=[r.pk for r in pending]).update(status="queued", claimed_at=None)
+        raise
+
+    with transaction.atomic():
+        job = LLMBatchJob.objects.create(
+            openai_batch_id=batch.id,
+            input_file_id=input_file.id,
+            status=batch.status,
+            request_count=len(pending),
+        )
+        LLMBatchRequest.objects.filter(pk__in=[r.pk for r in pending]).update(
+            status="submitted", batch_job=job, batch_attempts=F("batch_attempts") + 1
+        )
+
+    logger.info(f"Submitted OpenAI batch {batch.id} with {len(pending)} requests")
+    return job
+
+
+def _complete_request(batch_request, content, usage):
+    if batch_request.target == CONSOLIDATED_TARGET:
+        # Raises ValueError on a malformed JSON answer, handled like a failed line
+        save_scenario_analysis_sections(batch_request.scenario, split_scenario_analysis_sections(json.loads(content or "")))
+    else:
+        save_scenario_result(batch_request.scenario, batch_request.target, clean_llm_output(content or ""))
+
+    batch_request.status = "completed"
+    batch_request.prompt_tokens = (usage or {}).get("prompt_tokens", 0)
+    batch_request.completion_tokens = (usage or {}).get("completion_tokens", 0)
+    batch_request.completed_at = timezone.now()
+    batch_request.save(update_fields=["status", "prompt_tokens", "completion_tokens", "completed_at"])
+
+
+# Requests the batch could not answer are sent once through the interactive API,
+# so a scenario never stays pending forever.
+def _complete_interactively(batch_request, error):
+    logger.warning(f"Batch request {batch_request.custom_id} failed ({error}); running it interactively.")
+
+    try:
+        response = create_chat_completion(helper=helper_for_target(batch_request.target), **batch_request.body)
+        usage = response.usage.model_dump() if response.usage else None
+        _complete_request(batch_request, response.choices[0].message.content, usage)
+    except (OpenAIError, ValueError) as e:
+        batch_request.status = "failed"
+        batch_request.error = f"{error}; interactive fallback failed: {e}"
+        batch_request.save(update_fields=["status", "error"])
+        sections = list(SCENARIO_ANALYSIS_SECTIONS) if batch_request.target == CONSOLIDATED_TARGET else [batch_request.target]
+        mark_sections(batch_request.scenario_id, sections, "failed", only_from=("queued", "running", "batched"), error=batch_request.error)
+        return False
+
+    batch_request.error = str(error)
+    batch_request.save(update_fields=["error"])
+    return True
+
+
+def _process_result_file(job, file_id):
+    completed = failed = 0
+    if not file_id:
+        return completed, failed
+
+    requests_by_id = {r.custom_id: r for r in job.requests.filter(status="submitted").select_related("scenario", "scenario__user")}
+
+    for line in openai_client.files.content(file_id).text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        batch_request = requests_by_id.get(item.get("custom_id"))
+        if batch_request is None:
+            continue
+
+        response = item.get("response") or {}
+        error = item.get("error") or response.get("body")
+        if response.get("status_code") == 200 and not item.get("error"):
+            body = response["body"]
+            try:
+                _complete_request(batch_request, body["choices"][0]["message"]["content"], body.get("usage"))
+                completed += 1
+                continue
+            except ValueError as e:
+                error = f"Malformed batch output: {e}"
+
+        if _complete_interactively(batch_request, error):
+            completed += 1
+        else:
+            failed += 1
+
+    return completed, failed
+
+
+def poll_batches():
+    """Refresh every open batch job and write back the results of finished ones. Returns the number finished."""
+    finished = 0
+
+    for job in LLMBatchJob.objects.exclude(status__in=LLMBatchJob.TERMINAL_STATUSES):
+        try:
+            batch = openai_client.batches.retrieve(job.openai_batch_id)
+        except OpenAIError as e:
+            logger.warning(f"Failed to poll OpenAI batch {job.openai_batch_id}: {e}")
+            continue
+
+        job.status = batch.status
+        job.output_file_id = batch.output_file_id
+        job.error_file_id = batch.error_file_id
+
+        if batch.status in LLMBatchJob.TERMINAL_STATUSES:
+            # Expired and cancelled batches can still carry partial results
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                completed, failed = _process_result_file(job, file_id)
+                job.completed_count += completed
+                job.failed_count += failed
+
+            # Whatever the batch did not answer goes back to the queue for the next submission, unless it went
+            # unanswered too often (e.g. a failed batch has no output file at all): then it runs interactively
+            unanswered = job.requests.filter(status="submitted")
+            for batch_request in unanswered.filter(batch_attempts__gte=settings.OPENAI_BATCH_MAX_ATTEMPTS).select_related("scenario", "scenario__user"):
+                if _complete_interactively(batch_request, f"Unanswered in {batch_request.batch_attempts} batches (last {batch.status})"):
+                    job.completed_count += 1
+                else:
+                    job.failed_count += 1
+
+            requeued = unanswered.update(status="queued", batch_job=None)
+            if requeued:
+                logger.warning(f"Requeued {requeued} unanswered requests from batch {job.openai_batch_id} ({batch.status})")
+
+            job.completed_at = timezone.now()
+            finished += 1
+
+        job.save()
+
+    return finished
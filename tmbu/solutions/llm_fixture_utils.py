@@ -0,0 +1,186 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import re
+import json
+import random
+import hashlib
+import logging
+import threading
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+# ---- Anonymization ----
+
+# Personal data that must not leave production in a fixture file
+_PII_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+"), "user@example.com"),
+    (re.compile(r"https?://\S+"), "https://example.com"),
+    # Phone numbers need a separator, so plain integers (e.g. profile ids in JSON output) stay valid
+    (re.compile(r"(?<![\w.])\+?\(?\d{1,4}\)?[\s.-]?\d{2,4}[\s.-]\d{3,4}(?:[\s.-]?\d{3,4})?(?![\w.])"), "<phone>"),
+    (re.compile(r"(?<!\d)1[3-9]\d{9}(?!\d)"), "<phone>"),  # mainland China mobile numbers
+]
+
+
+def anonymize_text(text):
+    if not isinstance(text, str):
+        return text
+    for pattern, replacement in _PII_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def anonymize_messages(messages):
+    anonymized = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = [
+                {**part, "text": anonymize_text(part.get("text"))} if isinstance(part, dict) and part.get("type") == "text" else part
+                for part in content
+            ]
+        else:
+            content = anonymize_text(content)
+        anonymized.append({**message, "content": content})
+    return anonymized
+
+
+# ---- Matching keys ----
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def fixture_key(request):
+    """Exact-match key over the anonymized request, so a recorded prompt replays its own answer."""
+    return _hash({
+        "model": request.get("model"),
+        "response_format": request.get("response_format"),
+        "messages": anonymize_messages(request.get("messages", [])),
+    })
+
+
+def system_prompt_key(messages):
+    """
+    Key over the leading static system prompt. It identifies the helper when the
+    X-LLM-Helper header is missing (e.g. lines of a batch file).
+    """
+    for message in messages:
+        if message.get("role") == "system":
+            return _hash(message.get("content"))
+    return None
+
+
+# ---- Record mode ----
+
+_record_lock = threading.Lock()
+
+
+def record_fixture(helper, request, response, latency_seconds):
+    """Append one anonymized request/response pair to LLM_FIXTURE_PATH (LLM_FIXTURE_MODE = "record")."""
+    if settings.LLM_FIXTURE_MODE != "record" or not settings.LLM_FIXTURE_PATH:
+        return
+
+    try:
+        choice = response.choices[0]
+        usage = response.usage.model_dump() if response.usage else None
+        line = json.dumps({
+            "recorded_at": timezone.now().isoformat(),
+            "helper": helper or "unknown",
+            "key": fixture_key(request),
+            "system_key": system_prompt_key(request.get("messages", [])),
+            "request": {
+                "model": request.get("model"),
+                "max_tokens": request.get("max_tokens"),
+                "temperature": request.get("temperature"),
+                "response_format": request.get("response_format"),
+                "messages": anonymize_messages(request.get("messages", [])),
+            },
+            "response": {
+                "content": anonymize_text(choice.message.content),
+                "finish_reason": choice.finish_reason,
+                "usage": usage,
+            },
+            "latency_seconds": latency_seconds,
+        }, ensure_ascii=False)
+
+        with _record_lock, open(settings.LLM_FIXTURE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        logger.warning(f"Failed to record LLM fixture for {helper}: {e}")
+
+
+# ---- Replay (used by manage.py run_llm_stand_in_server --fixtures) ----
+
+class FixtureStore:
+    """Recorded responses indexed by exact request key, helper and system prompt."""
+
+    def __init__(self, fixtures):
+        self.by_key = {}
+        self.by_helper = {}
+        self.by_system_key = {}
+        for fixture in fixtures:
+            self.by_key.setdefault(fixture["key"], []).append(fixture)
+            self.by_helper.setdefault(fixture["helper"], []).append(fixture)
+            if fixture.get("system_key"):
+                self.by_system_key.setdefault(fixture["system_key"], []).append(fixture)
+        self.hits = {"exact": 0, "helper": 0, "system_prompt": 0, "miss": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def __len__(self):
+        return sum(len(fixtures) for fixtures in self.by_key.values())
+
+    def match(self, body, helper=None):
+        """Best recorded fixture for this request body, or None."""
+        candidates = [
+            ("exact", self.by_key.get(fixture_key(body))),
+            ("helper", self.by_helper.get(helper) if helper else None),
+            ("system_prompt", self.by_system_key.get(system_prompt_key(body.get("messages", [])))),
+        ]
+        for kind, fixtures in candidates:
+            if fixtures:
+                with self._lock:
+                    self.hits[kind] += 1
+                return random.choice(fixtures)
+
+        with self._lock:
+            self.hits["miss"] += 1
+        return None
+
+
+# ---- Latency distributions ----
+
+def parse_latency(spec):
+    """
+    "fixed:1.0", "uniform:0.5,2.0", "normal:mean,stddev", "lognormal:mu,sigma" or "recorded[:scale]".
+    Returns a function(fixture) -> seconds.
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+
+    if kind == "fixed":
+        return lambda fixture: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda fixture: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda fixture: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda fixture: random.lognormvariate(values[0], values[1])
+    if kind == "recorded":
+        scale = values[0] if values else 1.0
+        # Requests without a fixture fall back to one second
+        return lambda fixture: (fixture or {}).get("latency_seconds", 1.0) * scale
+    raise ValueError(f"Unknown latency distribution '{spec}'")
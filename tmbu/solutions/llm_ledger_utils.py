@@ -0,0 +1,223 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Aggregate, Count, FloatField, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .llm_usage_utils import estimate_cost
+
+logger = logging.getLogger(__name__)
+
+
+# Which product feature each helper serves, for grouping the bill and latency
+HELPER_FEATURES = {
+    "generate_element_advice": "scenario_process",
+    "generate_factor_advice": "scenario_process",
+    "generate_solution_advice": "scenario_process",
+    "generate_summary_bullet_points": "scenario_process",
+    "generate_quick_solution": "quick_solution",
+    "extract_info_from_scenario": "mining",
+    "aggregate_individual_traits": "mining",
+    "aggregate_group_traits": "mining",
+    "generate_scenario_actors": "mining",
+    "generate_scenario_dynamics": "mining",
+    "generate_scenario_needs": "mining",
+    "generate_scenario_skills_resources": "mining",
+    "generate_analysis_prediction": "mining",
+    "generate_consolidated_scenario_analysis": "mining",
+    "generate_global_actors_profiles": "mining",
+    "summarize_relationship_status": "mining",
+    "llm_generate_simulation": "simulation",
+    "llm_generate_live_simulation": "live_simulation",
+}
+
+
+# ---- Call context: who and what triggered the OpenAI call ----
+
+# Set per request by solutions.middleware.LLMUsageContextMiddleware and per task by the Celery task signals
+_call_context = contextvars.ContextVar("llm_call_context", default={})
+
+
+def set_llm_call_context(**values):
+    """Start a new call context; returns a token for reset_llm_call_context."""
+    return _call_context.set(dict(values))
+
+
+def update_llm_call_context(**values):
+    _call_context.set({**_call_context.get(), **values})
+
+
+def reset_llm_call_context(token):
+    _call_context.reset(token)
+
+
+def get_llm_call_context():
+    return _call_context.get()
+
+
+# ---- Buffered background flusher ----
+
+class UsageLedgerFlusher:
+    """
+    Collects usage records in memory and writes them with bulk_create from a daemon thread,
+    so the request or task that made the OpenAI call never waits on the insert.
+    """
+
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads do not survive a fork (Celery prefork, gunicorn preload), so start one per process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._queue = queue.Queue(maxsize=settings.LLM_USAGE_BUFFER_SIZE)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="llm-usage-ledger", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def enqueue(self, record):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning(f"LLM usage buffer full, dropping record for {record.get('helper')}")
+
+    def _drain(self, wait_seconds):
+        batch = []
+        deadline = time.monotonic() + wait_seconds
+        while len(batch) < settings.LLM_USAGE_FLUSH_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        from .models import LLMUsageRecord
+
+        try:
+            LLMUsageRecord.objects.bulk_create([LLMUsageRecord(**record) for record in batch])
+        except Exception as e:
+            logger.warning(f"Failed to write {len(batch)} LLM usage records: {e}")
+        finally:
+            close_old_connections()
+
+    def _run(self):
+        while True:
+            batch = self._drain(settings.LLM_USAGE_FLUSH_INTERVAL)
+            if batch:
+                self._write(batch)
+
+    def flush(self):
+        """Write everything still buffered (called at process exit)."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+
+_flusher = UsageLedgerFlusher()
+
+
+def record_llm_call(helper, model, usage, latency_seconds, outcome="success", error=None):
+    if not settings.LLM_USAGE_LEDGER_ENABLED:
+        return
+
+    context = get_llm_call_context()
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    _flusher.enqueue({
+        "created_at": timezone.now(),
+        "helper": helper or "unknown",
+        "feature": HELPER_FEATURES.get(helper, "other"),
+        "source": context.get("source"),
+        "user_id": context.get("user_id"),
+        "request_id": context.get("request_id"),
+        "task_id": context.get("task_id"),
+        "model": model or "",
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "latency_seconds": latency_seconds,
+        "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens),
+        "outcome": outcome,
+        "error": str(error)[:2000] if error else None,
+    })
+
+
+# ---- Reporting (PostgreSQL) ----
+
+class Percentile(Aggregate):
+    function = "PERCENTILE_CONT"
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=percentile, **extra)
+
+
+def feature_latency_summary(queryset):
+    return list(
+        queryset.values("feature")
+        .annotate(
+            calls=Count("pk"),
+            p50=Percentile("latency_seconds", 0.5),
+            p95=Percentile("latency_seconds", 0.95),
+            prompt_tokens=Sum("prompt_tokens"),
+            completion_tokens=Sum("completion_tokens"),
+            cost_usd=Sum("cost_usd"),
+        )
+        .order_by("-cost_usd")
+    )
+
+
+def daily_token_totals(queryset, days=14):
+    since = timezone.now() - timedelta(days=days)
+    return list(
+        queryset.filter(created_at__gte=since)
+        .annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(
+            calls=Count("pk"),
+            prompt_tokens=Sum("prompt_tokens"),
+            cached_tokens=Sum("cached_tokens"),
+            completion_tokens=Sum("completion_tokens"),
+            cost_usd=Sum("cost_usd"),
+        )
+        .order_by("-day")
+    )
@@ -0,0 +1,105 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import random
+import logging
+import threading
+from django.conf import settings
+from django.utils import timezone
+from .openai_rate_limit_utils import estimate_request_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# Used when routing is switched off (LLM_ROUTING_ENABLED=False): the fixed pre-routing defaults
+LEGACY_ROUTES = {
+    "default": [{"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 600, "timeout": None}],
+    "default_json": [{"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 3000, "timeout": None}],
+}
+
+
+def get_routes():
+    if not settings.LLM_ROUTING_ENABLED:
+        return LEGACY_ROUTES
+    return settings.LLM_ROUTES
+
+
+# First tier whose max_input_tokens covers the prompt; the last tier takes anything larger
+def select_route(helper, input_tokens, routes=None, default="default"):
+    routes = routes if routes is not None else get_routes()
+    tiers = routes.get(helper) or routes.get(default) or routes["default"]
+
+    for tier in tiers:
+        if tier.get("max_input_tokens") is None or input_tokens <= tier["max_input_tokens"]:
+            return tier
+    return tiers[-1]
+
+
+def resolve_route(helper, messages, model=None, max_tokens=None, default="default", routes=None):
+    """
+    Request options (model, max_tokens and, when set, timeout) for one call of `helper`,
+    chosen by the estimated prompt size. Explicit `model` / `max_tokens` arguments win over the route.
+    """
+    tier = select_route(helper, estimate_request_tokens(messages), routes=routes, default=default)
+
+    options = {
+        "model": model or tier["model"],
+        "max_tokens": max_tokens or tier["max_tokens"],
+    }
+    if tier.get("timeout"):
+        options["timeout"] = tier["timeout"]
+    return options
+
+
+# ---- Prompt sampling for offline route evaluation ----
+
+_sample_lock = threading.Lock()
+
+
+def sample_prompt(helper, request):
+    """Append a share of the outgoing requests to LLM_PROMPT_SAMPLE_PATH (JSONL)."""
+    path = settings.LLM_PROMPT_SAMPLE_PATH
+    if not path or random.random() >= settings.LLM_PROMPT_SAMPLE_RATE:
+        return
+
+    line = json.dumps({
+        "recorded_at": timezone.now().isoformat(),
+        "helper": helper or "unknown",
+        "input_tokens": estimate_request_tokens(request["messages"]),
+        "model": request.get("model"),
+        "max_tokens": request.get("max_tokens"),
+        "timeout": request.get("timeout"),
+        "temperature": request.get("temperature"),
+        "response_format": request.get("response_format"),
+        "messages": request["messages"],
+    }, ensure_ascii=False)
+
+    try:
+        with _sample_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logger.warning(f"Failed to record prompt sample for {helper}: {e}")
+
+
+def load_prompt_samples(path, helpers=None, limit_per_helper=None):
+    samples = []
+    counts = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            sample = json.loads(line)
+            helper = sample.get("helper")
+            if helpers and helper not in helpers:
+                continue
+            if limit_per_helper and counts.get(helper, 0) >= limit_per_helper:
+                continue
+            counts[helper] = counts.get(helper, 0) + 1
+            samples.append(sample)
+    return samples
@@ -0,0 +1,294 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import logging
+from typing import List, Literal, Optional, TypedDict
+from django.db import connections
+from django.utils import timezone
+from .prompt_registry import SCENARIO_ANALYSIS_SECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+INDIVIDUAL_TRAIT_FIELDS = (
+    "cognitive_pattern", "affect_pattern", "action_pattern", "personality", "beliefs_values", "priorities",
+    "life_style", "identity", "capabilities", "family", "marriage_intimate_relationship", "education",
+    "occupation_job_industry", "social_economic_status", "social_network", "biological_characteristics",
+)
+
+GROUP_TRAIT_FIELDS = (
+    "group_type", "domain", "size", "mission_vision_value", "goal_strategy", "objectives_plan", "governance",
+    "organizational_structure", "operation_system", "organizational_politics", "influence", "leadership",
+    "culture", "performance", "challenge", "funding_resources_budget",
+)
+
+TURN_TYPES = ["speech", "thought", "feeling", "action"]
+
+
+# ---- Typed results (plain dicts at runtime, validated against the schemas below) ----
+
+class ExtractedActor(TypedDict):
+    actor_ref_id: str
+    name_or_alias: str
+    actor_type: Literal["individual", "group"]
+
+ExtractedIndividualTraits = TypedDict("ExtractedIndividualTraits", {"actor": str, **{f: Optional[str] for f in INDIVIDUAL_TRAIT_FIELDS}})
+ExtractedGroupTraits = TypedDict("ExtractedGroupTraits", {"actor": str, **{f: Optional[str] for f in GROUP_TRAIT_FIELDS}})
+
+class ExtractedInteraction(TypedDict):
+    behavior_id: str
+    actor: str
+    behavior_description: Optional[str]
+    env: Optional[str]
+
+class ExtractedInteractionRelation(TypedDict):
+    source: str
+    target: str
+    relation_description: Optional[str]
+    related_actors: List[str]
+    related_actors_relationship_status: Optional[str]
+
+class ExtractedInfo(TypedDict):
+    actors: List[ExtractedActor]
+    individual_traits: List[ExtractedIndividualTraits]
+    group_traits: List[ExtractedGroupTraits]
+    interactions: List[ExtractedInteraction]
+    interaction_relations: List[ExtractedInteractionRelation]
+
+IndividualProfileUpdate = TypedDict("IndividualProfileUpdate", {
+    "individual_profile_id": Optional[int],
+    "old_canonical_name": Optional[str],
+    "new_canonical_name": str,
+    "aliases": List[str],
+    **{f: Optional[str] for f in INDIVIDUAL_TRAIT_FIELDS},
+})
+GroupProfileUpdate = TypedDict("GroupProfileUpdate", {
+    "group_profile_id": Optional[int],
+    "old_canonical_name": Optional[str],
+    "new_canonical_name": str,
+    "aliases": List[str],
+    **{f: Optional[str] for f in GROUP_TRAIT_FIELDS},
+})
+
+class IndividualProfileUpdates(TypedDict):
+    updates: List[IndividualProfileUpdate]
+
+class GroupProfileUpdates(TypedDict):
+    updates: List[GroupProfileUpdate]
+
+class GlobalActorEntry(TypedDict):
+    canonical_name: str
+    traits: str
+
+GlobalActorsProfilesResult = TypedDict("GlobalActorsProfilesResult", {
+    "Self": List[GlobalActorEntry],
+    "People": List[GlobalActorEntry],
+    "Group": List[GlobalActorEntry],
+})
+
+class RelationshipSummary(TypedDict):
+    actor1: str
+    actor2: str
+    summary: str
+
+class RelationshipSummaries(TypedDict):
+    summaries: List[RelationshipSummary]
+
+class SimulationTurn(TypedDict):
+    actor: str
+    type: Literal["speech", "thought", "feeling", "action"]
+    content: str
+
+class SimulationResult(TypedDict):
+    simulation: List[SimulationTurn]
+
+class LiveSimulationResult(TypedDict):
+    responses: List[SimulationTurn]
+
+
+# ---- Strict JSON schemas for OpenAI structured outputs ----
+
+STRING = {"type": "string"}
+NULLABLE_STRING = {"type": ["string", "null"]}
+
+
+# Strict mode needs every property listed as required and no extra properties
+def _object(properties):
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def _array(items):
+    return {"type": "array", "items": items}
+
+
+SIMULATION_TURN_SCHEMA = _object({"actor": STRING, "type": {"type": "string", "enum": TURN_TYPES}, "content": STRING})
+GLOBAL_ACTOR_SCHEMA = _object({"canonical_name": STRING, "traits": STRING})
+
+OUTPUT_SCHEMAS = {
+    "extract_info_from_scenario": _object({
+        "actors": _array(_object({
+            "actor_ref_id": STRING,
+            "name_or_alias": STRING,
+            "actor_type": {"type": "string", "enum": ["individual", "group"]},
+        })),
+        "individual_traits": _array(_object({"actor": STRING, **{f: NULLABLE_STRING for f in INDIVIDUAL_TRAIT_FIELDS}})),
+        "group_traits": _array(_object({"actor": STRING, **{f: NULLABLE_STRING for f in GROUP_TRAIT_FIELDS}})),
+        "interactions": _array(_object({
+            "behavior_id": STRING,
+            "actor": STRING,
+            "behavior_description": NULLABLE_STRING,
+            "env": NULLABLE_STRING,
+        })),
+        "interaction_relations": _array(_object({
+            "source": STRING,
+            "target": STRING,
+            "relation_description": NULLABLE_STRING,
+            "related_actors": _array(STRING),
+            "related_actors_relationship_status": NULLABLE_STRING,
+        })),
+    }),
+    "aggregate_individual_traits": _object({
+        "updates": _array(_object({
+            "individual_profile_id": {"type": ["integer", "null"]},
+            "old_canonical_name": NULLABLE_STRING,
+            "new_canonical_name": STRING,
+            "aliases": _array(STRING),
+            **{f: NULLABLE_STRING for f in INDIVIDUAL_TRAIT_FIELDS},
+        })),
+    }),
+    "aggregate_group_traits": _object({
+        "updates": _array(_object({
+            "group_profile_id": {"type": ["integer", "null"]},
+            "old_canonical_name": NULLABLE_STRING,
+            "new_canonical_name": STRING,
+            "aliases": _array(STRING),
+            **{f: NULLABLE_STRING for f in GROUP_TRAIT_FIELDS},
+        })),
+    }),
+    "generate_global_actors_profiles": _object({
+        "Self": _array(GLOBAL_ACTOR_SCHEMA),
+        "People": _array(GLOBAL_ACTOR_SCHEMA),
+        "Group": _array(GLOBAL_ACTOR_SCHEMA),
+    }),
+    "summarize_relationship_status": _object({
+        "summaries": _array(_object({"actor1": STRING, "actor2": STRING, "summary": STRING})),
+    }),
+    "llm_generate_simulation": _object({"simulation": _array(SIMULATION_TURN_SCHEMA)}),
+    "llm_generate_live_simulation": _object({"responses": _array(SIMULATION_TURN_SCHEMA)}),
+    "generate_consolidated_scenario_analysis": _object({field: STRING for field in SCENARIO_ANALYSIS_SECTIONS}),
+    "judge_scenario_analysis": _object({"score_a": {"type": "integer"}, "score_b": {"type": "integer"}, "reason": STRING}),
+}
+
+
+def get_output_schema(helper):
+    return OUTPUT_SCHEMAS.get(helper)
+
+
+def response_format_for(helper):
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": helper, "strict": True, "schema": OUTPUT_SCHEMAS[helper]},
+    }
+
+
+# ---- Validation ----
+
+class OutputValidationError(ValueError):
+    pass
+
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+# Validates the subset of JSON schema used above
+def validate_against_schema(value, schema, path="$"):
+    types = schema.get("type")
+    types = types if isinstance(types, list) else [types]
+    if not any(_TYPE_CHECKS[t](value) for t in types):
+        raise OutputValidationError(f"{path}: expected {' or '.join(types)}, got {type(value).__name__}")
+
+    if "enum" in schema and value not in schema["enum"]:
+        raise OutputValidationError(f"{path}: {value!r} is not one of {schema['enum']}")
+
+    if isinstance(value, dict) and "properties" in schema:
+        missing = [key for key in schema.get("required", []) if key not in value]
+        if missing:
+            raise OutputValidationError(f"{path}: missing fields {missing}")
+        if schema.get("additionalProperties") is False:
+            extra = [key for key in value if key not in schema["properties"]]
+            if extra:
+                raise OutputValidationError(f"{path}: unexpected fields {extra}")
+        for key, child_schema in schema["properties"].items():
+            if key in value:
+                validate_against_schema(value[key], child_schema, f"{path}.{key}")
+
+    if isinstance(value, list) and "items" in schema:
+        for index, item in enumerate(value):
+            validate_against_schema(item, schema["items"], f"{path}[{index}]")
+
+
+def parse_json_output(raw_output, helper):
+    """Parse a JSON completion and validate it against the helper's schema, if it has one."""
+    parsed_output = json.loads(raw_output or "")
+    schema = get_output_schema(helper)
+    if schema is not None:
+        validate_against_schema(parsed_output, schema)
+    return parsed_output
+
+
+# ---- Parse failure / repair tracking ----
+
+def record_parse_outcome(helper, parse_failed=False, repaired=None, error=None):
+    """
+    Count one JSON completion for `helper`. `repaired` is None when no repair was needed,
+    otherwise whether the single repair retry produced valid output.
+
+    One INSERT ... ON CONFLICT DO UPDATE on the rate limiter's autocommit connection: a single statement
+    per call, committed at once and outside the caller's transaction, so a failed write never breaks it.
+    """
+    from .models import LLMOutputParseStats
+    from .openai_rate_limit_utils import RATE_LIMIT_DB_ALIAS
+
+    table = connections[RATE_LIMIT_DB_ALIAS].ops.quote_name(LLMOutputParseStats._meta.db_table)
+    repair_attempt = int(repaired is not None)
+    repair_success = int(bool(repaired))
+    last_error = str(error)[:2000] if parse_failed else None
+    last_failure_at = timezone.now() if parse_failed else None
+
+    try:
+        with connections[RATE_LIMIT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} AS s (helper, calls, parse_failures, repair_attempts, repair_successes, last_error, last_failure_at)
+                VALUES (%s, 1, %s, %s, %s, %s, %s)
+                ON CONFLICT (helper) DO UPDATE SET
+                    calls = s.calls + 1,
+                    parse_failures = s.parse_failures + EXCLUDED.parse_failures,
+                    repair_attempts = s.repair_attempts + EXCLUDED.repair_attempts,
+                    repair_successes = s.repair_successes + EXCLUDED.repair_successes,
+                    last_error = coalesce(EXCLUDED.last_error, s.last_error),
+                    last_failure_at = coalesce(EXCLUDED.last_failure_at, s.last_failure_at)
+                """,
+                [helper or "unknown", int(parse_failed), repair_attempt, repair_success, last_error, last_failure_at],
+            )
+    except Exception as e:
+        logger.warning(f"Failed to record JSON parse stats for {helper}: {e}")
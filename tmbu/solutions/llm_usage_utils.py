@@ -0,0 +1,95 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Running totals per helper for this process, so prompt cache savings show up in the logs
+_usage_totals = {}
+_usage_lock = threading.Lock()
+
+# Usage lists opened with collect_usage() in the current context. A context variable, so calls made in
+# sync_to_async threads and coroutines (acreate_chat_completion) reach the lists of the caller that opened them.
+_collectors = contextvars.ContextVar("llm_usage_collectors", default=())
+
+
+def _cached_tokens(usage):
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def record_usage(helper, model, usage):
+    if usage is None:
+        return
+
+    prompt_tokens = usage.prompt_tokens or 0
+    cached_tokens = _cached_tokens(usage)
+    completion_tokens = usage.completion_tokens or 0
+    helper = helper or "unknown"
+
+    with _usage_lock:
+        totals = _usage_totals.setdefault(helper, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["cached_tokens"] += cached_tokens
+        totals["completion_tokens"] += completion_tokens
+        cache_hit_rate = totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+
+    for records in _collectors.get():
+        records.append({
+            "helper": helper,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": completion_tokens,
+        })
+
+    logger.info(
+        f"OpenAI usage for {helper} ({model}): prompt={prompt_tokens} cached={cached_tokens} "
+        f"completion={completion_tokens}; cached share for this helper so far {cache_hit_rate:.0%}"
+    )
+
+
+@contextmanager
+def collect_usage():
+    """Collect the usage of every OpenAI call made in this context inside the block."""
+    records = []
+    token = _collectors.set(_collectors.get() + (records,))
+    try:
+        yield records
+    finally:
+        _collectors.reset(token)
+
+
+def get_usage_totals():
+    with _usage_lock:
+        return {helper: dict(totals) for helper, totals in _usage_totals.items()}
+
+
+# USD cost of one call from settings.LLM_MODEL_PRICING (prices per 1M tokens)
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0, batch=False):
+    pricing = settings.LLM_MODEL_PRICING.get(model)
+    if pricing is None:
+        return 0.0
+
+    uncached_tokens = max(0, prompt_tokens - cached_tokens)
+    cost = (
+        uncached_tokens * pricing["input"]
+        + cached_tokens * pricing.get("cached_input", pricing["input"])
+        + completion_tokens * pricing["output"]
+    ) / 1_000_000
+
+    if batch:
+        cost *= settings.OPENAI_BATCH_DISCOUNT
+    return cost
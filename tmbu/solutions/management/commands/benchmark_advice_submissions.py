@@ -0,0 +1,86 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import re
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Scenario text of the benchmark submissions; the form requires at least 50 words
+SCENARIO_TEXT = (
+    "I lead a small product team that has to ship a large release in six weeks. Two senior engineers "
+    "disagree about the architecture, the designer is overloaded, and the sales team keeps promising "
+    "features to customers that are not on the plan. I want the release to ship on time without "
+    "burning out the team or losing the trust of the customers who are waiting for it."
+)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent quick-solution submissions against a running server. Reports how long the submit request "
+        "takes and how long until the solution is on the page. Run once with ADVICE_JOBS_ENABLED off and once "
+        "with it on (with a Celery worker), e.g. against run_llm_stand_in_server, to compare the two."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000/en/solutions/")
+        parser.add_argument("--session-cookie", required=True, help="sessionid cookie of a logged-in user with a subscription")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+        parser.add_argument("--requests", type=int, default=32, help="Submissions per concurrency level")
+        parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for a solution")
+
+    def submit(self, options):
+        session = requests.Session()
+        session.cookies.set("sessionid", options["session_cookie"])
+        new_url = options["base_url"].rstrip("/") + "/scenario-quick-solution/"
+
+        page = session.get(new_url, params={"new": "true"})
+        match = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page.text)
+        if not match:
+            raise CommandError("No scenario form on the page; is the session cookie valid?")
+
+        start = time.monotonic()
+        response = session.post(
+            new_url + "?new=true",
+            data={"csrfmiddlewaretoken": match.group(1), "scenario_input": SCENARIO_TEXT, "submit_scenario": "1"},
+            headers={"Referer": new_url},
+            allow_redirects=False,
+        )
+        response_seconds = time.monotonic() - start
+        scenario_url = requests.compat.urljoin(new_url, response.headers.get("Location", ""))
+
+        # End to end: until the page shows the solution instead of the job progress
+        while time.monotonic() - start < options["timeout"]:
+            text = session.get(scenario_url).text
+            if "adviceJobProgress" not in text:
+                return {"response_seconds": response_seconds, "done_seconds": time.monotonic() - start, "ok": "adviceJobFailed" not in text}
+            time.sleep(0.5)
+        return {"response_seconds": response_seconds, "done_seconds": time.monotonic() - start, "ok": False}
+
+    def handle(self, *args, **options):
+        for concurrency in options["concurrency"]:
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(lambda _: self.submit(options), range(options["requests"])))
+            wall_seconds = time.monotonic() - start
+
+            response = [r["response_seconds"] for r in results]
+            done = [r["done_seconds"] for r in results]
+            self.stdout.write(
+                f"concurrency {concurrency}: {len(results)} submissions in {wall_seconds:.1f}s "
+                f"({len(results) / wall_seconds:.2f}/s); response p50 {percentile(response, 0.5):.2f}s / p95 {percentile(response, 0.95):.2f}s; "
+                f"solution shown p50 {percentile(done, 0.5):.2f}s / p95 {percentile(done, 0.95):.2f}s; "
+                f"failed {sum(1 for r in results if not r['ok'])}"
+            )
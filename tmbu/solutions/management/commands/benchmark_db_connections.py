@@ -0,0 +1,133 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import time
+import threading
+import psycopg
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.signals import request_started, request_finished
+from django.db import connection, connections
+from django.contrib.auth.models import User
+from solutions.db_connection_utils import connection_stats, pool_stats, reset_connection_stats
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def simulated_request(queries):
+    """A request as gunicorn runs it: Django's request signals close obsolete connections around the view."""
+    request_started.send(sender=None)
+    start = time.monotonic()
+    try:
+        for _ in range(queries):
+            User.objects.filter(pk=0).exists()
+    finally:
+        request_finished.send(sender=None)
+    return time.monotonic() - start
+
+
+class BackendSampler(threading.Thread):
+    """Samples the Postgres backends of this database from pg_stat_activity, on its own connection outside any pool."""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.max_backends = 0
+
+    def run(self):
+        with psycopg.connect(**connection.get_connection_params()) as sampler_connection:
+            while not self.stopped.is_set():
+                with sampler_connection.cursor() as cursor:
+                    cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()")
+                    self.max_backends = max(self.max_backends, cursor.fetchone()[0])
+                self.stopped.wait(self.interval)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark of per-request database connections (CONN_MAX_AGE=0, as before) against persistent ones "
+        "(CONN_MAX_AGE) and a connection pool (DB_POOL_MAX_SIZE): request latency, pool waits and Postgres "
+        "backends under concurrent load."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=settings.GUNICORN_THREADS * 4, help="Parallel request threads")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--queries", type=int, default=3, help="Queries per request")
+        parser.add_argument("--conn-max-age", type=int, default=settings.DB_CONN_MAX_AGE or 300, help="For the persistent run")
+        parser.add_argument("--pool-max-size", type=int, default=settings.DB_POOL_MAX_SIZE, help="For the pooled run")
+
+    def run_mode(self, name, conn_max_age, pool, options):
+        # The wrappers of every thread share the alias' settings dict; a new connection picks the age and the
+        # pool up. The pool of the alias is per process, so the one of the previous run is closed first.
+        settings_dict = connections["default"].settings_dict
+        connections.close_all()
+        connections["default"].close_pool()
+        saved = settings_dict["CONN_MAX_AGE"], settings_dict["OPTIONS"].get("pool")
+        settings_dict["CONN_MAX_AGE"] = conn_max_age
+        if pool:
+            settings_dict["OPTIONS"]["pool"] = pool
+        else:
+            settings_dict["OPTIONS"].pop("pool", None)
+        reset_connection_stats()
+
+        def run(_):
+            return simulated_request(options["queries"])
+
+        # Kept connections belong to the request threads: every thread closes its own before the next run
+        barrier = threading.Barrier(options["threads"])
+
+        def close_thread_connections(_):
+            barrier.wait()
+            connections.close_all()
+
+        sampler = BackendSampler(interval=0.05)
+        sampler.start()
+        start = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+                latencies = list(pool.map(run, range(options["requests"])))
+                list(pool.map(close_thread_connections, range(options["threads"])))
+        finally:
+            wall_seconds = time.monotonic() - start
+            sampler.stopped.set()
+            sampler.join()
+
+        stats = connection_stats()["aliases"].get("default", {})
+        pooled = pool_stats("default")
+        if pooled:
+            connections_line = (
+                f"pool size {pooled.get('pool_size', 0)}, connections opened {pooled.get('connections_num', 0)}, "
+                f"requests waited {pooled.get('requests_queued', 0)} (avg {pooled['avg_wait_ms']}ms)"
+            )
+        else:
+            connections_line = f"connections opened {stats.get('opened', 0)}, reuse ratio {stats.get('reuse_ratio')}"
+        self.stdout.write(
+            f"{name}: {len(latencies)} requests in {wall_seconds:.1f}s ({len(latencies) / wall_seconds:.0f}/s); "
+            f"latency p50 {percentile(latencies, 0.5) * 1000:.1f}ms / p95 {percentile(latencies, 0.95) * 1000:.1f}ms; "
+            f"{connections_line}; peak backends {sampler.max_backends}"
+        )
+
+        connections.close_all()
+        connections["default"].close_pool()
+        settings_dict["CONN_MAX_AGE"] = saved[0]
+        if saved[1]:
+            settings_dict["OPTIONS"]["pool"] = saved[1]
+        else:
+            settings_dict["OPTIONS"].pop("pool", None)
+
+    def handle(self, *args, **options):
+        pool = {"name": "default", "min_size": 1, "max_size": options["pool_max_size"], "timeout": settings.DB_POOL_TIMEOUT}
+        self.run_mode("per-request connections", 0, None, options)
+        self.run_mode("persistent connections", options["conn_max_age"], None, options)
+        self.run_mode("pooled connections", 0, pool, options)
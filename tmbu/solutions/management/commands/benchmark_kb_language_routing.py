@@ -0,0 +1,110 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from solutions.models import Scenario, ScenarioQuickSolution
+from solutions.factor_query_utils import segment_scenario
+from solutions.kb_language_utils import detect_language, language_filter
+from solutions.milvus_connection_utils import ensure_milvus_connection
+from solutions.milvus_llm_utils import generate_embeddings, search_factor_vectors
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def timed_search(milvus_client, collection_name, embedding, top_k, search_filter=None):
+    start = time.monotonic()
+    factors = search_factor_vectors(milvus_client, collection_name, [embedding], top_k, search_filter)[0]
+    return factors, time.monotonic() - start
+
+
+class Command(BaseCommand):
+    help = "Compares search latency and relevance of the flat knowledge base collection with the language-partitioned one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="Latest scenarios whose segments are used as queries")
+        parser.add_argument("--text", action="append", help="Use this text as a query instead (repeatable)")
+        parser.add_argument("--top-k", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=3, help="Searches per query and collection, for stable timings")
+        parser.add_argument("--flat", default=settings.KB_COLLECTION_NAME)
+        parser.add_argument("--partitioned", default=settings.KB_PARTITIONED_COLLECTION_NAME)
+        parser.add_argument("--output", help="Write per-query results to this JSON file")
+
+    def handle(self, *args, **options):
+        if options["text"]:
+            queries = options["text"]
+        else:
+            half = max(1, options["limit"] // 2)
+            inputs = list(Scenario.objects.order_by("-scenario_input_time").values_list("scenario_input", flat=True)[:half])
+            inputs += list(ScenarioQuickSolution.objects.filter(scenario_submitted=True).order_by("-scenario_input_time").values_list("scenario_input", flat=True)[:options["limit"] - len(inputs)])
+            queries = [segment for text in inputs if text and text.strip() for segment in segment_scenario(text)]
+
+        if not queries:
+            self.stdout.write("No queries to benchmark.")
+            return
+
+        embeddings = generate_embeddings(queries)
+        milvus_client = ensure_milvus_connection()
+        results = []
+        try:
+            for query, embedding in zip(queries, embeddings):
+                language = detect_language(query)
+                flat_times, routed_times = [], []
+                for _ in range(options["repeat"]):
+                    flat, seconds = timed_search(milvus_client, options["flat"], embedding, options["top_k"])
+                    flat_times.append(seconds)
+                    routed, seconds = timed_search(milvus_client, options["partitioned"], embedding, options["top_k"], language_filter(language))
+                    routed_times.append(seconds)
+
+                flat_texts = [factor["factor_text"] for factor in flat]
+                routed_texts = [factor["factor_text"] for factor in routed]
+                results.append({
+                    "query": query,
+                    "language": language,
+                    "flat_seconds": min(flat_times),
+                    "routed_seconds": min(routed_times),
+                    "flat_top_score": flat[0]["score"] if flat else None,
+                    "routed_top_score": routed[0]["score"] if routed else None,
+                    "overlap": len(set(flat_texts) & set(routed_texts)) / len(flat_texts) if flat_texts else 1.0,
+                    # Share of the flat results in another language than the query: what routing filters out
+                    "flat_other_language": sum(1 for text in flat_texts if detect_language(text, default=language) != language) / len(flat_texts) if flat_texts else 0.0,
+                    "routed_empty": not routed,
+                    "flat": flat_texts,
+                    "routed": routed_texts,
+                })
+        finally:
+            milvus_client.close()
+
+        for language in sorted({r["language"] for r in results}):
+            rows = [r for r in results if r["language"] == language]
+            flat_times = [r["flat_seconds"] for r in rows]
+            routed_times = [r["routed_seconds"] for r in rows]
+            flat_scores = [r["flat_top_score"] for r in rows if r["flat_top_score"] is not None]
+            routed_scores = [r["routed_top_score"] for r in rows if r["routed_top_score"] is not None]
+            self.stdout.write(
+                f"{language}: {len(rows)} queries, "
+                f"latency flat p50 {percentile(flat_times, 0.5) * 1000:.1f}ms / p95 {percentile(flat_times, 0.95) * 1000:.1f}ms, "
+                f"routed p50 {percentile(routed_times, 0.5) * 1000:.1f}ms / p95 {percentile(routed_times, 0.95) * 1000:.1f}ms"
+            )
+            self.stdout.write(
+                f"    top score flat {sum(flat_scores) / len(flat_scores) if flat_scores else 0:.3f}, "
+                f"routed {sum(routed_scores) / len(routed_scores) if routed_scores else 0:.3f}; "
+                f"top-{options['top_k']} overlap {sum(r['overlap'] for r in rows) / len(rows):.0%}, "
+                f"other-language share of flat results {sum(r['flat_other_language'] for r in rows) / len(rows):.0%}, "
+                f"routed searches without results {sum(1 for r in rows if r['routed_empty'])}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"queries": results}, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote benchmark to {options['output']}"))
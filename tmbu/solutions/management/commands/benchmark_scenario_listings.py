@@ -0,0 +1,77 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import time
+import uuid
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from solutions import views
+from solutions.models import Scenario, ScenarioQuickSolution, ScenarioForMining
+
+
+# listing -> (view, model, long text fields seeded on every row)
+LISTINGS = {
+    "my_scenarios": (views.my_scenarios_view, Scenario, ["scenario_input", "scenario_element_advice", "scenario_factor_advice", "scenario_solution_input", "scenario_solution_advice", "user_experience"]),
+    "my_scenarios_quick_solution": (views.my_scenarios_quick_solution_view, ScenarioQuickSolution, ["scenario_input", "scenario_quick_solution"]),
+    "my_scenarios_mining": (views.my_scenarios_mining_view, ScenarioForMining, ["scenario_input"]),
+}
+
+
+def value_bytes(rows):
+    return sum(len(str(value).encode("utf-8")) for row in rows for value in row)
+
+
+class Command(BaseCommand):
+    help = (
+        "Query budget check of the My Scenarios listings: seeds a temporary user with long scenarios, renders "
+        "each listing and fails when a page runs more queries than the budget. Also reports the data each page reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Rows seeded per listing")
+        parser.add_argument("--text-kb", type=int, default=4, help="Size of each long text field")
+        parser.add_argument("--query-budget", type=int, default=2, help="Queries allowed per page (count + page)")
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username=f"listing_benchmark_{uuid.uuid4().hex[:12]}")
+        text = "word " * (options["text_kb"] * 1024 // 5)
+        over_budget = []
+        try:
+            for name, (view, model, fields) in LISTINGS.items():
+                model.objects.bulk_create([model(user=user, **{field: text for field in fields}) for _ in range(options["rows"])], batch_size=200)
+
+                request = RequestFactory().get("/", {"page": 2})
+                request.user = user
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.monotonic()
+                    response = view(request)
+                    seconds = time.monotonic() - start
+
+                # What the page reads against what loading the full rows of the page would read
+                page_sql = queries.captured_queries[-1]["sql"]
+                with connection.cursor() as cursor:
+                    cursor.execute(page_sql)
+                    read = value_bytes(cursor.fetchall())
+                full_rows = model.objects.filter(user=user).order_by("-scenario_input_time")[10:20].values_list()
+                full = value_bytes(full_rows)
+
+                self.stdout.write(
+                    f"{name}: {len(queries.captured_queries)} queries, {seconds * 1000:.1f}ms, status {response.status_code}; "
+                    f"page reads {read / 1024:.1f} KB (full rows {full / 1024:.1f} KB), response {len(response.content) / 1024:.1f} KB"
+                )
+                if len(queries.captured_queries) > options["query_budget"]:
+                    over_budget.append(name)
+        finally:
+            user.delete()
+            connections.close_all()
+
+        if over_budget:
+            raise CommandError(f"Over the query budget of {options['query_budget']}: {', '.join(over_budget)}")
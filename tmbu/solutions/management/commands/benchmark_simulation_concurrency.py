@@ -0,0 +1,76 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+
+
+SIMULATION_SCENARIO = (
+    "The two of them meet after a long week to decide whether to move to another city for a new job offer, "
+    "while both worry about family, money and the friends they would leave behind."
+)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent generate-simulation requests against a running server. Start the server once with WSGI "
+        "(gunicorn tmbu.wsgi:application) and once with ASGI (GUNICORN_APP=tmbu.asgi:application, "
+        "GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker) at the same worker count, with OPENAI_BASE_URL "
+        "pointing to run_llm_stand_in_server, and compare the throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000/en/solutions/")
+        parser.add_argument("--session-cookie", required=True, help="sessionid cookie of a logged-in user with a subscription")
+        parser.add_argument("--actors", nargs="+", required=True, help="At least two canonical actor names of that user")
+        parser.add_argument("--endpoint", choices=["generate", "live"], default="generate")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+        parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+        parser.add_argument("--timeout", type=float, default=300.0)
+
+    def simulate(self, options):
+        base_url = options["base_url"].rstrip("/")
+        if options["endpoint"] == "generate":
+            url = f"{base_url}/interaction-space/generate-simulation/"
+            body = {"actors": options["actors"], "scenario": SIMULATION_SCENARIO}
+        else:
+            url = f"{base_url}/interaction-space/live-simulation/"
+            body = {"actors": options["actors"], "scenario": SIMULATION_SCENARIO, "user_actor": options["actors"][0], "message": "Shall we decide tonight?"}
+
+        start = time.monotonic()
+        try:
+            response = requests.post(url, json=body, cookies={"sessionid": options["session_cookie"]}, timeout=options["timeout"])
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return {"seconds": time.monotonic() - start, "ok": ok}
+
+    def handle(self, *args, **options):
+        if len(options["actors"]) < 2:
+            raise CommandError("Give at least two actors.")
+
+        for concurrency in options["concurrency"]:
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(lambda _: self.simulate(options), range(options["requests"])))
+            wall_seconds = time.monotonic() - start
+
+            seconds = [r["seconds"] for r in results]
+            failed = sum(1 for r in results if not r["ok"])
+            self.stdout.write(
+                f"concurrency {concurrency}: {len(results)} simulations in {wall_seconds:.1f}s "
+                f"({(len(results) - failed) / wall_seconds:.2f}/s ok); latency p50 {percentile(seconds, 0.5):.2f}s / "
+                f"p95 {percentile(seconds, 0.95):.2f}s / max {max(seconds):.2f}s; failed {failed}"
+            )
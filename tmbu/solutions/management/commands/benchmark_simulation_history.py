@@ -0,0 +1,66 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import time
+import uuid
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from solutions.models import GeneratedSimulation, LiveSimulation
+from solutions.simulation_history_utils import PAGE_SIZE, simulation_history_page, count_simulations, encode_cursor
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark of the My Simulations history: seeds a temporary user with many simulations and reports "
+        "queries and latency of the first page, a deep page and the total, then deletes the user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--simulations", type=int, default=50000, help="Rows seeded, split between generated and live")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def measure(self, name, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.monotonic()
+                result = run()
+                timings.append(time.monotonic() - start)
+        self.stdout.write(f"{name}: {len(queries.captured_queries)} queries, best {min(timings) * 1000:.1f}ms / worst {max(timings) * 1000:.1f}ms")
+        return result
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username=f"history_benchmark_{uuid.uuid4().hex[:12]}")
+        try:
+            half = options["simulations"] // 2
+            GeneratedSimulation.objects.bulk_create(
+                [GeneratedSimulation(user=user, actors=[], scenario=f"Benchmark generated simulation {n}", result={}, actors_traits_snapshot={}, actors_relations_snapshot={}) for n in range(half)],
+                batch_size=2000,
+            )
+            LiveSimulation.objects.bulk_create(
+                [LiveSimulation(user=user, scenario=f"Benchmark live simulation {n}") for n in range(options["simulations"] - half)],
+                batch_size=2000,
+            )
+            self.stdout.write(f"Seeded {options['simulations']} simulations")
+
+            first = self.measure("first page", lambda: simulation_history_page(user), options["repeat"])
+            self.measure("second page", lambda: simulation_history_page(user, before=first["older_cursor"]), options["repeat"])
+
+            # A cursor near the end of the history stands in for a user who paged all the way back
+            oldest = GeneratedSimulation.objects.filter(user=user).order_by("created_at", "pk").values("pk", "created_at")[PAGE_SIZE]
+            deep_cursor = encode_cursor({"created_at": oldest["created_at"], "type": "Generated", "id": oldest["pk"]})
+            deep = self.measure("deep page", lambda: simulation_history_page(user, before=deep_cursor), options["repeat"])
+            self.measure("deep page, newer", lambda: simulation_history_page(user, after=deep["newer_cursor"]), options["repeat"])
+
+            total, capped = self.measure("total", lambda: count_simulations(user), options["repeat"])
+            self.stdout.write(f"total shown: {total}{'+' if capped else ''}")
+        finally:
+            user.delete()
+            connections.close_all()
@@ -0,0 +1,97 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import time
+from django.core.management.base import BaseCommand
+from solutions.models import Scenario, ScenarioQuickSolution
+from solutions.factor_query_utils import segment_scenario
+from solutions.milvus_llm_utils import generate_summary_bullet_points, retrieve_factors_from_milvus
+
+
+def run_mode(mode, scenario_input, top_k):
+    start = time.monotonic()
+    queries = generate_summary_bullet_points(scenario_input) if mode == "llm" else segment_scenario(scenario_input)
+    query_seconds = time.monotonic() - start
+
+    start = time.monotonic()
+    hits = retrieve_factors_from_milvus(queries, limit=top_k) if queries else []
+    retrieval_seconds = time.monotonic() - start
+
+    best_scores = [factors[0]["score"] for factors in hits if factors and factors[0]["score"] is not None]
+    return {
+        "queries": queries,
+        "factors": sorted({factor["factor_text"] for factors in hits for factor in factors}),
+        "query_seconds": query_seconds,
+        "retrieval_seconds": retrieval_seconds,
+        "mean_best_score": sum(best_scores) / len(best_scores) if best_scores else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = "Compares Milvus factor retrieval from LLM summary bullet points ('llm') with local sentence/clause segmentation ('local')"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="Latest scenarios to compare (factor advice and quick solution)")
+        parser.add_argument("--top-k", type=int, default=3, help="Factors retrieved per query")
+        parser.add_argument("--text", action="append", help="Compare this scenario text instead (repeatable)")
+        parser.add_argument("--output", help="Write queries, factors and measurements to this JSON file")
+
+    def handle(self, *args, **options):
+        if options["text"]:
+            inputs = options["text"]
+        else:
+            half = max(1, options["limit"] // 2)
+            inputs = list(Scenario.objects.order_by("-scenario_input_time").values_list("scenario_input", flat=True)[:half])
+            inputs += list(ScenarioQuickSolution.objects.filter(scenario_submitted=True).order_by("-scenario_input_time").values_list("scenario_input", flat=True)[:options["limit"] - len(inputs)])
+        inputs = [text for text in inputs if text and text.strip()]
+
+        if not inputs:
+            self.stdout.write("No scenarios to compare.")
+            return
+
+        results = []
+        for number, scenario_input in enumerate(inputs, start=1):
+            llm = run_mode("llm", scenario_input, options["top_k"])
+            local = run_mode("local", scenario_input, options["top_k"])
+
+            # The LLM-bullet mode is the reference: how much of what it finds does the local mode find too
+            llm_factors, local_factors = set(llm["factors"]), set(local["factors"])
+            union = llm_factors | local_factors
+            result = {
+                "llm": llm,
+                "local": local,
+                "recall_of_llm_factors": len(llm_factors & local_factors) / len(llm_factors) if llm_factors else 1.0,
+                "jaccard": len(llm_factors & local_factors) / len(union) if union else 1.0,
+            }
+            results.append(result)
+
+            self.stdout.write(
+                f"Scenario {number}: llm {len(llm['queries'])} queries / {llm['query_seconds'] + llm['retrieval_seconds']:.2f}s, "
+                f"local {len(local['queries'])} queries / {local['query_seconds'] + local['retrieval_seconds']:.2f}s, "
+                f"recall {result['recall_of_llm_factors']:.0%}, jaccard {result['jaccard']:.2f}"
+            )
+
+        count = len(results)
+        for mode in ("llm", "local"):
+            self.stdout.write(
+                f"{mode}: {sum(len(r[mode]['queries']) for r in results) / count:.1f} queries, "
+                f"query generation {sum(r[mode]['query_seconds'] for r in results) / count:.2f}s, "
+                f"retrieval {sum(r[mode]['retrieval_seconds'] for r in results) / count:.2f}s, "
+                f"{sum(len(r[mode]['factors']) for r in results) / count:.1f} distinct factors, "
+                f"mean best score {sum(r[mode]['mean_best_score'] for r in results) / count:.3f} per scenario"
+            )
+        self.stdout.write(
+            f"local vs llm: recall of llm factors {sum(r['recall_of_llm_factors'] for r in results) / count:.0%}, "
+            f"jaccard {sum(r['jaccard'] for r in results) / count:.2f}"
+        )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"scenarios": results}, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote comparison to {options['output']}"))
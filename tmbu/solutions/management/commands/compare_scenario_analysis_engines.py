@@ -0,0 +1,140 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import time
+from django.core.management.base import BaseCommand
+from solutions.models import ScenarioForMining
+from solutions.tasks import collect_scenario_mining_data
+from solutions.llm_usage_utils import collect_usage
+from solutions.prompt_registry import SCENARIO_ANALYSIS_SECTIONS, system_message
+from solutions.milvus_llm_utils import generate_scenario_actors, generate_scenario_dynamics, generate_scenario_needs, generate_scenario_skills_resources, generate_analysis_prediction, generate_consolidated_scenario_analysis, call_openai_output_json_string
+
+
+def run_separate_engine(data, scenario_input):
+    return {
+        "actors": generate_scenario_actors(data),
+        "dynamics": generate_scenario_dynamics(data),
+        "needs": generate_scenario_needs(data),
+        "skills_resources": generate_scenario_skills_resources(data),
+        "analysis_prediction": generate_analysis_prediction(scenario_input),
+    }
+
+
+def run_engine(engine, data, scenario_input):
+    start = time.monotonic()
+    with collect_usage() as usage:
+        if engine == "separate":
+            sections = run_separate_engine(data, scenario_input)
+        else:
+            sections = generate_consolidated_scenario_analysis(data, scenario_input) or {}
+    return {
+        "sections": sections,
+        "wall_seconds": time.monotonic() - start,
+        "calls": len(usage),
+        "input_tokens": sum(u["prompt_tokens"] for u in usage),
+        "cached_tokens": sum(u["cached_tokens"] for u in usage),
+        "output_tokens": sum(u["completion_tokens"] for u in usage),
+    }
+
+
+# Ask the model to score both engines' output of one section side by side
+def judge_section(field, scenario_input, output_a, output_b):
+    helper, _ = SCENARIO_ANALYSIS_SECTIONS[field]
+    messages = [
+        system_message("judge_scenario_analysis"),
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": (
+                        f"These are the section instructions: '{system_message(helper)['content'][0]['text']}'.\n\n"
+                        f"This is the scenario input: '{scenario_input}'.\n\n"
+                        f"Candidate A: '{output_a}'.\n\n"
+                        f"Candidate B: '{output_b}'.\n\n"
+                    )
+                }
+            ]
+        }
+    ]
+    return call_openai_output_json_string(messages, output_language="en", helper="judge_scenario_analysis") or {}
+
+
+class Command(BaseCommand):
+    help = "Compares input tokens, wall time and output quality of the separate and consolidated scenario analysis engines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario-id", type=int, action="append", help="Scenario to compare (repeatable)")
+        parser.add_argument("--limit", type=int, default=5, help="Number of latest submitted scenarios when no --scenario-id is given")
+        parser.add_argument("--judge", action="store_true", help="Score each section of both engines with an LLM judge")
+        parser.add_argument("--output", help="Write all outputs and measurements to this JSON file")
+
+    def handle(self, *args, **options):
+        scenarios = ScenarioForMining.objects.filter(scenario_submitted=True).order_by("-scenario_input_time")
+        if options["scenario_id"]:
+            scenarios = scenarios.filter(scenario_id__in=options["scenario_id"])
+        else:
+            scenarios = scenarios[:options["limit"]]
+
+        results = []
+        totals = {engine: {"wall_seconds": 0.0, "calls": 0, "input_tokens": 0, "output_tokens": 0, "score": 0, "scored": 0} for engine in ("separate", "consolidated")}
+
+        for scenario in scenarios:
+            data = collect_scenario_mining_data(scenario)
+            result = {"scenario_id": scenario.scenario_id}
+
+            for engine in ("separate", "consolidated"):
+                result[engine] = run_engine(engine, data, scenario.scenario_input)
+                for key in ("wall_seconds", "calls", "input_tokens", "output_tokens"):
+                    totals[engine][key] += result[engine][key]
+
+            if options["judge"]:
+                result["judge"] = {}
+                for field in SCENARIO_ANALYSIS_SECTIONS:
+                    verdict = judge_section(
+                        field,
+                        scenario.scenario_input,
+                        result["separate"]["sections"].get(field),
+                        result["consolidated"]["sections"].get(field),
+                    )
+                    result["judge"][field] = verdict
+                    if "score_a" in verdict and "score_b" in verdict:
+                        totals["separate"]["score"] += verdict["score_a"]
+                        totals["consolidated"]["score"] += verdict["score_b"]
+                        totals["separate"]["scored"] += 1
+                        totals["consolidated"]["scored"] += 1
+
+            self.stdout.write(
+                f"Scenario {scenario.scenario_id}: "
+                + ", ".join(
+                    f"{engine} {result[engine]['input_tokens']} input tokens / {result[engine]['wall_seconds']:.1f}s"
+                    for engine in ("separate", "consolidated")
+                )
+            )
+            results.append(result)
+
+        if not results:
+            self.stdout.write("No submitted scenarios to compare.")
+            return
+
+        for engine, total in totals.items():
+            line = (
+                f"{engine}: {total['calls'] / len(results):.1f} calls, "
+                f"{total['input_tokens'] / len(results):.0f} input tokens, "
+                f"{total['output_tokens'] / len(results):.0f} output tokens, "
+                f"{total['wall_seconds'] / len(results):.1f}s per scenario"
+            )
+            if total["scored"]:
+                line += f", judge score {total['score'] / total['scored']:.2f}/5"
+            self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"scenarios": results, "totals": totals}, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote comparison to {options['output']}"))
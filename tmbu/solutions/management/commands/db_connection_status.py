@@ -0,0 +1,39 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+from django.core.management.base import BaseCommand
+from solutions.db_connection_utils import postgres_backend_stats
+
+class Command(BaseCommand):
+    help = "Shows the Postgres backends by application and state against max_connections and the configured connection budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Print the status as JSON")
+
+    def handle(self, *args, **options):
+        status = postgres_backend_stats()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(status))
+            return
+
+        budget = status["budget"]
+        self.stdout.write(f"max_connections: {status['max_connections']}")
+        self.stdout.write(
+            f"budget: {budget['total']} (web {budget['web']}, async {budget['async']}, celery {budget['celery']}; "
+            f"aliases {', '.join(budget['aliases'])})"
+        )
+        if budget["total"] > status["max_connections"]:
+            self.stdout.write(self.style.WARNING(
+                "The budget exceeds max_connections: lower GUNICORN_WORKERS/GUNICORN_THREADS, "
+                "GUNICORN_ASYNC_WORKERS/DB_ASYNC_POOL_MAX_SIZE or CELERY_WORKER_CONCURRENCY"
+            ))
+        self.stdout.write(f"backends: {status['total']}")
+        for backend in status["backends"]:
+            self.stdout.write(f"  {backend['application_name'] or '-'} / {backend['state'] or '-'}: {backend['count']}")
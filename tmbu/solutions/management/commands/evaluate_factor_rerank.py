@@ -0,0 +1,121 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from solutions.models import Scenario, ScenarioQuickSolution
+from solutions.factor_query_utils import segment_scenario
+from solutions.factor_rerank_utils import get_cross_encoder, rerank_factor_hits
+from solutions.milvus_llm_utils import retrieve_factors_from_milvus
+
+
+def load_labels(path):
+    """JSONL lines of {"queries": [...]} or {"query": "..."} with "relevant": factor ids or factor texts."""
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            queries = case.get("queries") or [case["query"]]
+            cases.append({"queries": queries, "relevant": {str(item) for item in case.get("relevant", [])}})
+    return cases
+
+
+def is_relevant(factor, relevant):
+    return str(factor["id"]) in relevant or factor["factor_text"] in relevant
+
+
+def precision(hits, relevant):
+    kept = [factor for factors in hits for factor in factors]
+    if not kept:
+        return None
+    return sum(1 for factor in kept if is_relevant(factor, relevant)) / len(kept)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = "Measures the precision and added latency of cross-encoder re-ranking against the plain Milvus order"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--labels", help="JSONL file of queries with their relevant factor ids or texts (needed for precision)")
+        parser.add_argument("--limit", type=int, default=20, help="Without --labels: latest scenarios to measure, queried by local segmentation")
+        parser.add_argument("--candidates", type=int, default=settings.FACTOR_RERANK_CANDIDATES, help="Milvus hits per query")
+        parser.add_argument("--keep", type=int, default=settings.FACTOR_RERANK_KEEP_PER_QUERY, help="Factors kept per query")
+        parser.add_argument("--output", help="Write the per-case results to this JSON file")
+
+    def handle(self, *args, **options):
+        if get_cross_encoder() is None:
+            raise CommandError(f"Cross-encoder {settings.FACTOR_RERANK_MODEL} could not be loaded")
+
+        if options["labels"]:
+            cases = load_labels(options["labels"])
+        else:
+            half = max(1, options["limit"] // 2)
+            inputs = list(Scenario.objects.order_by("-scenario_input_time").values_list("scenario_input", flat=True)[:half])
+            inputs += list(ScenarioQuickSolution.objects.filter(scenario_submitted=True).order_by("-scenario_input_time").values_list("scenario_input", flat=True)[:options["limit"] - len(inputs)])
+            cases = [{"queries": segment_scenario(text), "relevant": None} for text in inputs if text and text.strip()]
+        cases = [case for case in cases if case["queries"]]
+
+        if not cases:
+            self.stdout.write("No cases to evaluate.")
+            return
+
+        results = []
+        for case in cases:
+            start = time.monotonic()
+            candidates = retrieve_factors_from_milvus(case["queries"], limit=options["candidates"])
+            retrieval_seconds = time.monotonic() - start
+
+            start = time.monotonic()
+            reranked = rerank_factor_hits(case["queries"], candidates, keep_per_query=options["keep"], force=True)
+            rerank_seconds = time.monotonic() - start
+
+            baseline = [factors[:options["keep"]] for factors in candidates]
+            top1 = [factors[:1] for factors in candidates]
+            result = {
+                "queries": case["queries"],
+                "pairs": sum(len(factors) for factors in candidates),
+                "retrieval_seconds": retrieval_seconds,
+                "rerank_seconds": rerank_seconds,
+                "baseline": [[factor["factor_text"] for factor in factors] for factors in baseline],
+                "reranked": [[factor["factor_text"] for factor in factors] for factors in reranked],
+                "top1_changed": sum(1 for a, b in zip(top1, reranked) if a and b and a[0]["id"] != b[0]["id"]) / len(case["queries"]),
+            }
+            if case["relevant"] is not None:
+                result["precision_top1"] = precision(top1, case["relevant"])
+                result["precision_baseline"] = precision(baseline, case["relevant"])
+                result["precision_reranked"] = precision(reranked, case["relevant"])
+            results.append(result)
+
+        count = len(results)
+        rerank_times = [r["rerank_seconds"] for r in results]
+        self.stdout.write(
+            f"{count} cases, {sum(r['pairs'] for r in results) / count:.1f} pairs each: "
+            f"retrieval {sum(r['retrieval_seconds'] for r in results) / count:.3f}s, "
+            f"added re-rank latency p50 {percentile(rerank_times, 0.5):.3f}s / p95 {percentile(rerank_times, 0.95):.3f}s"
+        )
+        self.stdout.write(f"Top factor changed by re-ranking for {sum(r['top1_changed'] for r in results) / count:.0%} of queries")
+
+        for key, label in (("precision_top1", "Milvus top-1"), ("precision_baseline", f"Milvus top-{options['keep']}"), ("precision_reranked", "re-ranked")):
+            values = [r[key] for r in results if r.get(key) is not None]
+            if values:
+                self.stdout.write(f"Precision {label}: {sum(values) / len(values):.2f}")
+        if not options["labels"]:
+            self.stdout.write("Precision needs --labels; only latency and rank changes were measured.")
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"cases": results}, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote evaluation to {options['output']}"))
@@ -0,0 +1,168 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from openai import OpenAIError
+from solutions.llm_routing_utils import load_prompt_samples, resolve_route
+from solutions.llm_schema_utils import parse_json_output, OutputValidationError
+from solutions.llm_ledger_utils import set_llm_call_context, reset_llm_call_context
+from solutions.llm_usage_utils import estimate_cost
+from solutions.milvus_llm_utils import create_chat_completion
+
+
+def parse_candidate(spec):
+    """'label=model:max_tokens[:timeout]' -> (label, fixed options)"""
+    label, _, route = spec.partition("=")
+    if not route:
+        label, route = spec, spec
+    parts = route.split(":")
+    if len(parts) < 2:
+        raise CommandError(f"Candidate '{spec}' must look like label=model:max_tokens[:timeout]")
+
+    options = {"model": parts[0], "max_tokens": int(parts[1])}
+    if len(parts) > 2 and parts[2]:
+        options["timeout"] = float(parts[2])
+    return label, options
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))] if values else 0.0
+
+
+def replay(sample, options):
+    request = {
+        "messages": sample["messages"],
+        "temperature": sample.get("temperature") if sample.get("temperature") is not None else 0.1,
+        **options,
+    }
+    if sample.get("response_format"):
+        request["response_format"] = sample["response_format"]
+
+    start = time.monotonic()
+    try:
+        response = create_chat_completion(helper=sample["helper"], **request)
+    except OpenAIError as e:
+        return {"error": str(e), "latency_seconds": time.monotonic() - start}
+
+    result = {
+        "latency_seconds": time.monotonic() - start,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost_usd": 0.0,
+        "truncated": response.choices[0].finish_reason == "length",
+        "invalid_json": False,
+    }
+    if response.usage:
+        result["prompt_tokens"] = response.usage.prompt_tokens
+        result["completion_tokens"] = response.usage.completion_tokens
+        result["cost_usd"] = estimate_cost(options["model"], response.usage.prompt_tokens, response.usage.completion_tokens)
+
+    if sample.get("response_format"):
+        try:
+            parse_json_output(response.choices[0].message.content, sample["helper"])
+        except (json.JSONDecodeError, OutputValidationError):
+            result["invalid_json"] = True
+    return result
+
+
+class Command(BaseCommand):
+    help = "Replays recorded LLM prompts (LLM_PROMPT_SAMPLE_PATH) through candidate routes and reports latency, cost, truncation and JSON validity per helper"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", default=None, help="Prompt sample JSONL file (default: settings.LLM_PROMPT_SAMPLE_PATH)")
+        parser.add_argument("--helper", action="append", help="Only replay this helper (repeatable)")
+        parser.add_argument("--limit", type=int, default=20, help="Samples per helper")
+        parser.add_argument(
+            "--candidate", action="append", default=[],
+            help="Fixed route to compare, e.g. mini-1500=gpt-4o-mini-2024-07-18:1500:60 (repeatable)",
+        )
+        parser.add_argument("--routes-file", help="JSON file shaped like settings.LLM_ROUTES to compare as a whole policy")
+        parser.add_argument("--skip-current", action="store_true", help="Do not replay through the current LLM_ROUTES")
+        parser.add_argument("--dry-run", action="store_true", help="Only show which route each candidate picks, without calling the API")
+        parser.add_argument("--output", help="Write every measurement to this JSON file")
+
+    def handle(self, *args, **options):
+        path = options["samples"] or settings.LLM_PROMPT_SAMPLE_PATH
+        if not path:
+            raise CommandError("No prompt samples: pass --samples or set LLM_PROMPT_SAMPLE_PATH.")
+
+        samples = load_prompt_samples(path, helpers=options["helper"], limit_per_helper=options["limit"])
+        if not samples:
+            self.stdout.write("No prompt samples to replay.")
+            return
+
+        # label -> function(sample) -> request options
+        candidates = {}
+        if not options["skip_current"]:
+            candidates["current"] = lambda sample: self._route(sample, None)
+        if options["routes_file"]:
+            with open(options["routes_file"], encoding="utf-8") as f:
+                routes = {**settings.LLM_ROUTES, **json.load(f)}
+            candidates["routes-file"] = lambda sample, routes=routes: self._route(sample, routes)
+        for spec in options["candidate"]:
+            label, fixed = parse_candidate(spec)
+            candidates[label] = lambda sample, fixed=fixed: fixed
+        if not candidates:
+            raise CommandError("Nothing to compare: give --candidate or --routes-file, or drop --skip-current.")
+
+        self.stdout.write(f"Replaying {len(samples)} samples through {len(candidates)} routes: {', '.join(candidates)}")
+
+        # Tag the replayed calls in the usage ledger
+        token = set_llm_call_context(source="evaluate_llm_routes")
+        measurements = []
+        try:
+            for sample in samples:
+                for label, route_for in candidates.items():
+                    request_options = route_for(sample)
+                    measurement = {"helper": sample["helper"], "candidate": label, "input_tokens": sample.get("input_tokens"), **request_options}
+                    if not options["dry_run"]:
+                        measurement.update(replay(sample, request_options))
+                    measurements.append(measurement)
+        finally:
+            reset_llm_call_context(token)
+
+        self._report(measurements, list(candidates), options["dry_run"])
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(measurements, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote measurements to {options['output']}"))
+
+    def _route(self, sample, routes):
+        default = "default_json" if sample.get("response_format") else "default"
+        return resolve_route(sample["helper"], sample["messages"], default=default, routes=routes)
+
+    def _report(self, measurements, labels, dry_run):
+        for helper in sorted({m["helper"] for m in measurements}):
+            self.stdout.write(f"\n{helper}")
+            for label in labels:
+                rows = [m for m in measurements if m["helper"] == helper and m["candidate"] == label]
+                if not rows:
+                    continue
+
+                models = ", ".join(sorted({f"{m['model']}/{m['max_tokens']}" for m in rows}))
+                if dry_run:
+                    self.stdout.write(f"  {label}: {len(rows)} samples -> {models}")
+                    continue
+
+                answered = [m for m in rows if "error" not in m]
+                latencies = [m["latency_seconds"] for m in answered]
+                line = f"  {label} ({models}): {len(rows)} calls, {len(rows) - len(answered)} errors"
+                if answered:
+                    line += (
+                        f", latency p50 {percentile(latencies, 0.5):.2f}s / p95 {percentile(latencies, 0.95):.2f}s"
+                        f", ${sum(m['cost_usd'] for m in answered) / len(answered):.5f} per call"
+                        f", {sum(m['completion_tokens'] for m in answered) / len(answered):.0f} output tokens"
+                        f", {sum(m['truncated'] for m in answered) / len(answered):.0%} truncated"
+                        f", {sum(m['invalid_json'] for m in answered) / len(answered):.0%} invalid JSON"
+                    )
+                self.stdout.write(line)
@@ -0,0 +1,76 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from solutions.models import LLMBatchRequest
+from solutions.llm_batch_utils import helper_for_target
+from solutions.llm_usage_utils import estimate_cost
+from solutions.milvus_llm_utils import create_chat_completion
+
+
+class Command(BaseCommand):
+    help = "Reports throughput and cost per scenario of batch-mode scenario mining, compared with interactive mode"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="Only include requests created in the last N days")
+        parser.add_argument(
+            "--interactive-sample", type=int, default=0,
+            help="Re-send N completed batch requests through the interactive API to measure its latency and cost",
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options["days"])
+        completed = list(
+            LLMBatchRequest.objects.filter(status="completed", created_at__gte=since).order_by("created_at")
+        )
+        if not completed:
+            self.stdout.write("No completed batch requests in this period.")
+            return
+
+        scenarios = {}
+        for r in completed:
+            model = r.body.get("model")
+            totals = scenarios.setdefault(r.scenario_id, {"requests": 0, "batch_cost": 0.0, "interactive_cost": 0.0, "turnaround": []})
+            totals["requests"] += 1
+            totals["batch_cost"] += estimate_cost(model, r.prompt_tokens, r.completion_tokens, batch=True)
+            totals["interactive_cost"] += estimate_cost(model, r.prompt_tokens, r.completion_tokens)
+            totals["turnaround"].append((r.completed_at - r.created_at).total_seconds())
+
+        window_hours = max((completed[-1].completed_at - completed[0].created_at).total_seconds() / 3600, 1 / 60)
+        scenario_count = len(scenarios)
+        batch_cost = sum(s["batch_cost"] for s in scenarios.values())
+        interactive_cost = sum(s["interactive_cost"] for s in scenarios.values())
+        turnaround = sorted(t for s in scenarios.values() for t in s["turnaround"])
+
+        self.stdout.write(f"Batch mode, last {options['days']} days")
+        self.stdout.write(f"  scenarios: {scenario_count}, requests: {len(completed)}")
+        self.stdout.write(f"  throughput: {len(completed) / window_hours:.1f} requests/hour, {scenario_count / window_hours:.1f} scenarios/hour")
+        self.stdout.write(f"  turnaround per request: median {turnaround[len(turnaround) // 2]:.0f}s, max {turnaround[-1]:.0f}s")
+        self.stdout.write(f"  cost per scenario: ${batch_cost / scenario_count:.5f} (batch) vs ${interactive_cost / scenario_count:.5f} (same tokens at interactive price)")
+
+        if options["interactive_sample"]:
+            self._measure_interactive(completed[-options["interactive_sample"]:], len(completed) / scenario_count)
+
+    def _measure_interactive(self, sample, requests_per_scenario):
+        latencies = []
+        cost = 0.0
+        for r in sample:
+            start = time.monotonic()
+            response = create_chat_completion(helper=helper_for_target(r.target), **r.body)
+            latencies.append(time.monotonic() - start)
+            if response.usage:
+                cost += estimate_cost(r.body.get("model"), response.usage.prompt_tokens, response.usage.completion_tokens)
+
+        latencies.sort()
+        self.stdout.write(f"Interactive mode, {len(sample)} sampled requests")
+        self.stdout.write(f"  latency per request: median {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s")
+        self.stdout.write(f"  sequential throughput: {3600 / (sum(latencies) / len(latencies)):.1f} requests/hour")
+        self.stdout.write(f"  cost per scenario: ${cost / len(sample) * requests_per_scenario:.5f}")
@@ -10,11 +10,12 @@ Unauthorized copying, distribution, or modification of this software is strictly
 from django.core.management.base import BaseCommand
 from pymilvus import MilvusClient
 from django.conf import settings
+from solutions.kb_language_utils import kb_collection_name
 
 class Command(BaseCommand):
-    help = "Loads the kb_embeddings_collection into Milvus memory"
+    help = "Loads the knowledge base collection (kb_embeddings_collection, or the language-partitioned one) into Milvus memory"
 
     def handle(self, *args, **options):
         milvus_client = MilvusClient(uri=settings.MILVUS_URI, token=settings.MILVUS_TOKEN)
-        milvus_client.load_collection("kb_embeddings_collection")
+        milvus_client.load_collection(kb_collection_name())
         self.stdout.write(self.style.SUCCESS("Milvus collection loaded and ready!"))
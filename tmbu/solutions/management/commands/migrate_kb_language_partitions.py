@@ -0,0 +1,70 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from solutions.milvus_connection_utils import ensure_milvus_connection
+from solutions.corekb_milvus_setup_utils import create_milvus_kb_collection
+from solutions.kb_language_utils import detect_language
+
+
+class Command(BaseCommand):
+    help = "Copies the flat knowledge base collection into the collection partitioned by language, detecting each factor's language"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=settings.KB_COLLECTION_NAME)
+        parser.add_argument("--target", default=settings.KB_PARTITIONED_COLLECTION_NAME)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--drop-target", action="store_true", help="Drop the target collection first")
+
+    def handle(self, *args, **options):
+        source, target = options["source"], options["target"]
+        if source == target:
+            raise CommandError("Source and target collections must differ")
+
+        milvus_client = ensure_milvus_connection()
+        try:
+            if source not in milvus_client.list_collections():
+                raise CommandError(f"Collection '{source}' does not exist")
+
+            if options["drop_target"] and target in milvus_client.list_collections():
+                milvus_client.drop_collection(target)
+                self.stdout.write(f"Dropped '{target}'")
+
+            create_milvus_kb_collection(target, partition_by_language=True)
+            milvus_client.load_collection(source)
+
+            languages = Counter()
+            iterator = milvus_client.query_iterator(
+                collection_name=source,
+                batch_size=options["batch_size"],
+                filter="",
+                output_fields=["factor_text", "factor_vector"],
+            )
+            try:
+                while True:
+                    rows = iterator.next()
+                    if not rows:
+                        break
+                    data = []
+                    for row in rows:
+                        language = detect_language(row["factor_text"], default="en")
+                        languages[language] += 1
+                        data.append({"factor_vector": row["factor_vector"], "factor_text": row["factor_text"], "language": language})
+                    milvus_client.insert(target, data)
+                    self.stdout.write(f"Copied {sum(languages.values())} factors")
+            finally:
+                iterator.close()
+
+            milvus_client.load_collection(target)
+        finally:
+            milvus_client.close()
+
+        summary = ", ".join(f"{language}: {count}" for language, count in sorted(languages.items())) or "none"
+        self.stdout.write(self.style.SUCCESS(f"Copied '{source}' into '{target}' ({summary}). Set KB_LANGUAGE_PARTITIONING=True to search it."))
@@ -0,0 +1,29 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+from django.core.management.base import BaseCommand
+from solutions.openai_rate_limit_utils import get_openai_rate_limit_status
+
+class Command(BaseCommand):
+    help = "Shows the current shared OpenAI request/token budget and queueing wait times"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Print the status as JSON")
+
+    def handle(self, *args, **options):
+        status = get_openai_rate_limit_status()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(status))
+            return
+
+        for key, value in status.items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            self.stdout.write(f"{key}: {value}")
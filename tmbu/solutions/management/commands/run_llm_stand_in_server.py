@@ -0,0 +1,277 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import re
+import json
+import random
+import time
+import uuid
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand, CommandError
+from solutions.openai_rate_limit_utils import estimate_request_tokens
+from solutions.llm_fixture_utils import FixtureStore, parse_latency
+from solutions.prompt_budget_utils import count_tokens
+
+
+# In-memory state of the stand-in server
+_files = {}
+_batches = {}
+_state_lock = threading.Lock()
+
+
+# Smallest value that satisfies a strict JSON schema, with stand-in text in every string
+def sample_from_schema(schema, text):
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = schema_type[0]
+
+    if "enum" in schema:
+        return schema["enum"][0]
+    if schema_type == "object":
+        return {key: sample_from_schema(child, text) for key, child in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [sample_from_schema(schema["items"], text)] if "items" in schema else []
+    if schema_type in ("integer", "number"):
+        return 0
+    if schema_type == "boolean":
+        return False
+    if schema_type == "null":
+        return None
+    return text
+
+
+def _chat_completion(body, content, finish_reason="stop", usage=None):
+    if usage is None:
+        prompt_tokens = estimate_request_tokens(body.get("messages", []))
+        completion_tokens = count_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stand-in"),
+        "choices": [{"index": 0, "finish_reason": finish_reason, "logprobs": None, "message": {"role": "assistant", "content": content}}],
+        "usage": usage,
+    }
+
+
+def fake_chat_completion(body):
+    max_tokens = body.get("max_tokens") or 600
+
+    response_format = body.get("response_format") or {}
+    text = " ".join(["Stand-in response."] * max(1, min(max_tokens, 300) // 5))
+
+    if response_format.get("type") == "json_schema":
+        content = json.dumps(sample_from_schema(response_format["json_schema"]["schema"], text))
+    elif response_format.get("type") == "json_object":
+        content = "{}"
+    else:
+        content = text
+
+    return _chat_completion(body, content)
+
+
+# Recorded answer with its recorded token usage, so load tests see realistic sizes
+def fixture_chat_completion(body, fixture):
+    response = fixture["response"]
+    return _chat_completion(body, response["content"] or "", response.get("finish_reason") or "stop", response.get("usage"))
+
+
+def chat_completion(body, fixtures, helper=None):
+    """Returns (response body, matched fixture or None)."""
+    fixture = fixtures.match(body, helper) if fixtures is not None else None
+    if fixture is None:
+        return fake_chat_completion(body), None
+    return fixture_chat_completion(body, fixture), fixture
+
+
+def _file_object(file_id):
+    file = _files[file_id]
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(file["content"]),
+        "created_at": file["created_at"],
+        "filename": file["filename"],
+        "purpose": file["purpose"],
+        "status": "processed",
+    }
+
+
+def _store_file(content, filename, purpose):
+    file_id = f"file-{uuid.uuid4().hex}"
+    _files[file_id] = {"content": content, "filename": filename, "purpose": purpose, "created_at": int(time.time())}
+    return file_id
+
+
+# Run every line of the input file once the batch delay has passed
+def _finish_batch_if_due(batch, batch_delay, fixtures):
+    if batch["status"] != "in_progress" or time.time() - batch["created_at"] < batch_delay:
+        return
+
+    output_lines = []
+    for line in _files[batch["input_file_id"]]["content"].decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        output_lines.append(json.dumps({
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": item["custom_id"],
+            "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": chat_completion(item["body"], fixtures)[0]},
+            "error": None,
+        }))
+
+    batch["output_file_id"] = _store_file("\n".join(output_lines).encode("utf-8"), "batch_output.jsonl", "batch_output")
+    batch["status"] = "completed"
+    batch["completed_at"] = int(time.time())
+    batch["request_counts"] = {"total": len(output_lines), "completed": len(output_lines), "failed": 0}
+
+
+def make_handler(batch_delay, latency_for, fixtures=None):
+
+    class StandInHandler(BaseHTTPRequestHandler):
+
+        def _send_json(self, payload, status=200):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_POST(self):
+            path = self.path.split("?")[0]
+            body = self._read_body()
+
+            if path == "/v1/chat/completions":
+                helper = self.headers.get("X-LLM-Helper")
+                response, fixture = chat_completion(json.loads(body), fixtures, helper)
+                time.sleep(latency_for(helper or (fixture or {}).get("helper"))(fixture))
+                return self._send_json(response)
+
+            if path == "/v1/files":
+                # Multipart upload: parse it as a MIME message
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body
+                )
+                fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+                file_part = fields["file"]
+                with _state_lock:
+                    file_id = _store_file(file_part.get_payload(decode=True), file_part.get_filename() or "upload.jsonl", fields["purpose"].get_content().strip())
+                    return self._send_json(_file_object(file_id))
+
+            if path == "/v1/batches":
+                request = json.loads(body)
+                batch_id = f"batch_{uuid.uuid4().hex}"
+                with _state_lock:
+                    _batches[batch_id] = {
+                        "id": batch_id,
+                        "object": "batch",
+                        "endpoint": request["endpoint"],
+                        "input_file_id": request["input_file_id"],
+                        "completion_window": request.get("completion_window", "24h"),
+                        "metadata": request.get("metadata"),
+                        "status": "in_progress",
+                        "created_at": int(time.time()),
+                        "output_file_id": None,
+                        "error_file_id": None,
+                        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                    }
+                    return self._send_json(_batches[batch_id])
+
+            self._send_json({"error": {"message": f"Unknown path {path}"}}, status=404)
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+
+            if path == "/v1/stand-in/stats":
+                return self._send_json({"fixtures": len(fixtures) if fixtures is not None else 0, "hits": fixtures.hits if fixtures is not None else {}})
+
+            with _state_lock:
+                match = re.fullmatch(r"/v1/batches/([\w-]+)", path)
+                if match and match.group(1) in _batches:
+                    batch = _batches[match.group(1)]
+                    _finish_batch_if_due(batch, batch_delay, fixtures)
+                    return self._send_json(batch)
+
+                match = re.fullmatch(r"/v1/files/([\w-]+)(/content)?", path)
+                if match and match.group(1) in _files:
+                    if not match.group(2):
+                        return self._send_json(_file_object(match.group(1)))
+                    content = _files[match.group(1)]["content"]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                    return
+
+            self._send_json({"error": {"message": f"Unknown path {path}"}}, status=404)
+
+    return StandInHandler
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local stand-in for the OpenAI chat, files and batches endpoints. Point OPENAI_BASE_URL at http://<host>:<port>/v1. "
+        "With --fixtures it replays responses recorded with LLM_FIXTURE_MODE=record."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--batch-delay", type=float, default=30.0, help="Seconds before a submitted batch completes")
+        parser.add_argument("--chat-latency", type=float, default=1.0, help="Seconds each chat completion takes (when --latency is not given)")
+        parser.add_argument("--fixtures", help="Recorded fixture JSONL (LLM_FIXTURE_PATH) to replay")
+        parser.add_argument(
+            "--latency",
+            help="Latency distribution: fixed:S, uniform:MIN,MAX, normal:MEAN,STDDEV, lognormal:MU,SIGMA or recorded[:SCALE]",
+        )
+        parser.add_argument("--helper-latency", action="append", default=[], help="Per-helper distribution, e.g. aggregate_individual_traits=lognormal:2.3,0.4 (repeatable)")
+        parser.add_argument("--seed", type=int, help="Random seed for reproducible latency and fixture choice")
+
+    def handle(self, *args, **options):
+        if options["seed"] is not None:
+            random.seed(options["seed"])
+
+        try:
+            default_latency = parse_latency(options["latency"] or f"fixed:{options['chat_latency']}")
+            helper_latency = {}
+            for spec in options["helper_latency"]:
+                helper, _, distribution = spec.partition("=")
+                helper_latency[helper] = parse_latency(distribution)
+        except (ValueError, IndexError) as e:
+            raise CommandError(f"Invalid latency distribution: {e}")
+
+        fixtures = None
+        if options["fixtures"]:
+            fixtures = FixtureStore.load(options["fixtures"])
+            self.stdout.write(f"Loaded {len(fixtures)} fixtures for {len(fixtures.by_helper)} helpers")
+
+        handler = make_handler(options["batch_delay"], lambda helper: helper_latency.get(helper, default_latency), fixtures)
+        server = ThreadingHTTPServer((options["host"], options["port"]), handler)
+        self.stdout.write(self.style.SUCCESS(f"LLM stand-in server on http://{options['host']}:{options['port']}/v1"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if fixtures is not None:
+                self.stdout.write(f"Fixture matches: {fixtures.hits}")
@@ -0,0 +1,38 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from solutions.models import SpeculativeFactorAdvice
+from solutions.speculation_utils import speculation_summary
+
+
+class Command(BaseCommand):
+    help = "Reports the hit rate, wasted spend and saved latency of speculative factor advice"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="Speculations created in the last N days")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options["days"])
+        summary = speculation_summary(SpeculativeFactorAdvice.objects.filter(created_at__gte=since))
+
+        if not summary["total"]:
+            self.stdout.write(f"No speculations in the last {options['days']} days.")
+            return
+
+        self.stdout.write(
+            f"{summary['total']} speculations in the last {options['days']} days: "
+            f"{summary['hits']} hits, {summary['joined']} joined, {summary['misses']} misses, "
+            f"{summary['not_ready']} not ready, {summary['abandoned']} abandoned"
+        )
+        self.stdout.write(f"Hit rate {summary['hit_rate']:.0%} of decided speculations")
+        wasted_share = summary["wasted_usd"] / summary["spend_usd"] if summary["spend_usd"] else 0.0
+        self.stdout.write(f"Spend ${summary['spend_usd']:.4f}, wasted ${summary['wasted_usd']:.4f} ({wasted_share:.0%})")
+        self.stdout.write(f"Factor advice time saved on hits: {summary['saved_seconds']:.1f}s")
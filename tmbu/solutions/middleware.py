@@ -0,0 +1,94 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import uuid
+import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .llm_ledger_utils import set_llm_call_context, update_llm_call_context, reset_llm_call_context
+from .request_stats_utils import start_request_stats, stop_request_stats
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUsageContextMiddleware:
+    """Tag every OpenAI call made while handling a request with the request id, user and view."""
+
+    # Async-capable, so the async views run without a thread under the ASGI server
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = set_llm_call_context(request_id=request.headers.get("X-Request-ID") or uuid.uuid4().hex, source=request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_llm_call_context(token)
+
+    async def __acall__(self, request):
+        token = set_llm_call_context(request_id=request.headers.get("X-Request-ID") or uuid.uuid4().hex, source=request.path)
+        try:
+            return await self.get_response(request)
+        finally:
+            reset_llm_call_context(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        user = getattr(request, "user", None)
+        update_llm_call_context(
+            source=request.resolver_match.url_name or view_func.__name__,
+            user_id=user.id if user is not None and user.is_authenticated else None,
+        )
+
+
+class RequestStatsMiddleware:
+    """Count the database queries of each request and those the caches saved (solutions.request_stats_utils)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_STATS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats, token = start_request_stats()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_request_stats(token)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = start_request_stats()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_request_stats(token)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        # Streaming responses (the event stream) are counted up to their first byte only
+        response["X-DB-Queries"] = f"{stats.queries}; saved={stats.saved}"
+        log = logger.warning if stats.queries > settings.REQUEST_STATS_SLOW_QUERY_COUNT else logger.debug
+        log(f"{request.method} {request.path}: {stats.queries} queries, {stats.saved} saved by caches")
+        return response
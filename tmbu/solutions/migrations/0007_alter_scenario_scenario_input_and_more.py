@@ -0,0 +1,286 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:09
+
+import django.db.models.deletion
+import django.utils.timezone
+import solutions.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0006_alter_scenario_scenario_input_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scenario',
+            name='scenario_input',
+            field=models.TextField(validators=[solutions.models.validate_word_count]),
+        ),
+        migrations.AlterField(
+            model_name='scenario',
+            name='scenario_solution_input',
+            field=models.TextField(blank=True, null=True, validators=[solutions.models.validate_word_count]),
+        ),
+        migrations.AlterField(
+            model_name='scenario',
+            name='user_experience',
+            field=models.TextField(blank=True, null=True, validators=[solutions.models.validate_word_count]),
+        ),
+        migrations.CreateModel(
+            name='Actors',
+            fields=[
+                ('actor_id', models.AutoField(primary_key=True, serialize=False)),
+                ('name_or_alias', models.CharField(max_length=255)),
+                ('actor_type', models.CharField(choices=[('individual', 'Individual'), ('group', 'Group')], default='individual', max_length=20)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GeneratedSimulation',
+            fields=[
+                ('generated_simulation_id', models.AutoField(primary_key=True, serialize=False)),
+                ('actors', models.JSONField()),
+                ('scenario', models.TextField()),
+                ('result', models.JSONField()),
+                ('actors_traits_snapshot', models.JSONField()),
+                ('actors_relations_snapshot', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GlobalActorsProfiles',
+            fields=[
+                ('global_actors_profiles_id', models.AutoField(primary_key=True, serialize=False)),
+                ('global_actors_profiles', models.TextField(blank=True, default=None, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupProfile',
+            fields=[
+                ('group_profile_id', models.AutoField(primary_key=True, serialize=False)),
+                ('canonical_name', models.CharField(max_length=255)),
+                ('aliases', models.JSONField(blank=True, default=list)),
+                ('group_type', models.TextField(blank=True, default=None, null=True)),
+                ('domain', models.TextField(blank=True, default=None, null=True)),
+                ('size', models.TextField(blank=True, default=None, null=True)),
+                ('mission_vision_value', models.TextField(blank=True, default=None, null=True)),
+                ('goal_strategy', models.TextField(blank=True, default=None, null=True)),
+                ('objectives_plan', models.TextField(blank=True, default=None, null=True)),
+                ('governance', models.TextField(blank=True, default=None, null=True)),
+                ('organizational_structure', models.TextField(blank=True, default=None, null=True)),
+                ('operation_system', models.TextField(blank=True, default=None, null=True)),
+                ('organizational_politics', models.TextField(blank=True, default=None, null=True)),
+                ('influence', models.TextField(blank=True, default=None, null=True)),
+                ('leadership', models.TextField(blank=True, default=None, null=True)),
+                ('culture', models.TextField(blank=True, default=None, null=True)),
+                ('performance', models.TextField(blank=True, default=None, null=True)),
+                ('challenge', models.TextField(blank=True, default=None, null=True)),
+                ('funding_resources_budget', models.TextField(blank=True, default=None, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IndividualProfile',
+            fields=[
+                ('individual_profile_id', models.AutoField(primary_key=True, serialize=False)),
+                ('canonical_name', models.CharField(max_length=255)),
+                ('aliases', models.JSONField(blank=True, default=list)),
+                ('cognitive_pattern', models.TextField(blank=True, default=None, null=True)),
+                ('affect_pattern', models.TextField(blank=True, default=None, null=True)),
+                ('action_pattern', models.TextField(blank=True, default=None, null=True)),
+                ('personality', models.TextField(blank=True, default=None, null=True)),
+                ('beliefs_values', models.TextField(blank=True, default=None, null=True)),
+                ('priorities', models.TextField(blank=True, default=None, null=True)),
+                ('life_style', models.TextField(blank=True, default=None, null=True)),
+                ('identity', models.TextField(blank=True, default=None, null=True)),
+                ('capabilities', models.TextField(blank=True, default=None, null=True)),
+                ('family', models.TextField(blank=True, default=None, null=True)),
+                ('marriage_intimate_relationship', models.TextField(blank=True, default=None, null=True)),
+                ('education', models.TextField(blank=True, default=None, null=True)),
+                ('occupation_job_industry', models.TextField(blank=True, default=None, null=True)),
+                ('social_economic_status', models.TextField(blank=True, default=None, null=True)),
+                ('social_network', models.TextField(blank=True, default=None, null=True)),
+                ('biological_characteristics', models.TextField(blank=True, default=None, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LiveSimulation',
+            fields=[
+                ('live_simulation_id', models.AutoField(primary_key=True, serialize=False)),
+                ('actors', models.JSONField(default=list)),
+                ('scenario', models.TextField()),
+                ('interactions', models.JSONField(default=list)),
+                ('actors_profiles_snapshot', models.JSONField(blank=True, default=dict)),
+                ('actors_relation_statuses_snapshot', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScenarioForMining',
+            fields=[
+                ('scenario_id', models.AutoField(primary_key=True, serialize=False)),
+                ('scenario_input', models.TextField(validators=[solutions.models.validate_word_count])),
+                ('scenario_input_time', models.DateTimeField(default=django.utils.timezone.now)),
+                ('scenario_form_submission_count', models.IntegerField(default=0)),
+                ('scenario_submitted', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScenarioDynamics',
+            fields=[
+                ('scenario_dynamics_id', models.AutoField(primary_key=True, serialize=False)),
+                ('scenario_dynamics', models.TextField(blank=True, default=None, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scenario_dynamics', to='solutions.scenarioformining')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScenarioAnalysisPrediction',
+            fields=[
+                ('scenario_analysis_prediction_id', models.AutoField(primary_key=True, serialize=False)),
+                ('scenario_analysis_prediction', models.TextField(blank=True, default=None, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scenario_analyze_predict', to='solutions.scenarioformining')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScenarioActors',
+            fields=[
+                ('scenario_actors_id', models.AutoField(primary_key=True, serialize=False)),
+                ('scenario_actors_traits', models.TextField(blank=True, default=None, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scenario_actors', to='solutions.scenarioformining')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Interactions',
+            fields=[
+                ('interaction_id', models.AutoField(primary_key=True, serialize=False)),
+                ('behavior_description', models.TextField(blank=True, default=None, null=True)),
+                ('env', models.TextField(blank=True, help_text='Relevant social, political, economic, cultural conditions', null=True)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actions', to='solutions.actors')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('scenario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interactions', to='solutions.scenarioformining')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InteractionRelations',
+            fields=[
+                ('interaction_relation_id', models.AutoField(primary_key=True, serialize=False)),
+                ('relation_description', models.TextField(blank=True, null=True)),
+                ('related_actors_relationship_status', models.TextField(blank=True, null=True)),
+                ('related_actors', models.ManyToManyField(blank=True, help_text='Actors explicitly involved in this relation', related_name='related_interaction_actors', to='solutions.actors')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_relations', to='solutions.interactions')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_relations', to='solutions.interactions')),
+                ('scenario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interaction_relations', to='solutions.scenarioformining')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IndividualTraits',
+            fields=[
+                ('individual_traits_id', models.AutoField(primary_key=True, serialize=False)),
+                ('cognitive_pattern', models.TextField(blank=True, default=None, null=True)),
+                ('affect_pattern', models.TextField(blank=True, default=None, null=True)),
+                ('action_pattern', models.TextField(blank=True, default=None, null=True)),
+                ('personality', models.TextField(blank=True, default=None, null=True)),
+                ('beliefs_values', models.TextField(blank=True, default=None, null=True)),
+                ('priorities', models.TextField(blank=True, default=None, null=True)),
+                ('life_style', models.TextField(blank=True, default=None, null=True)),
+                ('identity', models.TextField(blank=True, default=None, null=True)),
+                ('capabilities', models.TextField(blank=True, default=None, null=True)),
+                ('family', models.TextField(blank=True, default=None, null=True)),
+                ('marriage_intimate_relationship', models.TextField(blank=True, default=None, null=True)),
+                ('education', models.TextField(blank=True, default=None, null=True)),
+                ('occupation_job_industry', models.TextField(blank=True, default=None, null=True)),
+                ('social_economic_status', models.TextField(blank=True, default=None, null=True)),
+                ('social_network', models.TextField(blank=True, default=None, null=True)),
+                ('biological_characteristics', models.TextField(blank=True, default=None, null=True)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='individual_traits', to='solutions.actors')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('scenario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interactions_individual_traits', to='solutions.scenarioformining')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupTraits',
+            fields=[
+                ('group_traits_id', models.AutoField(primary_key=True, serialize=False)),
+                ('group_type', models.TextField(blank=True, default=None, null=True)),
+                ('domain', models.TextField(blank=True, default=None, null=True)),
+                ('size', models.TextField(blank=True, default=None, null=True)),
+                ('mission_vision_value', models.TextField(blank=True, default=None, null=True)),
+                ('goal_strategy', models.TextField(blank=True, default=None, null=True)),
+                ('objectives_plan', models.TextField(blank=True, default=None, null=True)),
+                ('governance', models.TextField(blank=True, default=None, null=True)),
+                ('organizational_structure', models.TextField(blank=True, default=None, null=True)),
+                ('operation_system', models.TextField(blank=True, default=None, null=True)),
+                ('organizational_politics', models.TextField(blank=True, default=None, null=True)),
+                ('influence', models.TextField(blank=True, default=None, null=True)),
+                ('leadership', models.TextField(blank=True, default=None, null=True)),
+                ('culture', models.TextField(blank=True, default=None, null=True)),
+                ('performance', models.TextField(blank=True, default=None, null=True)),
+                ('challenge', models.TextField(blank=True, default=None, null=True)),
+                ('funding_resources_budget', models.TextField(blank=True, default=None, null=True)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_traits', to='solutions.actors')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('scenario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interactions_group_traits', to='solutions.scenarioformining')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='actors',
+            name='scenario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actors', to='solutions.scenarioformining'),
+        ),
+        migrations.CreateModel(
+            name='ScenarioNeeds',
+            fields=[
+                ('scenario_needs_id', models.AutoField(primary_key=True, serialize=False)),
+                ('scenario_needs', models.TextField(blank=True, default=None, null=True)),
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scenario_needs', to='solutions.scenarioformining')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScenarioQuickSolution',
+            fields=[
+                ('scenario_id', models.AutoField(primary_key=True, serialize=False)),
+                ('scenario_input', models.TextField(validators=[solutions.models.validate_word_count])),
+                ('scenario_input_time', models.DateTimeField(default=django.utils.timezone.now)),
+                ('scenario_quick_solution', models.TextField(blank=True, default=None, null=True)),
+                ('scenario_form_submission_count', models.IntegerField(default=0)),
+                ('scenario_submitted', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScenarioSkillsResources',
+            fields=[
+                ('scenario_skills_resources_id', models.AutoField(primary_key=True, serialize=False)),
+                ('scenario_skills_resources', models.TextField(blank=True, default=None, null=True)),
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scenario_skills_resources', to='solutions.scenarioformining')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SocialNetworkGraphCache',
+            fields=[
+                ('social_network_graph_id', models.AutoField(primary_key=True, serialize=False)),
+                ('graph_data', models.JSONField(default=dict)),
+                ('last_built', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
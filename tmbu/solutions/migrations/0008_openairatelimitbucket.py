@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0007_alter_scenario_scenario_input_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenAIRateLimitBucket',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('requests_available', models.FloatField(default=0)),
+                ('tokens_available', models.FloatField(default=0)),
+                ('last_refill', models.DateTimeField(default=django.utils.timezone.now)),
+                ('total_waits', models.PositiveIntegerField(default=0)),
+                ('total_wait_seconds', models.FloatField(default=0)),
+                ('last_wait_seconds', models.FloatField(default=0)),
+            ],
+        ),
+    ]
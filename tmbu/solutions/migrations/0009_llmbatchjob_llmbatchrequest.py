@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0008_openairatelimitbucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMBatchJob',
+            fields=[
+                ('batch_job_id', models.AutoField(primary_key=True, serialize=False)),
+                ('openai_batch_id', models.CharField(max_length=100, unique=True)),
+                ('input_file_id', models.CharField(max_length=100)),
+                ('output_file_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('error_file_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('validating', 'Validating'), ('in_progress', 'In progress'), ('finalizing', 'Finalizing'), ('completed', 'Completed'), ('failed', 'Failed'), ('expired', 'Expired'), ('cancelling', 'Cancelling'), ('cancelled', 'Cancelled')], default='validating', max_length=20)),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LLMBatchRequest',
+            fields=[
+                ('batch_request_id', models.AutoField(primary_key=True, serialize=False)),
+                ('target', models.CharField(choices=[('actors', 'Scenario actors'), ('dynamics', 'Scenario dynamics'), ('needs', 'Scenario needs'), ('skills_resources', 'Scenario skills and resources'), ('analysis_prediction', 'Scenario analysis and prediction')], max_length=30)),
+                ('custom_id', models.CharField(max_length=100, unique=True)),
+                ('body', models.JSONField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('submitted', 'Submitted'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('batch_attempts', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('batch_job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requests', to='solutions.llmbatchjob')),
+                ('scenario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='llm_batch_requests', to='solutions.scenarioformining')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
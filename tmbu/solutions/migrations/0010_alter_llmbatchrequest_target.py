@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0009_llmbatchjob_llmbatchrequest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='llmbatchrequest',
+            name='target',
+            field=models.CharField(choices=[('actors', 'Scenario actors'), ('dynamics', 'Scenario dynamics'), ('needs', 'Scenario needs'), ('skills_resources', 'Scenario skills and resources'), ('analysis_prediction', 'Scenario analysis and prediction'), ('consolidated', 'Consolidated scenario analysis')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0010_alter_llmbatchrequest_target'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMOutputParseStats',
+            fields=[
+                ('helper', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('parse_failures', models.PositiveIntegerField(default=0)),
+                ('repair_attempts', models.PositiveIntegerField(default=0)),
+                ('repair_successes', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0011_llmoutputparsestats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMUsageRecord',
+            fields=[
+                ('llm_usage_record_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('helper', models.CharField(db_index=True, max_length=100)),
+                ('feature', models.CharField(db_index=True, max_length=50)),
+                ('source', models.CharField(blank=True, max_length=200, null=True)),
+                ('request_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('task_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('cached_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('latency_seconds', models.FloatField()),
+                ('cost_usd', models.FloatField(default=0)),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('rate_limited', 'Rate limited'), ('error', 'Error')], default='success', max_length=20)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0013_singleflightlease'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScenarioArtifact',
+            fields=[
+                ('scenario_artifact_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('scenario_type', models.CharField(choices=[('scenario', 'Scenario'), ('quick_solution', 'Quick solution')], max_length=20)),
+                ('scenario_id', models.IntegerField()),
+                ('query_mode', models.CharField(max_length=20)),
+                ('input_hash', models.CharField(max_length=64)),
+                ('queries', models.JSONField(default=list)),
+                ('query_embeddings', models.JSONField(default=list)),
+                ('factor_hits', models.JSONField(default=list)),
+                ('relevant_factors', models.TextField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reuse_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='scenarioartifact',
+            constraint=models.UniqueConstraint(fields=('scenario_type', 'scenario_id', 'query_mode'), name='unique_scenario_artifact'),
+        ),
+    ]
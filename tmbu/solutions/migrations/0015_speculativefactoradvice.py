@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0014_scenarioartifact_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpeculativeFactorAdvice',
+            fields=[
+                ('speculative_factor_advice_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('scenario_input', models.TextField()),
+                ('query_mode', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('ready', 'Ready'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=20)),
+                ('factor_advice', models.TextField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('cost_usd', models.FloatField(default=0)),
+                ('compute_seconds', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, choices=[('hit', 'Served from speculation'), ('joined', 'Joined the running speculation'), ('miss', 'Input changed'), ('not_ready', 'Not ready')], max_length=20, null=True)),
+                ('similarity', models.FloatField(blank=True, null=True)),
+                ('used_at', models.DateTimeField(blank=True, null=True)),
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='speculative_factor_advice', to='solutions.scenario')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
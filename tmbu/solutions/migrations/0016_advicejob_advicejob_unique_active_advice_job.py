@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:11
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0015_speculativefactoradvice'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdviceJob',
+            fields=[
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('element_advice', 'Goal/situation review'), ('factor_advice', 'Solution ideas'), ('solution_advice', 'Strategic considerations'), ('quick_solution', 'Quick solution')], max_length=20)),
+                ('scenario_id', models.IntegerField()),
+                ('input_text', models.TextField()),
+                ('submission_count', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('superseded', 'Superseded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('language', models.CharField(blank=True, default='', max_length=10)),
+                ('progress', models.CharField(default='queued', max_length=50)),
+                ('charge_free_use', models.BooleanField(default=False)),
+                ('free_use_counted', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='advicejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('kind', 'scenario_id'), name='unique_active_advice_job'),
+        ),
+    ]
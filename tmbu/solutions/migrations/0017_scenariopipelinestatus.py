@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0016_advicejob_advicejob_unique_active_advice_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScenarioPipelineStatus',
+            fields=[
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pipeline_status', serialize=False, to='solutions.scenarioformining')),
+                ('actors_status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('batched', 'Waiting for batch'), ('ready', 'Ready'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('dynamics_status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('batched', 'Waiting for batch'), ('ready', 'Ready'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('needs_status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('batched', 'Waiting for batch'), ('ready', 'Ready'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('skills_resources_status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('batched', 'Waiting for batch'), ('ready', 'Ready'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('analysis_prediction_status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('batched', 'Waiting for batch'), ('ready', 'Ready'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
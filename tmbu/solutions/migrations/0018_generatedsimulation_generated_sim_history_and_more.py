@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0017_scenariopipelinestatus'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='generatedsimulation',
+            index=models.Index(fields=['user', '-created_at', '-generated_simulation_id'], name='generated_sim_history'),
+        ),
+        migrations.AddIndex(
+            model_name='livesimulation',
+            index=models.Index(fields=['user', '-created_at', '-live_simulation_id'], name='live_sim_history'),
+        ),
+    ]
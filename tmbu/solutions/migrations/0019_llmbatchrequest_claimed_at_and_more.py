@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0018_generatedsimulation_generated_sim_history_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmbatchrequest',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='llmbatchrequest',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('submitting', 'Submitting'), ('submitted', 'Submitted'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+    ]
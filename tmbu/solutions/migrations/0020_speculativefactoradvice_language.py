@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0019_llmbatchrequest_claimed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='speculativefactoradvice',
+            name='language',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
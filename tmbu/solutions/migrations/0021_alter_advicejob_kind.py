@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solutions', '0020_speculativefactoradvice_language'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='advicejob',
+            name='kind',
+            field=models.CharField(choices=[('element_advice', 'Goal/situation review'), ('factor_advice', 'Solution ideas'), ('solution_advice', 'Strategic considerations'), ('quick_solution', 'Quick solution'), ('scenario_mining', 'Experience mining')], max_length=20),
+        ),
+    ]
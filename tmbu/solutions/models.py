@@ -11,12 +11,14 @@ Unauthorized copying, distribution, or modification of this software is strictly
 # Create your models here.
 import os
 import re
+import uuid
 import logging
 from django.db import models
 from django.conf import settings  # For dynamic user model import
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _, get_language
 from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
@@ -372,6 +374,11 @@ class GeneratedSimulation(models.Model):
     actors_relations_snapshot = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the simulation history (solutions.simulation_history_utils)
+            models.Index(fields=["user", "-created_at", "-generated_simulation_id"], name="generated_sim_history"),
+        ]
 
     def __str__(self):
         return f"Generated Simulation {self.generated_simulation_id} on '{self.scenario}'"
@@ -388,10 +395,299 @@ class LiveSimulation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the simulation history (solutions.simulation_history_utils)
+            models.Index(fields=["user", "-created_at", "-live_simulation_id"], name="live_sim_history"),
+        ]
+
     def __str__(self):
         return f"Live Simulation {self.live_simulation_id} on '{self.scenario}'"
 
-   
+
+class OpenAIRateLimitBucket(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    requests_available = models.FloatField(default=0) # remaining requests in the per-minute budget
+    tokens_available = models.FloatField(default=0) # remaining tokens in the per-minute budget
+    last_refill = models.DateTimeField(default=timezone.now)
+    total_waits = models.PositiveIntegerField(default=0) # number of calls that had to queue
+    total_wait_seconds = models.FloatField(default=0)
+    last_wait_seconds = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"Rate limit bucket {self.name}: {self.requests_available:.0f} requests, {self.tokens_available:.0f} tokens"
+
+
+class LLMBatchJob(models.Model):
+    STATUS_CHOICES = [
+        ("validating", "Validating"),
+        ("in_progress", "In progress"),
+        ("finalizing", "Finalizing"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+        ("expired", "Expired"),
+        ("cancelling", "Cancelling"),
+        ("cancelled", "Cancelled"),
+    ]
+    TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+    batch_job_id = models.AutoField(primary_key=True)
+    openai_batch_id = models.CharField(max_length=100, unique=True)
+    input_file_id = models.CharField(max_length=100)
+    output_file_id = models.CharField(max_length=100, blank=True, null=True)
+    error_file_id = models.CharField(max_length=100, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="validating")
+    request_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    submitted_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Batch {self.openai_batch_id} ({self.status}, {self.request_count} requests)"
+
+
+class LLMBatchRequest(models.Model):
+    TARGET_CHOICES = [
+        ("actors", "Scenario actors"),
+        ("dynamics", "Scenario dynamics"),
+        ("needs", "Scenario needs"),
+        ("skills_resources", "Scenario skills and resources"),
+        ("analysis_prediction", "Scenario analysis and prediction"),
+        ("consolidated", "Consolidated scenario analysis"),
+    ]
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("submitting", "Submitting"),
+        ("submitted", "Submitted"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
+    batch_request_id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    scenario = models.ForeignKey(ScenarioForMining, on_delete=models.CASCADE, related_name="llm_batch_requests")
+    target = models.CharField(max_length=30, choices=TARGET_CHOICES)
+    custom_id = models.CharField(max_length=100, unique=True) # matches the line in the batch output file
+    body = models.JSONField() # chat completion request body
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    batch_attempts = models.PositiveIntegerField(default=0) # batches it was submitted in
+    claimed_at = models.DateTimeField(blank=True, null=True) # taken from the queue by a submission
+    batch_job = models.ForeignKey(LLMBatchJob, on_delete=models.SET_NULL, blank=True, null=True, related_name="requests")
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Batch request {self.custom_id} ({self.status})"
+
+
+class LLMOutputParseStats(models.Model):
+    helper = models.CharField(max_length=100, primary_key=True)
+    calls = models.PositiveIntegerField(default=0)
+    parse_failures = models.PositiveIntegerField(default=0) # invalid JSON or schema mismatch on the first attempt
+    repair_attempts = models.PositiveIntegerField(default=0)
+    repair_successes = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    last_failure_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.helper}: {self.parse_failures}/{self.calls} parse failures, {self.repair_successes}/{self.repair_attempts} repaired"
+
+
+class LLMUsageRecord(models.Model):
+    OUTCOME_CHOICES = [
+        ("success", "Success"),
+        ("rate_limited", "Rate limited"),
+        ("error", "Error"),
+    ]
+
+    # Append-only ledger of OpenAI calls, written in bulk by solutions.llm_ledger_utils
+    llm_usage_record_id = models.BigAutoField(primary_key=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    helper = models.CharField(max_length=100, db_index=True)
+    feature = models.CharField(max_length=50, db_index=True) # mining, simulation, quick_solution ...
+    source = models.CharField(max_length=200, blank=True, null=True) # URL name of the view or Celery task name
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, db_constraint=False, related_name="+")
+    request_id = models.CharField(max_length=64, blank=True, null=True)
+    task_id = models.CharField(max_length=64, blank=True, null=True)
+    model = models.CharField(max_length=100)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    cached_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    latency_seconds = models.FloatField()
+    cost_usd = models.FloatField(default=0)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, default="success")
+    error = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.helper} ({self.outcome}) {self.latency_seconds:.2f}s at {self.created_at}"
+
+
+class SingleflightLease(models.Model):
+    STATUS_CHOICES = [
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    # Cross-process lease for solutions.singleflight_utils: one leader runs the call, the others wait for its result
+    key = models.CharField(max_length=64, primary_key=True) # sha256 of the call name and arguments
+    name = models.CharField(max_length=100)
+    owner = models.CharField(max_length=200) # host:pid:thread of the leader
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="running")
+    result = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, null=True)
+    expires_at = models.DateTimeField(db_index=True) # a running lease past this time is taken over
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.name} {self.key[:12]} ({self.status})"
+
+
+class ScenarioArtifact(models.Model):
+    SCENARIO_TYPE_CHOICES = [
+        ("scenario", "Scenario"),
+        ("quick_solution", "Quick solution"),
+    ]
+
+    # Factor search work for one scenario input, reused by later steps while the input is unchanged.
+    # Written and read by solutions.scenario_artifact_utils, deleted by solutions.signals when the input changes.
+    scenario_artifact_id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    scenario_type = models.CharField(max_length=20, choices=SCENARIO_TYPE_CHOICES)
+    scenario_id = models.IntegerField()
+    query_mode = models.CharField(max_length=20) # "llm" or "local", see solutions.factor_query_utils
+    input_hash = models.CharField(max_length=64) # sha256 of the normalized scenario input, query mode and embedding model
+    queries = models.JSONField(default=list) # summary bullet points or local segments
+    query_embeddings = models.JSONField(default=list)
+    factor_hits = models.JSONField(default=list) # per query: [{"id", "factor_text", "score"}]
+    relevant_factors = models.TextField() # formatted as sent to the LLM
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    reuse_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scenario_type", "scenario_id", "query_mode"], name="unique_scenario_artifact"),
+        ]
+
+    def __str__(self):
+        return f"Artifact for {self.scenario_type} {self.scenario_id} ({self.query_mode}), reused {self.reuse_count} times"
+
+
+class SpeculativeFactorAdvice(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+        ("skipped", "Skipped"),
+    ]
+    OUTCOME_CHOICES = [
+        ("hit", "Served from speculation"),
+        ("joined", "Joined the running speculation"),
+        ("miss", "Input changed"),
+        ("not_ready", "Not ready"),
+    ]
+
+    # Factor advice precomputed after the first scenario submission, see solutions.speculation_utils.
+    # status is written by the Celery task, outcome by the second submission.
+    speculative_factor_advice_id = models.BigAutoField(primary_key=True)
+    scenario = models.OneToOneField(Scenario, on_delete=models.CASCADE, related_name="speculative_factor_advice")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    scenario_input = models.TextField() # the input the advice was computed for
+    query_mode = models.CharField(max_length=20)
+    language = models.CharField(max_length=10, blank=True, default="") # the advice is written in it
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    factor_advice = models.TextField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    cost_usd = models.FloatField(default=0)
+    compute_seconds = models.FloatField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, blank=True, null=True)
+    similarity = models.FloatField(blank=True, null=True) # of the second submission to scenario_input
+    used_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Speculative factor advice for scenario {self.scenario_id} ({self.status}, {self.outcome or 'undecided'})"
+
+
+class AdviceJob(models.Model):
+    KIND_CHOICES = [
+        ("element_advice", "Goal/situation review"),
+        ("factor_advice", "Solution ideas"),
+        ("solution_advice", "Strategic considerations"),
+        ("quick_solution", "Quick solution"),
+        ("scenario_mining", "Experience mining"),
+    ]
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("superseded", "Superseded"), # a parallel submission wrote its result first
+        ("failed", "Failed"),
+    ]
+
+    # One advice generation for the scenario views, run by a Celery worker (solutions.advice_job_utils)
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    scenario_id = models.IntegerField() # Scenario, ScenarioQuickSolution for "quick_solution", ScenarioForMining for "scenario_mining"
+    input_text = models.TextField() # the input the advice is generated for; the result is dropped if it changed
+    submission_count = models.IntegerField(default=0) # scenario_form_submission_count after the submission (before it for "scenario_mining")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued", db_index=True)
+    progress = models.CharField(max_length=50, default="queued") # shown on the page while the job runs
+    charge_free_use = models.BooleanField(default=False) # decided when submitted: free trial, no subscription
+    language = models.CharField(max_length=10, blank=True, default="") # of the submitting request; the advice is written in it
+    free_use_counted = models.BooleanField(default=False) # set in the transaction that counts it, so it is counted once
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # A double click joins the job that is already queued or running
+            models.UniqueConstraint(fields=["kind", "scenario_id"], condition=models.Q(status__in=["queued", "running"]), name="unique_active_advice_job"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for scenario {self.scenario_id} ({self.status})"
+
+
+class ScenarioPipelineStatus(models.Model):
+    SECTION_STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("batched", "Waiting for batch"), # queued for the next OpenAI batch (OPENAI_BATCH_MODE)
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ]
+
+    # State of the five mining sections of a scenario, updated by the mining tasks (solutions.pipeline_status_utils).
+    # `version` grows with every change and is the ETag of scenario_mining_status_view.
+    scenario = models.OneToOneField(ScenarioForMining, on_delete=models.CASCADE, primary_key=True, related_name="pipeline_status")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    actors_status = models.CharField(max_length=10, choices=SECTION_STATUS_CHOICES, default="queued")
+    dynamics_status = models.CharField(max_length=10, choices=SECTION_STATUS_CHOICES, default="queued")
+    needs_status = models.CharField(max_length=10, choices=SECTION_STATUS_CHOICES, default="queued")
+    skills_resources_status = models.CharField(max_length=10, choices=SECTION_STATUS_CHOICES, default="queued")
+    analysis_prediction_status = models.CharField(max_length=10, choices=SECTION_STATUS_CHOICES, default="queued")
+    version = models.PositiveIntegerField(default=1)
+    error = models.TextField(blank=True, null=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Pipeline status of scenario {self.scenario_id} (version {self.version})"
+
+
 class CorekbDocumentStorage(FileSystemStorage):
     def __init__(self, location=None, base_url=None):
         location = location or os.path.join(os.path.dirname(__file__), 'corekb')
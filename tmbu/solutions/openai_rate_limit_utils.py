@@ -0,0 +1,316 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import time
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .prompt_budget_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# One bucket is shared by every gunicorn worker and Celery worker, because they all
+# spend the same OpenAI organization quota.
+BUCKET_NAME = "openai"
+
+# The rate limiter uses its own database connection, so the short bucket transactions
+# are never folded into a view's surrounding transaction.atomic() block.
+RATE_LIMIT_DB_ALIAS = "ratelimit"
+
+
+def rate_limit_enabled():
+    return getattr(settings, "OPENAI_RATE_LIMIT_BACKEND", "off") in ("postgres", "redis")
+
+
+# Estimate the tokens of a chat request before sending it
+def estimate_request_tokens(messages, max_tokens=None):
+    prompt_tokens = 0
+    for message in messages:
+        prompt_tokens += 4  # per-message overhead (role, separators)
+        content = message.get("content")
+        if isinstance(content, str):
+            prompt_tokens += count_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    prompt_tokens += count_tokens(part.get("text", ""))
+
+    return prompt_tokens + (max_tokens or 0)
+
+
+def _limits():
+    return settings.OPENAI_RATE_LIMIT_RPM, settings.OPENAI_RATE_LIMIT_TPM
+
+
+def _refill(requests_available, tokens_available, elapsed_seconds):
+    rpm, tpm = _limits()
+    requests_available = min(rpm, requests_available + elapsed_seconds * rpm / 60.0)
+    tokens_available = min(tpm, tokens_available + elapsed_seconds * tpm / 60.0)
+    return requests_available, tokens_available
+
+
+def _seconds_until_available(requests_available, tokens_available, tokens_needed):
+    rpm, tpm = _limits()
+    request_wait = max(0.0, (1 - requests_available) * 60.0 / rpm)
+    token_wait = max(0.0, (tokens_needed - tokens_available) * 60.0 / tpm)
+    return max(request_wait, token_wait)
+
+
+# ---- Postgres backend ----
+
+def _postgres_try_acquire(tokens_needed):
+    from .models import OpenAIRateLimitBucket
+
+    rpm, tpm = _limits()
+
+    with transaction.atomic(using=RATE_LIMIT_DB_ALIAS):
+        bucket, created = (
+            OpenAIRateLimitBucket.objects.using(RATE_LIMIT_DB_ALIAS)
+            .select_for_update()
+            .get_or_create(name=BUCKET_NAME, defaults={"requests_available": rpm, "tokens_available": tpm})
+        )
+
+        now = timezone.now()
+        elapsed = max(0.0, (now - bucket.last_refill).total_seconds())
+        requests_available, tokens_available = _refill(bucket.requests_available, bucket.tokens_available, elapsed)
+
+        wait = _seconds_until_available(requests_available, tokens_available, tokens_needed)
+        if wait <= 0:
+            requests_available -= 1
+            tokens_available -= tokens_needed
+
+        bucket.requests_available = requests_available
+        bucket.tokens_available = tokens_available
+        bucket.last_refill = now
+        bucket.save(update_fields=["requests_available", "tokens_available", "last_refill"])
+
+    return wait
+
+
+def _postgres_adjust_tokens(delta):
+    from .models import OpenAIRateLimitBucket
+
+    _, tpm = _limits()
+
+    with transaction.atomic(using=RATE_LIMIT_DB_ALIAS):
+        bucket = (
+            OpenAIRateLimitBucket.objects.using(RATE_LIMIT_DB_ALIAS)
+            .select_for_update()
+            .filter(name=BUCKET_NAME)
+            .first()
+        )
+        if bucket is None:
+            return
+        bucket.tokens_available = min(tpm, bucket.tokens_available + delta)
+        bucket.save(update_fields=["tokens_available"])
+
+
+def _postgres_record_wait(wait_seconds):
+    from django.db.models import F
+    from .models import OpenAIRateLimitBucket
+
+    OpenAIRateLimitBucket.objects.using(RATE_LIMIT_DB_ALIAS).filter(name=BUCKET_NAME).update(
+        total_waits=F("total_waits") + 1,
+        total_wait_seconds=F("total_wait_seconds") + wait_seconds,
+        last_wait_seconds=wait_seconds,
+    )
+
+
+def _postgres_status():
+    from .models import OpenAIRateLimitBucket
+
+    bucket = OpenAIRateLimitBucket.objects.using(RATE_LIMIT_DB_ALIAS).filter(name=BUCKET_NAME).first()
+    if bucket is None:
+        rpm, tpm = _limits()
+        return {"requests_available": rpm, "tokens_available": tpm, "total_waits": 0, "total_wait_seconds": 0.0, "last_wait_seconds": 0.0}
+
+    elapsed = max(0.0, (timezone.now() - bucket.last_refill).total_seconds())
+    requests_available, tokens_available = _refill(bucket.requests_available, bucket.tokens_available, elapsed)
+    return {
+        "requests_available": requests_available,
+        "tokens_available": tokens_available,
+        "total_waits": bucket.total_waits,
+        "total_wait_seconds": bucket.total_wait_seconds,
+        "last_wait_seconds": bucket.last_wait_seconds,
+    }
+
+
+# ---- Redis backend (also works against a local Redis stand-in) ----
+
+# Refill and take from the bucket atomically inside Redis.
+# Returns 0 when the request was admitted, otherwise the seconds to wait.
+REDIS_ACQUIRE_SCRIPT = """
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local needed = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'ts')
+local requests = tonumber(state[1]) or rpm
+local tokens = tonumber(state[2]) or tpm
+local ts = tonumber(state[3]) or now
+
+local elapsed = math.max(0, now - ts)
+requests = math.min(rpm, requests + elapsed * rpm / 60)
+tokens = math.min(tpm, tokens + elapsed * tpm / 60)
+
+local request_wait = math.max(0, (1 - requests) * 60 / rpm)
+local token_wait = math.max(0, (needed - tokens) * 60 / tpm)
+local wait = math.max(request_wait, token_wait)
+
+if wait <= 0 then
+    requests = requests - 1
+    tokens = tokens - needed
+end
+
+redis.call('HSET', KEYS[1], 'requests', requests, 'tokens', tokens, 'ts', now)
+return tostring(wait)
+"""
+
+_redis_client = None
+
+
+def _get_redis_client():
+    global _redis_client
+    if _redis_client is None:
+        import redis  # Only required when OPENAI_RATE_LIMIT_BACKEND = "redis"
+        _redis_client = redis.Redis.from_url(settings.OPENAI_RATE_LIMIT_REDIS_URL)
+    return _redis_client
+
+
+def _redis_key():
+    return f"ratelimit:{BUCKET_NAME}"
+
+
+def _redis_try_acquire(tokens_needed):
+    rpm, tpm = _limits()
+    client = _get_redis_client()
+    wait = client.eval(REDIS_ACQUIRE_SCRIPT, 1, _redis_key(), rpm, tpm, tokens_needed, time.time())
+    return float(wait)
+
+
+def _redis_adjust_tokens(delta):
+    _get_redis_client().hincrbyfloat(_redis_key(), "tokens", delta)
+
+
+def _redis_record_wait(wait_seconds):
+    client = _get_redis_client()
+    pipe = client.pipeline()
+    pipe.hincrby(_redis_key(), "total_waits", 1)
+    pipe.hincrbyfloat(_redis_key(), "total_wait_seconds", wait_seconds)
+    pipe.hset(_redis_key(), "last_wait_seconds", wait_seconds)
+    pipe.execute()
+
+
+def _redis_status():
+    rpm, tpm = _limits()
+    state = {k.decode(): v.decode() for k, v in _get_redis_client().hgetall(_redis_key()).items()}
+    requests_available = float(state.get("requests", rpm))
+    tokens_available = float(state.get("tokens", tpm))
+    elapsed = max(0.0, time.time() - float(state.get("ts", time.time())))
+    requests_available, tokens_available = _refill(requests_available, tokens_available, elapsed)
+    return {
+        "requests_available": requests_available,
+        "tokens_available": tokens_available,
+        "total_waits": int(state.get("total_waits", 0)),
+        "total_wait_seconds": float(state.get("total_wait_seconds", 0.0)),
+        "last_wait_seconds": float(state.get("last_wait_seconds", 0.0)),
+    }
+
+
+BACKENDS = {
+    "postgres": (_postgres_try_acquire, _postgres_adjust_tokens, _postgres_record_wait, _postgres_status),
+    "redis": (_redis_try_acquire, _redis_adjust_tokens, _redis_record_wait, _redis_status),
+}
+
+
+# ---- Public API ----
+
+def acquire_openai_capacity(estimated_tokens):
+    """
+    Block until the shared bucket has room for one request of `estimated_tokens`.
+    Callers queue here instead of failing with a 429. Returns the seconds waited.
+    """
+    if not rate_limit_enabled():
+        return 0.0
+
+    try_acquire, _, record_wait, _ = BACKENDS[settings.OPENAI_RATE_LIMIT_BACKEND]
+
+    # A request larger than the whole per-minute budget could never be admitted
+    _, tpm = _limits()
+    tokens_needed = min(estimated_tokens, tpm)
+
+    start = time.monotonic()
+    while True:
+        try:
+            wait = try_acquire(tokens_needed)
+        except Exception as e:
+            # Never block OpenAI calls because the limiter store is unavailable
+            logger.warning(f"OpenAI rate limiter unavailable, sending without limit: {e}")
+            return 0.0
+
+        if wait <= 0:
+            break
+
+        waited = time.monotonic() - start
+        if waited + wait > settings.OPENAI_RATE_LIMIT_MAX_WAIT:
+            logger.warning(f"OpenAI rate limiter waited {waited:.1f}s; sending request without budget.")
+            break
+
+        time.sleep(min(wait, 5.0))
+
+    waited = time.monotonic() - start
+    if waited > 0.05:
+        try:
+            record_wait(waited)
+        except Exception as e:
+            logger.warning(f"Failed to record OpenAI rate limiter wait: {e}")
+        logger.info(f"OpenAI rate limiter queued request for {waited:.2f}s ({tokens_needed} estimated tokens)")
+
+    return waited
+
+
+def settle_openai_capacity(estimated_tokens, actual_tokens):
+    """Return unused estimated tokens to the bucket, or charge the overshoot."""
+    if not rate_limit_enabled() or actual_tokens is None:
+        return
+
+    _, adjust_tokens, _, _ = BACKENDS[settings.OPENAI_RATE_LIMIT_BACKEND]
+    try:
+        adjust_tokens(estimated_tokens - actual_tokens)
+    except Exception as e:
+        logger.warning(f"Failed to settle OpenAI rate limiter tokens: {e}")
+
+
+def report_openai_rate_limited(estimated_tokens):
+    """OpenAI answered 429: the bucket was too optimistic, so drain what this call took."""
+    if not rate_limit_enabled():
+        return
+
+    _, adjust_tokens, _, _ = BACKENDS[settings.OPENAI_RATE_LIMIT_BACKEND]
+    try:
+        adjust_tokens(-estimated_tokens)
+    except Exception as e:
+        logger.warning(f"Failed to drain OpenAI rate limiter after 429: {e}")
+
+
+def get_openai_rate_limit_status():
+    rpm, tpm = _limits()
+    status = {"backend": getattr(settings, "OPENAI_RATE_LIMIT_BACKEND", "off"), "rpm_limit": rpm, "tpm_limit": tpm}
+
+    if not rate_limit_enabled():
+        return status
+
+    _, _, _, backend_status = BACKENDS[settings.OPENAI_RATE_LIMIT_BACKEND]
+    status.update(backend_status())
+    status["average_wait_seconds"] = (
+        status["total_wait_seconds"] / status["total_waits"] if status["total_waits"] else 0.0
+    )
+    return status
@@ -0,0 +1,126 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import logging
+import functools
+from contextlib import contextmanager
+from django.db.models import F
+from django.utils import timezone
+from .event_stream_utils import event_stream_enabled, publish_user_event
+from .models import ScenarioPipelineStatus, ScenarioActors, ScenarioDynamics, ScenarioNeeds, ScenarioSkillsResources, ScenarioAnalysisPrediction
+
+logger = logging.getLogger(__name__)
+
+
+# One ScenarioPipelineStatus row per mined scenario replaces polling five result endpoints:
+# the mining tasks move their sections through queued -> running -> (batched ->) ready / failed,
+# and scenario_mining_status_view returns all sections with one ETag (the row's version).
+
+# section -> (result model, result field), in page order
+PIPELINE_SECTIONS = {
+    "actors": (ScenarioActors, "scenario_actors_traits"),
+    "dynamics": (ScenarioDynamics, "scenario_dynamics"),
+    "needs": (ScenarioNeeds, "scenario_needs"),
+    "skills_resources": (ScenarioSkillsResources, "scenario_skills_resources"),
+    "analysis_prediction": (ScenarioAnalysisPrediction, "scenario_analysis_prediction"),
+}
+
+FINAL_STATUSES = ("ready", "failed")
+
+
+def status_field(section):
+    return f"{section}_status"
+
+
+def reset_pipeline_status(scenario):
+    """All sections queued again, for a (re-)submitted scenario. Called before its tasks are dispatched."""
+    status, created = ScenarioPipelineStatus.objects.get_or_create(scenario=scenario, defaults={"user": scenario.user})
+    if not created:
+        ScenarioPipelineStatus.objects.filter(pk=status.pk).update(
+            **{status_field(section): "queued" for section in PIPELINE_SECTIONS},
+            version=F("version") + 1,
+            error=None,
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+
+
+def mark_sections(scenario_id, sections, new_status, only_from=None, error=None):
+    """
+    Set the status of `sections` and bump the version. With `only_from`, only sections still in one of
+    those states change, so a late "running" never hides a result that was saved meanwhile.
+    """
+    changed = 0
+    for section in sections:
+        rows = ScenarioPipelineStatus.objects.filter(scenario_id=scenario_id)
+        if only_from:
+            rows = rows.filter(**{f"{status_field(section)}__in": only_from})
+        changes = {status_field(section): new_status, "version": F("version") + 1, "updated_at": timezone.now()}
+        if error:
+            changes["error"] = error
+        changed += rows.update(**changes)
+
+    if changed and event_stream_enabled():
+        user_id = ScenarioPipelineStatus.objects.filter(scenario_id=scenario_id).values_list("user_id", flat=True).first()
+        publish_user_event(user_id, "scenario_mining", {"scenario_id": scenario_id})
+    return changed
+
+
+@contextmanager
+def track_pipeline_sections(scenario_id, sections):
+    """
+    Wraps a mining task: its sections run while inside, fail on an exception and wait for the batch
+    when the task returns without saving (batch mode). Saved results are marked ready by a signal.
+    """
+    mark_sections(scenario_id, sections, "running", only_from=("queued", "batched", "failed"))
+    try:
+        yield
+    except Exception as e:
+        mark_sections(scenario_id, sections, "failed", only_from=("queued", "running"), error=f"{type(e).__name__}: {e}")
+        raise
+    mark_sections(scenario_id, sections, "batched", only_from=("running",))
+
+
+def tracks_pipeline_sections(*sections):
+    """Decorator for a mining task taking scenario_id first; without sections it covers all five."""
+    def decorator(task_function):
+        @functools.wraps(task_function)
+        def wrapper(scenario_id, *args, **kwargs):
+            with track_pipeline_sections(scenario_id, sections or list(PIPELINE_SECTIONS)):
+                return task_function(scenario_id, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def section_of_result(result_model):
+    for section, (model, _) in PIPELINE_SECTIONS.items():
+        if model is result_model:
+            return section
+    return None
+
+
+def pipeline_status_payload(scenario):
+    """States of all sections and the results of the ready ones, as returned by scenario_mining_status_view."""
+    status = ScenarioPipelineStatus.objects.filter(scenario=scenario).first()
+
+    sections = {}
+    for section, (model, field) in PIPELINE_SECTIONS.items():
+        section_status = getattr(status, status_field(section)) if status else None
+        result = None
+        if section_status in (None, "ready"):
+            result = model.objects.filter(scenario=scenario).values_list(field, flat=True).first()
+        if section_status is None:
+            # Mined before the status record existed: ready once the result row exists
+            section_status = "ready" if result is not None else "queued"
+        sections[section] = {"status": section_status, "result": result}
+
+    return {
+        "version": status.version if status else None,
+        "done": all(s["status"] in FINAL_STATUSES for s in sections.values()),
+        "sections": sections,
+    }
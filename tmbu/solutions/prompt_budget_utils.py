@@ -0,0 +1,179 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import logging
+from django.conf import settings
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to the character heuristic below
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+
+TRUNCATION_MARKER = " …[truncated]"
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o family tokenizer
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+    return _encoding
+
+
+# Roughly 4 characters per token for Latin text and 1 token per CJK character.
+def estimate_text_tokens(text):
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_text_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def render_section(value):
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, indent=2, ensure_ascii=False)
+
+
+def count_section_tokens(value):
+    return count_tokens(render_section(value))
+
+
+def truncate_to_tokens(text, max_tokens):
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:max_tokens]) + TRUNCATION_MARKER
+
+    # Heuristic fallback: shrink by characters until the estimate fits
+    ratio = max_tokens / max(1, estimate_text_tokens(text))
+    return text[:int(len(text) * ratio)] + TRUNCATION_MARKER
+
+
+def _shorten_long_fields(item, max_field_tokens):
+    if isinstance(item, dict):
+        return {key: _shorten_long_fields(value, max_field_tokens) for key, value in item.items()}
+    if isinstance(item, str) and count_tokens(item) > max_field_tokens:
+        return truncate_to_tokens(item, max_field_tokens)
+    return item
+
+
+def _fit_list(items, max_tokens, drop_from, max_field_tokens):
+    item_tokens = [count_section_tokens(item) for item in items]
+
+    # First compress long free-text fields inside each item (unless they round-trip), then drop whole items
+    if max_field_tokens is not None and sum(item_tokens) > max_tokens:
+        items = [_shorten_long_fields(item, max_field_tokens) for item in items]
+        item_tokens = [count_section_tokens(item) for item in items]
+
+    items = list(items)
+    while items and sum(item_tokens) + 2 > max_tokens:
+        if drop_from == "start":
+            items.pop(0)
+            item_tokens.pop(0)
+        else:
+            items.pop()
+            item_tokens.pop()
+
+    return items
+
+
+def _fit_value(value, max_tokens, drop_from, max_field_tokens):
+    if isinstance(value, list):
+        return _fit_list(value, max_tokens, drop_from, max_field_tokens)
+    if isinstance(value, dict):
+        if count_section_tokens(value) <= max_tokens or max_field_tokens is None:
+            return value
+        return _shorten_long_fields(value, max_field_tokens)
+    if isinstance(value, str):
+        return truncate_to_tokens(value, max_tokens)
+    return value
+
+
+def fit_sections_to_budget(sections, total_budget, reserved_tokens=0, helper=None):
+    """
+    Trim prompt sections so that together they stay within `total_budget` tokens.
+
+    Each section is a dict:
+        name        key in the returned dict
+        value       str, list or dict to embed in the prompt
+        priority    higher priority sections are trimmed last
+        max_tokens  optional cap for this section alone
+        min_tokens  the section is never trimmed below this (default 0)
+        drop_from   "start" (oldest first, e.g. history) or "end" when trimming lists
+        shorten_fields  False keeps the text fields of list and dict items whole (default True), for values
+                    the model echoes back to be saved: their items are dropped whole instead
+
+    `reserved_tokens` covers the fixed parts of the prompt (system instructions etc.).
+    Returns (values, token_counts) where values holds the trimmed section values.
+    """
+    max_field_tokens = getattr(settings, "PROMPT_MAX_FIELD_TOKENS", 300)
+
+    values = {}
+    counts = {}
+    def field_tokens(section):
+        return max_field_tokens if section.get("shorten_fields", True) else None
+
+    for section in sections:
+        value = section["value"]
+        if section.get("max_tokens") is not None:
+            value = _fit_value(value, section["max_tokens"], section.get("drop_from", "end"), field_tokens(section))
+        values[section["name"]] = value
+        counts[section["name"]] = count_section_tokens(value)
+
+    # Take the overflow from the lowest-priority sections first
+    overflow = reserved_tokens + sum(counts.values()) - total_budget
+    for section in sorted(sections, key=lambda s: s.get("priority", 0)):
+        if overflow <= 0:
+            break
+
+        name = section["name"]
+        allowed = max(section.get("min_tokens", 0), counts[name] - overflow)
+        if allowed >= counts[name]:
+            continue
+
+        values[name] = _fit_value(values[name], allowed, section.get("drop_from", "end"), field_tokens(section))
+        new_count = count_section_tokens(values[name])
+        overflow -= counts[name] - new_count
+        counts[name] = new_count
+
+    counts["reserved"] = reserved_tokens
+    counts["total"] = reserved_tokens + sum(count for name, count in counts.items() if name not in ("reserved", "total"))
+
+    logger.info(f"Prompt tokens for {helper or 'prompt'}: {counts} (budget {total_budget})")
+    if counts["total"] > total_budget:
+        logger.warning(f"Prompt for {helper or 'prompt'} still exceeds its budget after trimming minimum sections.")
+
+    return values, counts
+
+
+def get_prompt_budget(helper):
+    return settings.PROMPT_TOKEN_BUDGETS.get(helper, settings.PROMPT_TOKEN_BUDGETS.get("default", 16000))
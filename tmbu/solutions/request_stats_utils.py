@@ -0,0 +1,56 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import contextvars
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Database queries of the current request: those run, on any connection and also in sync_to_async threads
+# (the context is copied into them), and those a cache answered instead (sessions, solutions.cache_utils).
+# RequestStatsMiddleware starts the count and reports it.
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("queries", "saved")
+
+    def __init__(self):
+        self.queries = 0
+        self.saved = 0
+
+
+def start_request_stats():
+    stats = RequestStats()
+    return stats, _request_stats.set(stats)
+
+
+def stop_request_stats(token):
+    _request_stats.reset(token)
+
+
+def record_saved_queries(count=1):
+    """Called by a cache hit that replaced `count` queries."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.saved += count
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # Stays on the connection for its lifetime; outside a request it only costs a context lookup
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
@@ -0,0 +1,91 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import re
+import hashlib
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+# Model class name -> ScenarioArtifact.scenario_type
+SCENARIO_TYPES = {
+    "scenario": "scenario",
+    "scenarioquicksolution": "quick_solution",
+}
+
+
+def scenario_type_of(scenario):
+    return SCENARIO_TYPES.get(scenario._meta.model_name)
+
+
+def scenario_input_hash(scenario_input, query_mode, embedding_model):
+    # Whitespace-only edits keep the artifact
+    normalized = re.sub(r"\s+", " ", scenario_input or "").strip()
+    return hashlib.sha256(f"{query_mode}\n{embedding_model}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def get_scenario_artifact(scenario, scenario_input, query_mode, embedding_model):
+    """The stored artifact for this scenario and query mode, or None when missing or built from another input."""
+    from .models import ScenarioArtifact
+
+    scenario_type = scenario_type_of(scenario)
+    if scenario_type is None or scenario.pk is None:
+        return None
+
+    artifact = ScenarioArtifact.objects.filter(scenario_type=scenario_type, scenario_id=scenario.pk, query_mode=query_mode).first()
+    if artifact is None or artifact.input_hash != scenario_input_hash(scenario_input, query_mode, embedding_model):
+        return None
+
+    ScenarioArtifact.objects.filter(pk=artifact.pk).update(reuse_count=F("reuse_count") + 1, last_used_at=timezone.now())
+    return artifact
+
+
+def save_scenario_artifact(scenario, scenario_input, query_mode, embedding_model, queries, query_embeddings, factor_hits, relevant_factors):
+    from .models import ScenarioArtifact
+
+    scenario_type = scenario_type_of(scenario)
+    if scenario_type is None or scenario.pk is None:
+        return None
+
+    try:
+        # Savepoint, so a failed artifact write never breaks the caller's transaction
+        with transaction.atomic():
+            artifact, _ = ScenarioArtifact.objects.update_or_create(
+                scenario_type=scenario_type,
+                scenario_id=scenario.pk,
+                query_mode=query_mode,
+                defaults={
+                    "user_id": scenario.user_id,
+                    "input_hash": scenario_input_hash(scenario_input, query_mode, embedding_model),
+                    "queries": queries,
+                    "query_embeddings": query_embeddings,
+                    "factor_hits": factor_hits,
+                    "relevant_factors": relevant_factors,
+                    "created_at": timezone.now(),
+                    "last_used_at": timezone.now(),
+                    "reuse_count": 0,
+                },
+            )
+            return artifact
+    except IntegrityError as e:
+        # A concurrent request stored the same artifact first
+        logger.info(f"Scenario artifact for {scenario_type} {scenario.pk} already stored: {e}")
+        return None
+
+
+def invalidate_scenario_artifacts(scenario_type, scenario_id):
+    from .models import ScenarioArtifact
+
+    deleted, _ = ScenarioArtifact.objects.filter(scenario_type=scenario_type, scenario_id=scenario_id).delete()
+    if deleted:
+        logger.info(f"Invalidated {deleted} artifacts of {scenario_type} {scenario_id}")
+    return deleted
@@ -0,0 +1,41 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+from django.core.paginator import Paginator
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.functions import Left
+
+
+# The My Scenarios listings show a date and a short preview of each row. They read only the id, the input
+# time and previews cut in the database, never the full inputs and advice (several KB per row).
+
+PAGE_SIZE = 10
+
+
+def text_preview(field, chars):
+    """The first chars of a text column, plus one so truncatechars still knows whether to add an ellipsis."""
+    return Left(field, chars + 1)
+
+
+def is_filled(field):
+    """True where a text column holds something, without reading it into Python."""
+    return ExpressionWrapper(Q(**{f"{field}__isnull": False}) & ~Q(**{field: ""}), output_field=BooleanField())
+
+
+def listing_page(model, user, page_number, **annotations):
+    """
+    A page of the user's rows as dicts of scenario_id, scenario_input_time and the annotations, newest first.
+    The paginator counts once; its count is cached for the page links and the heading.
+    """
+    rows = (
+        model.objects.filter(user=user)
+        .order_by("-scenario_input_time", "-scenario_id")
+        .annotate(**annotations)
+        .values("scenario_id", "scenario_input_time", *annotations)
+    )
+    return Paginator(rows, PAGE_SIZE).get_page(page_number)
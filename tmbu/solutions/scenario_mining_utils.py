@@ -0,0 +1,173 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+from celery import chord
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ScenarioForMining, Actors, IndividualTraits, GroupTraits, Interactions, InteractionRelations
+from .scenario_workflow_utils import apply_if_unchanged
+from .pipeline_status_utils import reset_pipeline_status
+
+
+# Experience mining: the info extracted from a submitted experience is saved with the submission in one short
+# transaction, and the analysis tasks start once it is committed. The extraction itself runs in an advice job
+# (solutions.advice_job_utils, kind "scenario_mining"), outside any transaction.
+
+def apply_extracted_info(scenario_pk, input_text, submission_count, extracted_info):
+    """
+    Submit the input with its extracted info, if no parallel submission was applied since the job was created.
+    Called inside the caller's transaction. Returns False when the result was dropped.
+    """
+    if not apply_if_unchanged(
+        ScenarioForMining, scenario_pk,
+        {"scenario_form_submission_count": submission_count},
+        {
+            "scenario_input": input_text,
+            "scenario_input_time": timezone.now(),
+            "scenario_form_submission_count": submission_count + 1,  # Increment counter for each submission
+            "scenario_submitted": True,
+        },
+    ):
+        return False
+
+    scenario = ScenarioForMining.objects.select_related("user").get(pk=scenario_pk)
+    save_extracted_info(scenario.user, scenario, extracted_info)
+
+    # Trigger independent async tasks once the extracted info is committed, so workers see it
+    transaction.on_commit(lambda: dispatch_scenario_mining_tasks(scenario))
+    return True
+
+
+def save_extracted_info(user, scenario, extracted_info):
+
+    # --- 1. Save Actors ---
+    actor_map = {}
+    for actor_data in extracted_info.get("actors", []):
+        actor_obj = Actors.objects.create(
+            user=user,
+            scenario=scenario,
+            name_or_alias=actor_data["name_or_alias"],
+            actor_type=actor_data["actor_type"]
+        )
+        actor_map[actor_data["actor_ref_id"]] = actor_obj
+
+
+
+    # --- 2. Individual Traits ---
+    for ind in extracted_info.get("individual_traits", []):
+        actor = actor_map.get(ind.get("actor"))
+        if actor and actor.actor_type == Actors.INDIVIDUAL:
+            IndividualTraits.objects.create(
+                user=user,
+                scenario=scenario,
+                actor=actor,                
+                cognitive_pattern=ind.get("cognitive_pattern"),
+                affect_pattern=ind.get("affect_pattern"),
+                action_pattern=ind.get("action_pattern"),
+                personality=ind.get("personality"),                    
+                beliefs_values=ind.get("beliefs_values"),
+                priorities=ind.get("priorities"),
+                life_style=ind.get("life_style"),
+                identity=ind.get("identity"),
+                capabilities=ind.get("capabilities"),
+                family=ind.get("family"),
+                marriage_intimate_relationship=ind.get("marriage_intimate_relationship"),
+                education=ind.get("education"),
+                occupation_job_industry=ind.get("occupation_job_industry"),
+                social_economic_status=ind.get("social_economic_status"),
+                social_network=ind.get("social_network"),
+                biological_characteristics=ind.get("biological_characteristics"),              
+            )
+
+    # --- 3. Group Traits ---
+    for grp in extracted_info.get("group_traits", []):
+        actor = actor_map.get(grp.get("actor"))
+        if actor and actor.actor_type == Actors.GROUP:
+            GroupTraits.objects.create(
+                user=user,
+                scenario=scenario,
+                actor=actor,               
+                group_type=grp.get("group_type"),
+                domain=grp.get("domain"),
+                size=grp.get("size"),
+                mission_vision_value=grp.get("mission_vision_value"),
+                goal_strategy=grp.get("goal_strategy"),
+                objectives_plan=grp.get("objectives_plan"),
+                governance=grp.get("governance"),
+                organizational_structure=grp.get("organizational_structure"),
+                operation_system=grp.get("operation_system"),
+                organizational_politics=grp.get("organizational_politics"),
+                influence=grp.get("influence"),
+                leadership=grp.get("leadership"),
+                culture=grp.get("culture"),
+                performance=grp.get("performance"),
+                challenge=grp.get("challenge"),
+                funding_resources_budget=grp.get("funding_resources_budget"),
+            )
+
+
+    # --- 4. Save Interactions ---
+    interaction_map = {}
+    for inter in extracted_info.get("interactions", []):
+        actor = actor_map.get(inter["actor"])
+        interaction = Interactions.objects.create(
+            user=user,
+            scenario=scenario,
+            actor=actor,
+            behavior_description=inter.get("behavior_description"),
+            env=inter.get("env"),
+        )
+        interaction_map[inter["behavior_id"]] = interaction
+
+    # --- 5. Save InteractionRelations ---
+    for rel in extracted_info.get("interaction_relations", []):
+        relation = InteractionRelations.objects.create(
+            user=user,
+            scenario=scenario,
+            source=interaction_map.get(rel["source"]),
+            target=interaction_map.get(rel["target"]),
+            relation_description=rel.get("relation_description"),
+            related_actors_relationship_status=rel.get("related_actors_relationship_status"),
+        )
+        # add related actors (many-to-many)
+        for actor_ref_id in rel.get("related_actors", []):
+            if actor_ref_id in actor_map:
+                relation.related_actors.add(actor_map[actor_ref_id])
+
+
+
+# Analysis tasks and the profile/graph chord for a committed mining submission
+def dispatch_scenario_mining_tasks(scenario):
+    from .tasks import build_scenario_actors_task, build_scenario_dynamics_task, build_scenario_needs_task, build_scenario_skills_resources_task, build_scenario_analysis_prediction_task, build_scenario_analysis_task, update_individual_profile_task, update_group_profile_task, build_global_actors_profiles_task, build_social_network_graph_task
+
+    # Shown as pending again by scenario_mining_status_view until the tasks below save their results
+    reset_pipeline_status(scenario)
+
+    if settings.SCENARIO_ANALYSIS_ENGINE == "consolidated":
+        # One structured completion fills all five sections
+        build_scenario_analysis_task.delay(scenario.scenario_id, user_id=scenario.user_id)
+    else:
+        build_scenario_actors_task.delay(scenario.scenario_id, user_id=scenario.user_id)
+        build_scenario_dynamics_task.delay(scenario.scenario_id, user_id=scenario.user_id)
+        build_scenario_needs_task.delay(scenario.scenario_id, user_id=scenario.user_id)
+        build_scenario_skills_resources_task.delay(scenario.scenario_id, user_id=scenario.user_id)
+        build_scenario_analysis_prediction_task.delay(scenario.scenario_id, user_id=scenario.user_id)
+
+    # Launch chord: run two updates in parallel, then build global
+    chord(
+        [update_individual_profile_task.s(scenario.user_id),
+        update_group_profile_task.s(scenario.user_id)
+        ]
+    )(
+        build_global_actors_profiles_task.s(user_id=scenario.user_id)
+        | build_social_network_graph_task.s()
+    )
+
+    # Build social network graph (user-specific)
+    # graph_task = build_social_network_graph_task.delay(scenario.user_id)
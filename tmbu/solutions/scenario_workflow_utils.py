@@ -0,0 +1,28 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# The scenario views never hold a transaction across an LLM call:
+#   1. the submission is saved and committed,
+#   2. the LLM runs outside any transaction,
+#   3. the result is written in a second short transaction, only if the row is still as the LLM saw it.
+# A parallel submission of the same scenario (double click, second tab) that finished first wins;
+# the later result is dropped instead of overwriting it or waiting on its row locks.
+
+
+def apply_if_unchanged(model, pk, expected, changes):
+    """
+    UPDATE the row with `changes` only while it still matches `expected` (field lookups).
+    Returns False when another request changed the row first.
+    """
+    return model.objects.filter(pk=pk, **expected).update(**changes) > 0
+
@@ -0,0 +1,38 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from .cache_utils import saves_queries
+from .request_stats_utils import record_saved_queries
+
+
+class SessionStore(cached_db.SessionStore):
+    """Django's cached_db sessions, counting the session table reads answered by a cache outside the database."""
+
+    def load(self):
+        self._read_from_db = False
+        data = super().load()
+        if self.session_key and not self._read_from_db and saves_queries(settings.SESSION_CACHE_ALIAS):
+            record_saved_queries()
+        return data
+
+    async def aload(self):
+        self._read_from_db = False
+        data = await super().aload()
+        if self.session_key and not self._read_from_db and saves_queries(settings.SESSION_CACHE_ALIAS):
+            record_saved_queries()
+        return data
+
+    def _get_session_from_db(self):
+        self._read_from_db = True
+        return super()._get_session_from_db()
+
+    async def _aget_session_from_db(self):
+        self._read_from_db = True
+        return await super()._aget_session_from_db()
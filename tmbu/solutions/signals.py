@@ -0,0 +1,67 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import logging
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import Scenario, ScenarioQuickSolution, ScenarioArtifact, CorekbUpload, ScenarioActors, ScenarioDynamics, ScenarioNeeds, ScenarioSkillsResources, ScenarioAnalysisPrediction
+from .scenario_artifact_utils import scenario_type_of, invalidate_scenario_artifacts
+from .pipeline_status_utils import mark_sections, section_of_result
+
+logger = logging.getLogger(__name__)
+
+
+# Remember the loaded input, so an edit can be detected on save without another query
+@receiver(post_init, sender=Scenario)
+@receiver(post_init, sender=ScenarioQuickSolution)
+def remember_scenario_input(sender, instance, **kwargs):
+    instance._loaded_scenario_input = instance.__dict__.get("scenario_input")
+
+
+# Drop the stored summary bullets and factors when the scenario input is edited
+@receiver(post_save, sender=Scenario)
+@receiver(post_save, sender=ScenarioQuickSolution)
+def invalidate_artifacts_on_input_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and "scenario_input" not in update_fields):
+        return
+    if "scenario_input" not in instance.__dict__:  # deferred, so not saved either
+        return
+
+    if instance.scenario_input != getattr(instance, "_loaded_scenario_input", None):
+        invalidate_scenario_artifacts(scenario_type_of(instance), instance.pk)
+    instance._loaded_scenario_input = instance.scenario_input
+
+
+@receiver(post_delete, sender=Scenario)
+@receiver(post_delete, sender=ScenarioQuickSolution)
+def delete_artifacts_with_scenario(sender, instance, **kwargs):
+    invalidate_scenario_artifacts(scenario_type_of(instance), instance.pk)
+
+
+@receiver(post_init, sender=CorekbUpload)
+def remember_kb_inserted(sender, instance, **kwargs):
+    instance._loaded_is_inserted = instance.__dict__.get("is_inserted")
+
+
+# New knowledge base factors change what every search would retrieve
+@receiver(post_save, sender=CorekbUpload)
+def invalidate_artifacts_on_kb_change(sender, instance, **kwargs):
+    if instance.is_inserted and not instance._loaded_is_inserted:
+        instance._loaded_is_inserted = True
+        deleted, _ = ScenarioArtifact.objects.all().delete()
+        logger.info(f"Knowledge base updated by {instance.name}; invalidated {deleted} scenario artifacts")
+
+
+# A saved mining result is what makes its section ready, whichever path wrote it (task, batch, fallback)
+@receiver(post_save, sender=ScenarioActors)
+@receiver(post_save, sender=ScenarioDynamics)
+@receiver(post_save, sender=ScenarioNeeds)
+@receiver(post_save, sender=ScenarioSkillsResources)
+@receiver(post_save, sender=ScenarioAnalysisPrediction)
+def mark_pipeline_section_ready(sender, instance, **kwargs):
+    mark_sections(instance.scenario_id, [section_of_result(sender)], "ready")
@@ -0,0 +1,116 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import json
+import base64
+from datetime import datetime
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Left
+from .models import GeneratedSimulation, LiveSimulation
+
+
+# My Simulations lists generated and live simulations together, newest first. One UNION ALL query per page,
+# keyset-paginated on (created_at, type, id), all descending: each branch reads at most one page from its
+# (user, created_at, id) index, so a page costs the same whatever the length of the history.
+
+PAGE_SIZE = 10
+PREVIEW_CHARS = 30  # as truncated by the template; one more char tells it whether to add an ellipsis
+COUNT_LIMIT = 1000  # the total is counted up to here ("1000+")
+
+# type -> (model, primary key field); the type is part of the sort key, as ids repeat across the tables
+SIMULATION_TYPES = {
+    "Generated": (GeneratedSimulation, "generated_simulation_id"),
+    "Live": (LiveSimulation, "live_simulation_id"),
+}
+
+
+def encode_cursor(row):
+    raw = json.dumps([row["created_at"].isoformat(), row["type"], row["id"]])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """(created_at, type, id), or None for a missing or malformed cursor (first page)."""
+    if not cursor:
+        return None
+    try:
+        created_at, sim_type, sim_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if sim_type not in SIMULATION_TYPES:
+            return None
+        return datetime.fromisoformat(created_at), sim_type, int(sim_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _branch(user, sim_type, cursor, older):
+    """One table's rows past the cursor, in page order, at most one page."""
+    model, pk_field = SIMULATION_TYPES[sim_type]
+    rows = model.objects.filter(user=user)
+
+    if cursor:
+        created_at, cursor_type, cursor_id = cursor
+        before, after = ("lt", "gt") if older else ("gt", "lt")
+        same_time = Q(created_at=created_at)
+        if sim_type == cursor_type:
+            same_time &= Q(**{f"{pk_field}__{before}": cursor_id})
+        elif (sim_type < cursor_type) != older:
+            same_time = Q(pk__in=[])  # this type sorts on the other side of the cursor at equal times
+        rows = rows.filter(Q(**{f"created_at__{before}": created_at}) | same_time)
+
+    direction = "-" if older else ""
+    return (
+        rows.annotate(
+            sim_id=F(pk_field),
+            sim_type=Value(sim_type, output_field=CharField()),
+            preview=Left("scenario", PREVIEW_CHARS + 1),
+        )
+        .values("created_at", "sim_id", "sim_type", "preview")
+        .order_by(f"{direction}created_at", f"{direction}sim_id")[:PAGE_SIZE + 1]
+    )
+
+
+def simulation_history_page(user, before=None, after=None):
+    """
+    One page of the user's simulations, newest first. `before` pages to older rows, `after` to newer ones
+    (both cursors as returned in "older_cursor" / "newer_cursor").
+    """
+    older = not after
+    cursor = decode_cursor(after) if after else decode_cursor(before)
+
+    branches = [_branch(user, sim_type, cursor, older) for sim_type in SIMULATION_TYPES]
+    direction = "-" if older else ""
+    rows = list(
+        branches[0].union(*branches[1:], all=True)
+        .order_by(f"{direction}created_at", f"{direction}sim_type", f"{direction}sim_id")[:PAGE_SIZE + 1]
+    )
+
+    has_more = len(rows) > PAGE_SIZE
+    rows = [
+        {"id": r["sim_id"], "type": r["sim_type"], "created_at": r["created_at"], "preview": r["preview"]}
+        for r in rows[:PAGE_SIZE]
+    ]
+    if not older:
+        rows.reverse()
+
+    has_older = has_more if older else True
+    has_newer = (cursor is not None) if older else has_more
+    return {
+        "simulations": rows,
+        "older_cursor": encode_cursor(rows[-1]) if rows and has_older else None,
+        "newer_cursor": encode_cursor(rows[0]) if rows and has_newer else None,
+    }
+
+
+def count_simulations(user, limit=COUNT_LIMIT):
+    """Total for the heading, counted up to `limit` so it stays cheap; returns (count, capped)."""
+    total = 0
+    for model, _ in SIMULATION_TYPES.values():
+        if total > limit:
+            break
+        total += model.objects.filter(user=user)[:limit + 1 - total].count()
+    return min(total, limit), total > limit
@@ -0,0 +1,281 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import os
+import json
+import time
+import random
+import socket
+import hashlib
+import logging
+import functools
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from .openai_rate_limit_utils import RATE_LIMIT_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+
+# Identical calls that overlap (double-clicked submit buttons, parallel tabs, duplicate tasks)
+# run once: the first caller is the leader, the others wait for and share its result.
+#
+#   in-process     a map of futures, for threads of the same worker
+#   cross-process  a short-lived lease row (SingleflightLease) or cache key, for other gunicorn/Celery workers
+
+# Lease rows are committed on their own connection, so they are visible to other workers
+# even when the caller is inside transaction.atomic()
+LEASE_DB_ALIAS = RATE_LIMIT_DB_ALIAS
+
+_local_flights = {}
+_local_lock = threading.Lock()
+
+_stats = {"leader": 0, "local_follower": 0, "remote_follower": 0, "takeover": 0, "wait_timeout": 0}
+_stats_lock = threading.Lock()
+
+
+class SingleflightError(RuntimeError):
+    """The leader's call failed; followers get the same error instead of repeating it."""
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def get_singleflight_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def fingerprint(name, *parts):
+    payload = json.dumps([name, *parts], sort_keys=True, ensure_ascii=False, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+# ---- Database backend ----
+
+def _db_try_lead(key, name, owner, lease_seconds, result_ttl):
+    """Returns (leading, lease). A follower gets the current lease row."""
+    from .models import SingleflightLease
+
+    now = timezone.now()
+    with transaction.atomic(using=LEASE_DB_ALIAS):
+        lease, created = (
+            SingleflightLease.objects.using(LEASE_DB_ALIAS)
+            .select_for_update()
+            .get_or_create(key=key, defaults={"name": name, "owner": owner, "expires_at": now + timedelta(seconds=lease_seconds)})
+        )
+        if created:
+            return True, lease
+
+        if lease.status == "running" and lease.expires_at > now:
+            return False, lease
+        if lease.status == "done" and lease.completed_at and lease.completed_at + timedelta(seconds=result_ttl) > now:
+            return False, lease
+
+        # Finished long enough ago, failed, or its leader died: take it over
+        if lease.status == "running":
+            _count("takeover")
+            logger.warning(f"Singleflight lease {name} {key[:12]} expired (leader {lease.owner}); taking over")
+        lease.owner = owner
+        lease.status = "running"
+        lease.result = None
+        lease.error = None
+        lease.expires_at = now + timedelta(seconds=lease_seconds)
+        lease.completed_at = None
+        lease.save(using=LEASE_DB_ALIAS)
+        return True, lease
+
+
+def _db_finish(key, owner, status, result=None, error=None):
+    from .models import SingleflightLease
+
+    leases = SingleflightLease.objects.using(LEASE_DB_ALIAS).filter(key=key, owner=owner)
+    try:
+        leases.update(status=status, result=result, error=error, completed_at=timezone.now())
+    except (TypeError, ValueError) as e:
+        # Result is not JSON serializable: release the lease so followers run the call themselves
+        logger.warning(f"Singleflight result for {key[:12]} cannot be shared: {e}")
+        leases.delete()
+
+    # Occasionally drop old leases, so the table stays small
+    if random.random() < 0.01:
+        SingleflightLease.objects.using(LEASE_DB_ALIAS).filter(expires_at__lt=timezone.now() - timedelta(hours=1)).delete()
+
+
+def _db_wait(key, deadline):
+    """Poll the lease until the leader finishes. Returns ("done", result), ("failed", error), ("retry", None) or ("timeout", None)."""
+    from .models import SingleflightLease
+
+    while time.monotonic() < deadline:
+        lease = SingleflightLease.objects.using(LEASE_DB_ALIAS).filter(key=key).first()
+        if lease is None or (lease.status == "running" and lease.expires_at <= timezone.now()):
+            return "retry", None
+        if lease.status == "done":
+            return "done", lease.result
+        if lease.status == "failed":
+            return "failed", lease.error
+        time.sleep(settings.SINGLEFLIGHT_POLL_INTERVAL)
+    return "timeout", None
+
+
+def _db_flight(key, name, fn, lease_seconds, result_ttl, deadline):
+    owner = _owner()
+    while True:
+        leading, lease = _db_try_lead(key, name, owner, lease_seconds, result_ttl)
+        if leading:
+            return _run_as_leader(fn, lambda status, result=None, error=None: _db_finish(key, owner, status, result, error))
+
+        if lease.status == "done":
+            _count("remote_follower")
+            return lease.result
+
+        outcome, value = _db_wait(key, deadline)
+        if outcome == "done":
+            _count("remote_follower")
+            return value
+        if outcome == "failed":
+            _count("remote_follower")
+            raise SingleflightError(value)
+        if outcome == "timeout":
+            _count("wait_timeout")
+            logger.warning(f"Singleflight {name} {key[:12]} waited too long for its leader; running the call itself")
+            return fn()
+
+
+# ---- Cache backend (needs a shared cache such as Redis in CACHES) ----
+
+def _cache_flight(key, name, fn, lease_seconds, result_ttl, deadline):
+    lease_key = f"singleflight:lease:{key}"
+    result_key = f"singleflight:result:{key}"
+    owner = _owner()
+
+    while True:
+        shared = cache.get(result_key)
+        if shared is not None and shared["completed_at"] + result_ttl > time.time():
+            _count("remote_follower")
+            return shared["result"]
+
+        if cache.add(lease_key, owner, timeout=lease_seconds):
+            def finish(status, result=None, error=None):
+                # Kept at least a few poll intervals, so waiting followers see it
+                keep = max(result_ttl, settings.SINGLEFLIGHT_POLL_INTERVAL * 10)
+                try:
+                    cache.set(result_key, {"status": status, "result": result, "error": error, "completed_at": time.time()}, timeout=keep)
+                except Exception as e:
+                    logger.warning(f"Singleflight result for {key[:12]} cannot be shared: {e}")
+                cache.delete(lease_key)
+            return _run_as_leader(fn, finish)
+
+        while time.monotonic() < deadline:
+            shared = cache.get(result_key)
+            if shared is not None and shared["completed_at"] >= time.time() - settings.SINGLEFLIGHT_POLL_INTERVAL * 10:
+                _count("remote_follower")
+                if shared["status"] == "failed":
+                    raise SingleflightError(shared["error"])
+                return shared["result"]
+            if cache.get(lease_key) is None:
+                break  # leader finished without a shareable result, or died
+            time.sleep(settings.SINGLEFLIGHT_POLL_INTERVAL)
+        else:
+            _count("wait_timeout")
+            logger.warning(f"Singleflight {name} {key[:12]} waited too long for its leader; running the call itself")
+            return fn()
+
+
+def _run_as_leader(fn, finish):
+    _count("leader")
+    try:
+        result = fn()
+    except Exception as e:
+        finish("failed", error=f"{type(e).__name__}: {e}")
+        raise
+    finish("done", result=result)
+    return result
+
+
+# ---- Entry points ----
+
+def singleflight_call(name, key_parts, fn, lease_seconds=None, result_ttl=None, backend=None):
+    """
+    Run fn() once for all overlapping calls with the same name and key_parts.
+
+    lease_seconds  how long a leader may run before a waiting follower takes over
+    result_ttl     seconds a finished result is still handed to new callers (0: only to callers already waiting)
+    backend        "database", "cache", "local" (this process only) or "off"; default SINGLEFLIGHT_BACKEND
+    """
+    backend = backend or settings.SINGLEFLIGHT_BACKEND
+    if backend == "off":
+        return fn()
+
+    key = fingerprint(name, *key_parts)
+    lease_seconds = lease_seconds or settings.SINGLEFLIGHT_LEASE_SECONDS
+    result_ttl = settings.SINGLEFLIGHT_RESULT_TTL if result_ttl is None else result_ttl
+    wait_timeout = settings.SINGLEFLIGHT_WAIT_TIMEOUT
+
+    # Threads of this process share one future
+    with _local_lock:
+        future = _local_flights.get(key)
+        leading = future is None
+        if leading:
+            future = _local_flights[key] = Future()
+
+    if not leading:
+        _count("local_follower")
+        try:
+            return future.result(timeout=wait_timeout)
+        except FutureTimeoutError:
+            _count("wait_timeout")
+            return fn()
+        except Exception as e:
+            raise SingleflightError(f"{type(e).__name__}: {e}") from e
+
+    try:
+        deadline = time.monotonic() + wait_timeout
+        if backend == "database":
+            result = _db_flight(key, name, fn, lease_seconds, result_ttl, deadline)
+        elif backend == "cache":
+            result = _cache_flight(key, name, fn, lease_seconds, result_ttl, deadline)
+        else:
+            _count("leader")
+            result = fn()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _local_lock:
+            _local_flights.pop(key, None)
+
+
+def singleflight(name, key=None, **options):
+    """
+    Decorator form of singleflight_call. `key(*args, **kwargs)` returns the parts that identify
+    identical calls; by default all arguments.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key_parts = key(*args, **kwargs) if key else (args, kwargs)
+            if not isinstance(key_parts, (list, tuple)):
+                key_parts = (key_parts,)
+            return singleflight_call(name, key_parts, lambda: func(*args, **kwargs), **options)
+        return wrapper
+    return decorator
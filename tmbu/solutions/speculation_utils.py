@@ -0,0 +1,175 @@
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import re
+import time
+import difflib
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone, translation
+from .llm_usage_utils import collect_usage, estimate_cost
+
+logger = logging.getLogger(__name__)
+
+
+# Most users resubmit their scenario unchanged or with a small correction after reading the element
+# advice, so the factor advice of the second submission is started as soon as the first one commits.
+#
+#   hit        the second submission was served the precomputed advice
+#   joined     the speculation was still running; the second submission waited for it (singleflight)
+#   miss       the input changed too much; the advice was computed again and the speculation wasted
+#   not_ready  the speculation had failed or not started; computed again
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def input_similarity(first, second):
+    first, second = _normalize(first), _normalize(second)
+    if first == second:
+        return 1.0
+    return difflib.SequenceMatcher(None, first, second, autojunk=False).ratio()
+
+
+def schedule_factor_advice_speculation(scenario, query_mode):
+    """Record a speculation for the scenario and start it once the caller's transaction commits."""
+    from .models import SpeculativeFactorAdvice
+    from .tasks import precompute_factor_advice_task
+
+    if not settings.SPECULATIVE_FACTOR_ADVICE_ENABLED or scenario.scenario_factor_advice:
+        return None
+
+    # Computed in the submission's language, so it matches (and coalesces with) the second submission
+    language = translation.get_language() or settings.LANGUAGE_CODE
+    speculation, _ = SpeculativeFactorAdvice.objects.update_or_create(
+        scenario=scenario,
+        defaults={
+            "user_id": scenario.user_id,
+            "scenario_input": scenario.scenario_input,
+            "query_mode": query_mode,
+            "language": language,
+            "status": "pending",
+            "factor_advice": None,
+            "error": None,
+            "created_at": timezone.now(),
+            "completed_at": None,
+            "outcome": None,
+        },
+    )
+    transaction.on_commit(lambda: precompute_factor_advice_task.delay(scenario.user_id, scenario.scenario_id, language))
+    return speculation
+
+
+def run_factor_advice_speculation(scenario_id, language=None):
+    """Body of precompute_factor_advice_task: compute the factor advice in `language` and record what it cost."""
+    from .models import SpeculativeFactorAdvice
+    from .milvus_llm_utils import generate_factor_advice
+
+    speculation = SpeculativeFactorAdvice.objects.select_related("scenario").filter(scenario_id=scenario_id).first()
+    if speculation is None:
+        return "no speculation"
+
+    scenario = speculation.scenario
+    # The second submission got here first, or the input changed since the speculation was scheduled
+    if scenario.scenario_factor_advice or speculation.outcome or _normalize(scenario.scenario_input) != _normalize(speculation.scenario_input):
+        SpeculativeFactorAdvice.objects.filter(pk=speculation.pk, status="pending").update(status="skipped", completed_at=timezone.now())
+        return "skipped"
+
+    if not SpeculativeFactorAdvice.objects.filter(pk=speculation.pk, status="pending").update(status="running"):
+        return "already running"
+
+    start = time.monotonic()
+    with collect_usage() as usage, translation.override(language or settings.LANGUAGE_CODE):
+        try:
+            factor_advice = generate_factor_advice(speculation.scenario_input, query_mode=speculation.query_mode, scenario=scenario)
+            status, error = "ready", None
+        except Exception as e:
+            logger.warning(f"Speculative factor advice for scenario {scenario_id} failed: {e}")
+            factor_advice, status, error = None, "failed", str(e)
+
+    SpeculativeFactorAdvice.objects.filter(pk=speculation.pk).update(
+        status=status,
+        factor_advice=factor_advice,
+        error=error,
+        prompt_tokens=sum(record["prompt_tokens"] for record in usage),
+        completion_tokens=sum(record["completion_tokens"] for record in usage),
+        cost_usd=sum(
+            estimate_cost(record["model"], record["prompt_tokens"], record["completion_tokens"], record["cached_tokens"])
+            for record in usage
+        ),
+        compute_seconds=time.monotonic() - start,
+        completed_at=timezone.now(),
+    )
+    return status
+
+
+def take_speculative_factor_advice(scenario, scenario_input, query_mode):
+    """
+    The precomputed factor advice when it is ready and was computed for (nearly) this input,
+    otherwise None. Either way the speculation's outcome is recorded.
+    """
+    from .models import SpeculativeFactorAdvice
+
+    speculation = SpeculativeFactorAdvice.objects.filter(scenario_id=scenario.pk, outcome__isnull=True).first()
+    if speculation is None:
+        return None
+
+    similarity = input_similarity(speculation.scenario_input, scenario_input)
+    same_request = (
+        similarity >= settings.SPECULATIVE_FACTOR_ADVICE_MIN_SIMILARITY
+        and speculation.query_mode == query_mode
+        and speculation.language == (translation.get_language() or settings.LANGUAGE_CODE)
+    )
+
+    # A ready speculation without advice (generate_factor_advice returned nothing) is not served
+    if speculation.status == "ready" and same_request and speculation.factor_advice:
+        outcome = "hit"
+    elif speculation.status == "running" and same_request and speculation.scenario_input == scenario_input:
+        # generate_factor_advice is coalesced with the running task, so the caller shares its result
+        outcome = "joined"
+    elif not same_request:
+        outcome = "miss"
+    else:
+        outcome = "not_ready"
+
+    SpeculativeFactorAdvice.objects.filter(pk=speculation.pk, outcome__isnull=True).update(
+        outcome=outcome, similarity=similarity, used_at=timezone.now()
+    )
+    logger.info(f"Speculative factor advice for scenario {scenario.pk}: {outcome} (similarity {similarity:.2f})")
+    return speculation.factor_advice if outcome == "hit" else None
+
+
+def speculation_summary(queryset=None):
+    """Hit rate and wasted spend; speculations unused after SPECULATIVE_FACTOR_ADVICE_ABANDON_HOURS count as abandoned."""
+    from .models import SpeculativeFactorAdvice
+
+    queryset = SpeculativeFactorAdvice.objects.all() if queryset is None else queryset
+    abandoned = Q(outcome__isnull=True, created_at__lt=timezone.now() - timedelta(hours=settings.SPECULATIVE_FACTOR_ADVICE_ABANDON_HOURS))
+    wasted = Q(outcome__in=["miss", "not_ready"]) | abandoned
+
+    totals = queryset.aggregate(
+        total=Count("pk"),
+        hits=Count("pk", filter=Q(outcome="hit")),
+        joined=Count("pk", filter=Q(outcome="joined")),
+        misses=Count("pk", filter=Q(outcome="miss")),
+        not_ready=Count("pk", filter=Q(outcome="not_ready")),
+        abandoned=Count("pk", filter=abandoned),
+        spend_usd=Sum("cost_usd"),
+        wasted_usd=Sum("cost_usd", filter=wasted),
+        saved_seconds=Sum("compute_seconds", filter=Q(outcome="hit")),
+    )
+    decided = totals["hits"] + totals["joined"] + totals["misses"] + totals["not_ready"] + totals["abandoned"]
+    totals["hit_rate"] = (totals["hits"] + totals["joined"]) / decided if decided else 0.0
+    totals["spend_usd"] = totals["spend_usd"] or 0.0
+    totals["wasted_usd"] = totals["wasted_usd"] or 0.0
+    totals["saved_seconds"] = totals["saved_seconds"] or 0.0
+    return totals
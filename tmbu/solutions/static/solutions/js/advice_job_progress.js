@@ -0,0 +1,50 @@
+/*
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.      
+*/
+
+// Follow the advice job shown on the page and reload once its result is saved (or it failed)
+
+document.addEventListener('DOMContentLoaded', function() {
+    const block = document.getElementById('adviceJobProgress');
+    if (!block) {
+        return;
+    }
+
+    const progressText = block.querySelector('.advice-job-progress');
+    const labels = {
+        queued: gettext('Waiting to start.'),
+        generating: gettext('In progress.'),
+        saving: gettext('Saving...'),
+    };
+
+    // Pushed when the job ends (user_events.js); polling stays as the fallback, slower while connected
+    window.userEvents && userEvents.on('advice_job', job => {
+        if (job.job_id === block.dataset.jobId) {
+            window.location.reload();
+        }
+    });
+
+    function pollDelay() {
+        return window.userEvents && userEvents.connected ? 10000 : 2000;
+    }
+
+    function poll() {
+        fetch(block.dataset.statusUrl, { credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(job => {
+                if (job.status === 'queued' || job.status === 'running') {
+                    progressText.textContent = labels[job.progress] || labels.generating;
+                    setTimeout(poll, pollDelay());
+                } else {
+                    window.location.reload();
+                }
+            })
+            .catch(() => setTimeout(poll, 5000));
+    }
+
+    setTimeout(poll, 2000);
+});
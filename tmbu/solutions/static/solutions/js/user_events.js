@@ -0,0 +1,28 @@
+/*
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
+
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.      
+*/
+
+// One Server-Sent Events connection per page for the events published to the logged-in user.
+// Pages register handlers with userEvents.on(name, handler) and keep polling (less often while connected).
+
+(function() {
+    const script = document.currentScript;
+    const userEvents = { connected: false, on: function() {} };
+    window.userEvents = userEvents;
+
+    if (!script || !script.dataset.eventsUrl || !window.EventSource) {
+        return;
+    }
+
+    const source = new EventSource(script.dataset.eventsUrl);
+    source.onopen = () => { userEvents.connected = true; };
+    source.onerror = () => { userEvents.connected = false; };  // the browser reconnects by itself
+
+    userEvents.on = function(name, handler) {
+        source.addEventListener(name, event => handler(JSON.parse(event.data)));
+    };
+})();
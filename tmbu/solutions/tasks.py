@@ -3,15 +3,65 @@ from celery import shared_task
 from django.utils import timezone
 from .models import ScenarioForMining, ScenarioActors, ScenarioDynamics, ScenarioNeeds, ScenarioSkillsResources, ScenarioAnalysisPrediction, IndividualTraits, GroupTraits, IndividualProfile, GroupProfile, GlobalActorsProfiles, Interactions, InteractionRelations, SocialNetworkGraphCache
 from .milvus_llm_utils import generate_scenario_actors, generate_scenario_dynamics, generate_scenario_needs, generate_scenario_skills_resources, generate_analysis_prediction, generate_global_actors_profiles, summarize_relationship_status
+from .milvus_llm_utils import build_scenario_actors_messages, build_scenario_dynamics_messages, build_scenario_needs_messages, build_scenario_skills_resources_messages, build_analysis_prediction_messages
+from .milvus_llm_utils import generate_consolidated_scenario_analysis, build_consolidated_scenario_analysis_messages, SCENARIO_ANALYSIS_RESPONSE_FORMAT
+from .llm_batch_utils import queue_scenario_batch_request, submit_pending_batches, poll_batches, save_scenario_analysis_sections, CONSOLIDATED_TARGET
+from django.conf import settings
 from django.db import transaction
 from django.forms.models import model_to_dict
 from django.contrib.auth.models import User
 from .update_aggregate_utils import update_individual_profile, update_group_profile, aggregate_actors_relationship_status
+from .llm_ledger_utils import set_llm_call_context, reset_llm_call_context
+from .singleflight_utils import singleflight_call
+from .speculation_utils import run_factor_advice_speculation
+from .advice_job_utils import run_advice_job
+from .pipeline_status_utils import tracks_pipeline_sections
+from .event_stream_utils import publish_user_event
+from celery.signals import task_prerun, task_postrun
+import inspect
 import json
 
 
+# Tag OpenAI calls made inside a task with the task id, task name and user. Callers pass user_id to the
+# scenario tasks (only for this); a scenario task queued without it is looked up, and only for the ledger.
+_task_context_tokens = {}
+
+
+def _task_user_id(task, args, kwargs):
+    try:
+        arguments = inspect.signature(task.run).bind_partial(*(args or ()), **(kwargs or {})).arguments
+    except TypeError:
+        return None
+
+    if arguments.get("user_id") is not None:
+        return arguments["user_id"]
+    if "scenario_id" in arguments and settings.LLM_USAGE_LEDGER_ENABLED:
+        return ScenarioForMining.objects.filter(scenario_id=arguments["scenario_id"]).values_list("user_id", flat=True).first()
+    return None
+
+
+@task_prerun.connect
+def set_task_llm_call_context(sender=None, task_id=None, task=None, args=None, kwargs=None, **extra):
+    _task_context_tokens[task_id] = set_llm_call_context(
+        task_id=task_id,
+        source=task.name,
+        user_id=_task_user_id(task, args, kwargs),
+    )
+
+
+@task_postrun.connect
+def reset_task_llm_call_context(sender=None, task_id=None, **extra):
+    token = _task_context_tokens.pop(task_id, None)
+    if token is not None:
+        try:
+            reset_llm_call_context(token)
+        except ValueError:
+            pass  # the task ran in another context (e.g. eager mode in a thread)
+
+
 @shared_task
-def build_scenario_actors_task(scenario_id):
+@tracks_pipeline_sections("actors")
+def build_scenario_actors_task(scenario_id, user_id=None):
     scenario = ScenarioForMining.objects.get(scenario_id=scenario_id)
 
     individuals_data = []
@@ -35,6 +85,11 @@ def build_scenario_actors_task(scenario_id):
     # Combine for LLM
     combined_data = {"individual_traits": individuals_data, "group_traits": groups_data,}
     
+    # Batch mode: the result is written back when the batch completes
+    if settings.OPENAI_BATCH_MODE:
+        queue_scenario_batch_request(scenario, "actors", build_scenario_actors_messages(combined_data))
+        return f"Scenario Actor Traits queued for batch for scenario {scenario.scenario_id}"
+
     # LLM call
     llm_output = generate_scenario_actors(combined_data)
 
@@ -52,7 +107,8 @@ def build_scenario_actors_task(scenario_id):
 
 
 @shared_task
-def build_scenario_dynamics_task(scenario_id):
+@tracks_pipeline_sections("dynamics")
+def build_scenario_dynamics_task(scenario_id, user_id=None):
 
     scenario = ScenarioForMining.objects.get(scenario_id=scenario_id)
 
@@ -70,6 +126,10 @@ def build_scenario_dynamics_task(scenario_id):
     # Combine for LLM
     combined_data = {"interactions": interaction_data, "interaction_relations": relation_data,}
 
+    # Batch mode: the result is written back when the batch completes
+    if settings.OPENAI_BATCH_MODE:
+        queue_scenario_batch_request(scenario, "dynamics", build_scenario_dynamics_messages(combined_data))
+        return f"Social Dynamics queued for batch for scenario {scenario.scenario_id}"
 
     # LLM call
     llm_output = generate_scenario_dynamics(combined_data)
@@ -88,7 +148,8 @@ def build_scenario_dynamics_task(scenario_id):
     
 
 @shared_task
-def build_scenario_needs_task(scenario_id):
+@tracks_pipeline_sections("needs")
+def build_scenario_needs_task(scenario_id, user_id=None):
     scenario = ScenarioForMining.objects.get(scenario_id=scenario_id)
       
     individuals_data = []
@@ -118,6 +179,11 @@ def build_scenario_needs_task(scenario_id):
     combined_data = {"individual_traits": individuals_data, "group_traits": groups_data, "interaction_relations": relation_data,}
     
     
+    # Batch mode: the result is written back when the batch completes
+    if settings.OPENAI_BATCH_MODE:
+        queue_scenario_batch_request(scenario, "needs", build_scenario_needs_messages(combined_data))
+        return f"Scenario needs queued for batch for scenario {scenario.scenario_id}"
+
     # LLM call
     llm_output = generate_scenario_needs(combined_data)
 
@@ -136,7 +202,8 @@ def build_scenario_needs_task(scenario_id):
     
 
 @shared_task
-def build_scenario_skills_resources_task(scenario_id):
+@tracks_pipeline_sections("skills_resources")
+def build_scenario_skills_resources_task(scenario_id, user_id=None):
     scenario = ScenarioForMining.objects.get(scenario_id=scenario_id)
     
     individuals_data = []
@@ -166,6 +233,11 @@ def build_scenario_skills_resources_task(scenario_id):
     # Combine for LLM
     combined_data = {"individual_traits": individuals_data, "group_traits": groups_data, "interaction_relations": relation_data,}
     
+    # Batch mode: the result is written back when the batch completes
+    if settings.OPENAI_BATCH_MODE:
+        queue_scenario_batch_request(scenario, "skills_resources", build_scenario_skills_resources_messages(combined_data))
+        return f"Social Skills Resources queued for batch for scenario {scenario.scenario_id}"
+
     # LLM call
     llm_output = generate_scenario_skills_resources(combined_data)
 
@@ -185,9 +257,15 @@ def build_scenario_skills_resources_task(scenario_id):
     
 
 @shared_task
-def build_scenario_analysis_prediction_task(scenario_id):
+@tracks_pipeline_sections("analysis_prediction")
+def build_scenario_analysis_prediction_task(scenario_id, user_id=None):
     scenario = ScenarioForMining.objects.get(scenario_id=scenario_id)
     
+    # Batch mode: the result is written back when the batch completes
+    if settings.OPENAI_BATCH_MODE:
+        queue_scenario_batch_request(scenario, "analysis_prediction", build_analysis_prediction_messages(scenario.scenario_input))
+        return f"Analysis and Prediction queued for batch for scenario {scenario.scenario_id}"
+
      # LLM call
     llm_output = generate_analysis_prediction(scenario.scenario_input)
 
@@ -206,6 +284,81 @@ def build_scenario_analysis_prediction_task(scenario_id):
     
 
 
+def collect_scenario_mining_data(scenario):
+    individuals_data = []
+    for t in IndividualTraits.objects.filter(scenario=scenario).select_related("actor"):
+        data = model_to_dict(t)
+        data["individual_name_or_alias"] = t.actor.name_or_alias  # attach identifier
+        individuals_data.append(data)
+
+    groups_data = []
+    for g in GroupTraits.objects.filter(scenario=scenario).select_related("actor"):
+        data = model_to_dict(g)
+        data["group_name_or_alias"] = g.actor.name_or_alias  # attach identifier
+        groups_data.append(data)
+
+    interaction_data = []
+    for i in Interactions.objects.filter(scenario=scenario).select_related("actor"):
+        data = model_to_dict(i)
+        data["name_or_alias"] = i.actor.name_or_alias  # attach identifier
+        interaction_data.append(data)
+
+    relation_data = [model_to_dict(r) for r in InteractionRelations.objects.filter(scenario=scenario)]
+
+    return {
+        "individual_traits": individuals_data,
+        "group_traits": groups_data,
+        "interactions": interaction_data,
+        "interaction_relations": relation_data,
+    }
+
+
+# Consolidated engine (SCENARIO_ANALYSIS_ENGINE = "consolidated"): one structured completion
+# replaces the five build_scenario_*_task calls and is split into the same Scenario* rows.
+@shared_task
+@tracks_pipeline_sections()
+def build_scenario_analysis_task(scenario_id, user_id=None):
+    scenario = ScenarioForMining.objects.get(scenario_id=scenario_id)
+
+    combined_data = collect_scenario_mining_data(scenario)
+
+    # Batch mode: the sections are written back when the batch completes
+    if settings.OPENAI_BATCH_MODE:
+        queue_scenario_batch_request(
+            scenario,
+            CONSOLIDATED_TARGET,
+            build_consolidated_scenario_analysis_messages(combined_data, scenario.scenario_input),
+            response_format=SCENARIO_ANALYSIS_RESPONSE_FORMAT,
+        )
+        return f"Scenario analysis queued for batch for scenario {scenario.scenario_id}"
+
+    # LLM call
+    sections = generate_consolidated_scenario_analysis(combined_data, scenario.scenario_input)
+    if sections is None:
+        raise RuntimeError(f"Consolidated scenario analysis failed for scenario {scenario.scenario_id}")
+
+    # Save result
+    save_scenario_analysis_sections(scenario, sections)
+
+    print(f"Scenario analysis built for scenario {scenario.scenario_id}")
+
+    return f"Scenario analysis built for scenario {scenario.scenario_id}"
+
+
+@shared_task
+def submit_llm_batches_task():
+    job = submit_pending_batches()
+    if job is None:
+        return "No queued batch requests"
+    return f"Submitted batch {job.openai_batch_id} with {job.request_count} requests"
+
+
+@shared_task
+def poll_llm_batches_task():
+    finished = poll_batches()
+    return f"{finished} batches finished"
+
+
 @shared_task
 def update_individual_profile_task(user_id):
     user = User.objects.get(id=user_id)
@@ -255,6 +408,7 @@ def build_global_actors_profiles_task(_results, user_id):
         user=user,  # must pass a User instance
         defaults={"global_actors_profiles": json_string_output }
     )
+    publish_user_event(user_id, "actors_profiles")
 
     return user_id
 
@@ -270,8 +424,21 @@ def build_social_network_graph_task(user_id):
         SocialNetworkGraphCache.objects.update_or_create(
             user=user, defaults={"graph_data": {"nodes": [], "edges": []}}
         )
+        publish_user_event(user_id, "social_graph")
         return {"nodes": [], "edges": []}
 
+    # Duplicate graph builds for the same profiles version run once; the others return its graph
+    graph = singleflight_call(
+        "build_social_network_graph",
+        (user_id, profile.pk, profile.last_updated),
+        lambda: build_social_network_graph(user, profile),
+        result_ttl=0,
+    )
+    publish_user_event(user_id, "social_graph")
+    return graph
+
+
+def build_social_network_graph(user, profile):
     try:
         categories = json.loads(profile.global_actors_profiles)
     except json.JSONDecodeError:
@@ -347,4 +514,17 @@ def build_social_network_graph_task(user_id):
             defaults={"graph_data": graph}
     )
 
-    return graph
\ No newline at end of file
+    return graph
+
+
+
+# Precompute the factor advice of the second scenario submission, see solutions.speculation_utils
+@shared_task
+def precompute_factor_advice_task(user_id, scenario_id, language=None):
+    return run_factor_advice_speculation(scenario_id, language)
+
+
+# Advice generation for the comprehensive and quick solution views and experience mining, see solutions.advice_job_utils
+@shared_task
+def run_advice_job_task(job_id):
+    return run_advice_job(job_id)
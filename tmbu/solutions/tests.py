@@ -1,3 +1,260 @@
-from django.test import TestCase
+"""
+Copyright (c) 2024-2025 Qu Zhi
+All Rights Reserved.
 
-# Create your tests here.
+This software is proprietary and confidential.
+Unauthorized copying, distribution, or modification of this software is strictly prohibited.
+"""
+
+import re
+import json
+import asyncio
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import translation
+from accounts.models import UserFreeTrialScenarioMining
+from .advice_job_utils import run_advice_job
+from .event_stream_utils import PostgresEventBackend, user_channel
+from .llm_batch_utils import _claim_queued_requests
+from .models import Scenario, ScenarioQuickSolution, ScenarioForMining, Actors, IndividualTraits, IndividualProfile, LLMBatchRequest, AdviceJob, GeneratedSimulation, LiveSimulation
+from .prompt_budget_utils import TRUNCATION_MARKER
+from .simulation_history_utils import simulation_history_page, count_simulations, encode_cursor, COUNT_LIMIT, PAGE_SIZE
+from .update_aggregate_utils import update_individual_profile
+
+
+def echo_existing_profiles(messages, helper=None, **kwargs):
+    """Stands in for the aggregation model: returns every profile it was sent as an update, fields as received."""
+    text = messages[-1]["content"][0]["text"]
+    sent = re.search(r"the existing profiles:(.*)the new traits:", text, re.S).group(1).strip()
+    profiles = [] if sent == "None" else json.loads(sent)
+    return {"updates": [
+        {**profile, "old_canonical_name": profile["canonical_name"], "new_canonical_name": profile["canonical_name"]}
+        for profile in profiles
+    ]}
+
+
+@override_settings(PROMPT_TOKEN_BUDGETS={"default": 16000, "aggregate_individual_traits": 5000})
+class ProfileAggregationBudgetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("miner", password="x")
+        scenario = ScenarioForMining.objects.create(user=self.user, scenario_input="Alice meets Bob.")
+        actor = Actors.objects.create(user=self.user, scenario=scenario, name_or_alias="Alice")
+        IndividualTraits.objects.create(user=self.user, scenario=scenario, actor=actor, personality="calm")
+
+        self.long_text = " ".join(f"trait{i}" for i in range(1500))  # some 3000 tokens: one profile fits the budget, two do not
+        self.mentioned = IndividualProfile.objects.create(user=self.user, canonical_name="Alice", personality=self.long_text)
+        self.unmentioned = IndividualProfile.objects.create(user=self.user, canonical_name="Carol", personality=self.long_text)
+
+    def test_long_profile_survives_aggregation_over_budget(self):
+        with mock.patch("solutions.milvus_llm_utils.call_openai_output_json_string", side_effect=echo_existing_profiles) as llm:
+            update_individual_profile(self.user)
+
+        sent = llm.call_args.args[0][-1]["content"][0]["text"]
+        self.assertNotIn(TRUNCATION_MARKER, sent)
+        self.assertIn(self.long_text, sent)
+        self.assertNotIn("Carol", sent)  # over budget: the unmentioned profile is left out whole
+
+        self.mentioned.refresh_from_db()
+        self.unmentioned.refresh_from_db()
+        self.assertEqual(self.mentioned.personality, self.long_text)
+        self.assertEqual(self.unmentioned.personality, self.long_text)
+
+
+class BatchSubmissionClaimTests(TestCase):
+
+    def test_claimed_requests_leave_the_queue(self):
+        user = User.objects.create_user("batcher", password="x")
+        scenario = ScenarioForMining.objects.create(user=user, scenario_input="A team splits.")
+        for target in ("actors", "needs"):
+            LLMBatchRequest.objects.create(user=user, scenario=scenario, target=target, custom_id=f"{target}-1", body={})
+
+        first = _claim_queued_requests()
+        second = _claim_queued_requests()  # an overlapping beat run
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second, [])
+        self.assertEqual(LLMBatchRequest.objects.filter(status="submitting").count(), 2)
+
+
+def listening_connections():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE application_name = %s", [f"{settings.DB_APPLICATION_NAME}-events"])
+        return cursor.fetchone()[0]
+
+
+class PostgresEventStreamTests(TransactionTestCase):
+
+    async def test_open_streams_share_one_listening_connection(self):
+        backend = PostgresEventBackend()
+        streams = [backend.listen(user_channel(user_id), 2) for user_id in (1, 2, 1)]
+        received = [asyncio.ensure_future(anext(stream)) for stream in streams]
+
+        for _ in range(50):  # until the listener is connected
+            if await sync_to_async(listening_connections)():
+                break
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.2)
+
+        await sync_to_async(backend.publish)(user_channel(1), '{"event": "graph_ready"}')
+        first, second, third = await asyncio.gather(*received)
+
+        self.assertEqual(first, '{"event": "graph_ready"}')
+        self.assertIsNone(second)  # user 2 only gets the heartbeat
+        self.assertEqual(third, '{"event": "graph_ready"}')
+        self.assertEqual(await sync_to_async(listening_connections)(), 1)
+
+        for stream in streams:
+            await stream.aclose()
+        for task in list(backend.listeners.values()):
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+EXTRACTED_INFO = {"actors": [{"actor_ref_id": "a1", "name_or_alias": "Alice", "actor_type": Actors.INDIVIDUAL}]}
+EXPERIENCE = "Alice meets Bob at the office every morning and they talk about the project. " * 4
+EDITED_EXPERIENCE = "Alice leaves Bob a note every evening because they no longer talk about the project. " * 4
+
+
+@override_settings(ADVICE_JOBS_ENABLED=True)
+class ScenarioMiningJobTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("miner", password="x")
+        self.client.force_login(self.user)  # activates the profile and with it the free trials
+        translation.activate("en")  # the URLs of the language prefixed pages
+        self.addCleanup(translation.deactivate)
+
+        self.llm_transactions = []  # in_atomic_block of each extraction call
+        patcher = mock.patch("solutions.tasks.run_advice_job_task.apply_async")
+        self.enqueued = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("solutions.scenario_mining_utils.dispatch_scenario_mining_tasks")
+        self.dispatched = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def extract(self, scenario_input):
+        self.llm_transactions.append(connection.in_atomic_block)
+        return EXTRACTED_INFO
+
+    def submit(self, url, scenario_input):
+        with mock.patch("solutions.milvus_llm_utils.extract_info_from_scenario", side_effect=self.extract) as llm:
+            response = self.client.post(url, {"scenario_input": scenario_input, "submit_scenario": ""})
+        llm.assert_not_called()  # the request only enqueues the extraction
+        self.assertEqual(response.status_code, 302)
+        return AdviceJob.objects.get(kind="scenario_mining", status="queued")
+
+    def test_extraction_runs_in_a_job_outside_any_transaction(self):
+        job = self.submit(reverse("new_scenario_mining"), EXPERIENCE)
+        scenario = ScenarioForMining.objects.get(pk=job.scenario_id)
+        self.assertFalse(scenario.scenario_submitted)
+        self.enqueued.assert_called_once()
+
+        with mock.patch("solutions.milvus_llm_utils.extract_info_from_scenario", side_effect=self.extract):
+            # Claim and fetch, the LLM call, then one short transaction (progress, submission, scenario, the
+            # actor, status, free use) and the entitlement cache invalidated after its commit
+            with self.assertNumQueries(18):
+                self.assertEqual(run_advice_job(job.pk), "succeeded")
+
+        self.assertEqual(self.llm_transactions, [False])
+        scenario.refresh_from_db()
+        self.assertTrue(scenario.scenario_submitted)
+        self.assertEqual(scenario.scenario_form_submission_count, 1)
+        self.assertEqual(Actors.objects.filter(scenario=scenario).count(), 1)
+        self.dispatched.assert_called_once()  # after the commit
+        self.assertEqual(UserFreeTrialScenarioMining.objects.get(user=self.user).scenario_creation_attempts, 1)
+
+    def test_failed_extraction_keeps_the_submitted_experience(self):
+        scenario = ScenarioForMining.objects.create(user=self.user, scenario_input=EXPERIENCE, scenario_submitted=True, scenario_form_submission_count=1)
+        url = reverse("existing_scenario_mining", kwargs={"scenario_id": scenario.scenario_id})
+        job = self.submit(url, EDITED_EXPERIENCE)
+
+        with mock.patch("solutions.milvus_llm_utils.extract_info_from_scenario", side_effect=RuntimeError("model down")):
+            self.assertEqual(run_advice_job(job.pk), "failed")
+
+        scenario.refresh_from_db()
+        self.assertEqual(scenario.scenario_input, EXPERIENCE)
+        self.assertEqual(scenario.scenario_form_submission_count, 1)
+        self.assertFalse(Actors.objects.filter(scenario=scenario).exists())
+        self.dispatched.assert_not_called()
+
+        page = self.client.get(url).content.decode()
+        self.assertIn("adviceJobFailed", page)
+        self.assertIn(EDITED_EXPERIENCE.strip(), page)  # offered again
+
+
+class SimulationHistoryQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("historian", password="x")
+        GeneratedSimulation.objects.bulk_create(
+            [
+                GeneratedSimulation(user=cls.user, actors=[], scenario=f"Generated simulation {i}", result={}, actors_traits_snapshot={}, actors_relations_snapshot={})
+                for i in range(50000)
+            ],
+            batch_size=5000,
+        )
+        LiveSimulation.objects.bulk_create([LiveSimulation(user=cls.user, scenario=f"Live simulation {i}") for i in range(100)])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+        # Some 40000 rows deep, where an OFFSET page would scan everything before it
+        row = GeneratedSimulation.objects.filter(user=self.user).order_by("-created_at", "-generated_simulation_id").values("created_at", "generated_simulation_id")[40000]
+        self.deep_cursor = encode_cursor({"created_at": row["created_at"], "type": "Generated", "id": row["generated_simulation_id"]})
+
+    def test_first_and_deep_pages_take_one_query(self):
+        with self.assertNumQueries(1):
+            first = simulation_history_page(self.user)
+        with self.assertNumQueries(1):
+            deep = simulation_history_page(self.user, before=self.deep_cursor)
+
+        self.assertEqual([row["type"] for row in first["simulations"]], ["Live"] * PAGE_SIZE)
+        self.assertEqual(len(deep["simulations"]), PAGE_SIZE)
+        self.assertIsNotNone(deep["older_cursor"])
+        self.assertIsNotNone(deep["newer_cursor"])
+
+    def test_total_is_counted_up_to_the_limit_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(count_simulations(self.user), (COUNT_LIMIT, True))
+
+    def test_history_page_query_budget(self):
+        # Session and user, the page, the total
+        for params in ({}, {"before": self.deep_cursor}):
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse("my_simulations"), params)
+            self.assertEqual(response.status_code, 200)
+
+
+class ScenarioListingQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lister", password="x")
+        cls.long_input = "A long story about a difficult meeting with the team. " * 200
+        for i in range(25):
+            Scenario.objects.create(user=cls.user, scenario_input=cls.long_input, scenario_factor_advice=cls.long_input, user_experience=cls.long_input)
+            ScenarioQuickSolution.objects.create(user=cls.user, scenario_input=cls.long_input, scenario_quick_solution=cls.long_input)
+            ScenarioForMining.objects.create(user=cls.user, scenario_input=cls.long_input)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+    def test_listing_query_budget(self):
+        # Session and user, the count, the page of previews; the same on every page
+        for url_name in ("my_scenarios", "my_scenarios_quick_solution", "my_scenarios_mining"):
+            for page in (1, 3):
+                with self.subTest(listing=url_name, page=page), self.assertNumQueries(4):
+                    response = self.client.get(reverse(url_name), {"page": page})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotIn(self.long_input, response.content.decode())  # previews only
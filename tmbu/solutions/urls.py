@@ -14,6 +14,7 @@ urlpatterns = [
     path("my-solutions/", views.my_solutions_view, name="my_solutions"),
     path('scenario-process/', views.scenario_process_view, name='new_scenario'),  
     path('scenario-process/<int:scenario_id>/', views.scenario_process_view, name='existing_scenario'),  
+    path('advice-job/<uuid:job_id>/', views.advice_job_status_view, name='advice_job_status'),
     path('my-scenarios/', views.my_scenarios_view, name='my_scenarios'), 
     path("delete-selected-comprehensive-solutions/", views.delete_selected_comprehensive_solutions, name="delete_selected_comprehensive_solutions"),
     path('scenario-quick-solution/', views.scenario_quick_solution_view, name='new_scenario_quick_solution'),  
@@ -24,6 +25,9 @@ urlpatterns = [
     path('scenario-mining/<int:scenario_id>/', views.scenario_mining_view, name='existing_scenario_mining'),  
     path('my-scenarios-mining/', views.my_scenarios_mining_view, name='my_scenarios_mining'),  
     path("delete-selected-experiences/", views.delete_selected_experiences, name="delete_selected_experiences"),
+    path("events/", views.user_events_view, name="user_events"),
+    path("db-connection-stats/", views.db_connection_stats_view, name="db_connection_stats"),
+    path("scenario-mining-status/<int:scenario_id>/", views.scenario_mining_status_view, name="scenario_mining_status"),
     path("get-scenario-actors-traits/<int:scenario_id>/", views.get_scenario_actors_traits_view, name="get_scenario_actors_traits"),
     path("get-scenario-dynamics/<int:scenario_id>/", views.get_scenario_dynamics_view, name="get_scenario_dynamics"),
     path("get-scenario-needs/<int:scenario_id>/", views.get_scenario_needs_view, name="get_scenario_needs"),
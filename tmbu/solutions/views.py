@@ -18,24 +18,36 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
-from django.http import JsonResponse, HttpResponseForbidden
+from django.db.models import F
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.utils import timezone
 from django.utils.translation import gettext as _, get_language
 from django.utils.decorators import method_decorator
-from django.core.paginator import Paginator
+from django.views.decorators.http import condition
 from .models import Scenario, ScenarioForMining, ScenarioActors, ScenarioDynamics, ScenarioNeeds, ScenarioSkillsResources, ScenarioAnalysisPrediction, ScenarioQuickSolution, Actors, IndividualTraits, GroupTraits, IndividualProfile, GroupProfile, Interactions, InteractionRelations, GlobalActorsProfiles, SocialNetworkGraphCache, GeneratedSimulation, LiveSimulation
-from payments.models import UserSubscription
-from accounts.models import UserFreeTrial, UserFreeTrialQuickSolution, UserFreeTrialScenarioMining
 from .forms import ScenarioInputForm, SolutionInputForm, ExperienceForm, ScenarioInputQuickSolutionForm, ScenarioForMiningForm
 from .milvus_connection_utils import ensure_connection
-from .milvus_llm_utils import generate_element_advice, generate_factor_advice, generate_solution_advice, generate_quick_solution, extract_info_from_scenario, aggregate_individual_traits, aggregate_group_traits, generate_scenario_actors, generate_scenario_dynamics, generate_scenario_needs, generate_scenario_skills_resources, generate_analysis_prediction, generate_global_actors_profiles, summarize_relationship_status, llm_generate_simulation, llm_generate_live_simulation
+from .milvus_llm_utils import extract_info_from_scenario, aggregate_individual_traits, aggregate_group_traits, generate_scenario_actors, generate_scenario_dynamics, generate_scenario_needs, generate_scenario_skills_resources, generate_analysis_prediction, generate_global_actors_profiles, summarize_relationship_status, allm_generate_simulation, allm_generate_live_simulation
 from pymilvus import MilvusClient
-from .tasks import build_scenario_actors_task, build_scenario_dynamics_task, build_scenario_needs_task, build_scenario_skills_resources_task, build_scenario_analysis_prediction_task, update_individual_profile_task, update_group_profile_task, build_global_actors_profiles_task, build_social_network_graph_task
+from .tasks import build_scenario_actors_task, build_scenario_dynamics_task, build_scenario_needs_task, build_scenario_skills_resources_task, build_scenario_analysis_prediction_task, build_scenario_analysis_task, update_individual_profile_task, update_group_profile_task, build_global_actors_profiles_task, build_social_network_graph_task
 from celery.result import AsyncResult
+from asgiref.sync import sync_to_async
 from celery import chain, chord
 from collections import defaultdict
 from typing import Dict, List, Tuple
 from .update_aggregate_utils import resolve_to_canonical
+from .factor_query_utils import get_factor_query_mode
+from .speculation_utils import schedule_factor_advice_speculation
+from .scenario_workflow_utils import apply_if_unchanged
+from accounts.entitlement_utils import get_entitlements, aget_entitlements, can_use, charges_free_use, count_free_use, MAX_FREE_USES
+from .scenario_artifact_utils import invalidate_scenario_artifacts
+from .event_stream_utils import event_stream_enabled, user_event_stream
+from .db_connection_utils import connection_stats, postgres_backend_stats
+from .pipeline_status_utils import pipeline_status_payload
+from .scenario_listing_utils import listing_page, text_preview, is_filled
+from .simulation_history_utils import simulation_history_page, count_simulations
+from .advice_job_utils import ACTIVE_STATUSES, enqueue_advice_job, latest_advice_job, expire_stale_advice_jobs, generate_advice, apply_advice
+from .models import AdviceJob, ScenarioPipelineStatus
 
 logger = logging.getLogger(__name__)
 
@@ -49,8 +61,6 @@ def my_solutions_view(request):
 
 def scenario_process_view(request, scenario_id=None):
 
-    MAX_FREE_USES = 20
- 
     is_new_scenario = request.GET.get('new', 'false').lower() == 'true' or scenario_id is None
     scenario = None 
 
@@ -82,12 +92,15 @@ def scenario_process_view(request, scenario_id=None):
         return redirect('my_scenarios')
 
 
-    free_trial = None
-    subscription = None
+    entitlements = None
     if request.user.is_authenticated:
-        # Fetch free trial and subscription details
-        free_trial = UserFreeTrial.objects.filter(user=request.user).first()
-        subscription = UserSubscription.objects.filter(user=request.user, subscription_status='active').first()
+        # Subscription and free trial state, cached per user (accounts.entitlement_utils)
+        entitlements = get_entitlements(request.user)
+
+    # Latest advice job of this scenario, shown as progress while it runs
+    advice_job = None
+    if scenario and scenario.pk and request.user.is_authenticated:
+        advice_job = latest_advice_job(["element_advice", "factor_advice", "solution_advice"], scenario.pk, request.user)
 
 
     if request.method == 'POST':
@@ -101,89 +114,108 @@ def scenario_process_view(request, scenario_id=None):
                 return redirect(f"{reverse('login')}?next={request.path}")
       
             if scenario_form.is_valid():
-                with transaction.atomic():
-                    
-                    # Check if the user can submit a scenario
-                    if not (free_trial and not free_trial.has_used_free_trial) and not subscription:   
-                        # No free trial left and no subscription
-                        # messages.error(request, _("You must have an active subscription to submit a scenario."))
-                        return redirect('subscription_plan')
-            
-                    # First submission or update scenario_input
-                    if is_new_scenario:
-
-                        ## Check for exceeding scenario creation attempts
-                        #if free_trial.scenario_creation_attempts > 0 and not subscription:
-                        #    # messages.error(request, _("You have exceeded the free trial limit for scenario creation."))
-                        #    return redirect('subscription_plan')
-
-                        scenario = scenario_form.save(commit=False)
-                        scenario.user = request.user
-                        scenario.scenario_input_time = timezone.now()
-                        scenario.save()
-                        # messages.success(request, _("New goal/situation created successfully."))
-                        
-                        scenario.scenario_form_submission_count += 1  # Increment counter for first submission
-                        scenario.save()
-
-                        #if not free_trial.has_used_free_trial:
-                        #    free_trial.scenario_creation_attempts += 1
-                        #    free_trial.save()
+                
+                # Check if the user can submit a scenario
+                if not can_use(entitlements, "scenario_process"):
+                    # No free trial left and no subscription
+                    # messages.error(request, _("You must have an active subscription to submit a scenario."))
+                    return redirect('subscription_plan')
 
-                        
-
-                    else:  # Second submission: update the scenario input
-                        if scenario.scenario_form_submission_count >= 2:
-                            # messages.error(request, _("You have already submitted your goal/situation twice. Further updates are not allowed."))  
-                            return redirect('existing_scenario', scenario_id=scenario.scenario_id) # Silent block
-                        
-                        scenario.scenario_input = scenario_form.cleaned_data['scenario_input']
-                        scenario.save()
-                        # messages.info(request, _("Goal/situation updated successfully."))
-                                
-                        scenario.scenario_form_submission_count += 1 # Increment counter for all submissions
-                        scenario.save()
+                if advice_job and advice_job.status in ACTIVE_STATUSES:
+                    return redirect('existing_scenario', scenario_id=scenario.scenario_id) # Silent block while advice is generated
 
+                # The submission is committed before the LLM call and the advice applied afterwards in a
+                # second short transaction, so no transaction or row lock is held while the LLM runs
+                # (see solutions.scenario_workflow_utils)
+        
+                # First submission or update scenario_input
+                if is_new_scenario:
 
-                    if not scenario.scenario_element_advice:
-                        # First submission: generate element advice
-                        scenario.scenario_element_advice = generate_element_advice(scenario.scenario_input)
-                        scenario.save()
-                        # messages.info(request, _("Goal/situation review generated."))
+                    ## Check for exceeding scenario creation attempts
+                    #if free_trial.scenario_creation_attempts > 0 and not subscription:
+                    #    # messages.error(request, _("You have exceeded the free trial limit for scenario creation."))
+                    #    return redirect('subscription_plan')
 
+                    scenario = scenario_form.save(commit=False)
+                    scenario.user = request.user
+                    scenario.scenario_input_time = timezone.now()
+                    scenario.scenario_form_submission_count = 1  # Counter for first submission
+                    scenario.save()
+                    # messages.success(request, _("New goal/situation created successfully."))
 
-                        # Count this as a free use (new or update submission)
-                        if free_trial and not free_trial.has_used_free_trial and not subscription:
-                            free_trial.scenario_creation_attempts += 1
-                            if free_trial.scenario_creation_attempts >= MAX_FREE_USES:
-                                free_trial.has_used_free_trial = True
-                            free_trial.save()
+                    #if not free_trial.has_used_free_trial:
+                    #    free_trial.scenario_creation_attempts += 1
+                    #    free_trial.save()
 
+                    previous_input, previous_count = None, 0
 
-                        return redirect('existing_scenario', scenario_id=scenario.scenario_id)  # add this
+                else:  # Second submission: update the scenario input
+                    if scenario.scenario_form_submission_count >= 2:
+                        # messages.error(request, _("You have already submitted your goal/situation twice. Further updates are not allowed."))  
+                        return redirect('existing_scenario', scenario_id=scenario.scenario_id) # Silent block
+                    
+                    previous_input, previous_count = scenario_form.initial.get('scenario_input'), scenario.scenario_form_submission_count
+                    scenario.scenario_input = scenario_form.cleaned_data['scenario_input']
+
+                    # Only if no parallel submission counted first
+                    if not apply_if_unchanged(
+                        Scenario, scenario.pk,
+                        {"scenario_form_submission_count": previous_count},
+                        {"scenario_input": scenario.scenario_input, "scenario_form_submission_count": F("scenario_form_submission_count") + 1},
+                    ):
+                        return redirect('existing_scenario', scenario_id=scenario.scenario_id) # Silent block
+                    scenario.scenario_form_submission_count = previous_count + 1
+                    if scenario.scenario_input != previous_input:
+                        invalidate_scenario_artifacts("scenario", scenario.pk)
+                    # messages.info(request, _("Goal/situation updated successfully."))
+
+                kind = "element_advice" if not scenario.scenario_element_advice else "factor_advice"
+                charge_free_use = charges_free_use(entitlements, "scenario_process")
+
+                if settings.ADVICE_JOBS_ENABLED:
+                    # Generated by a Celery worker; the page shows the job's progress and reloads when it is done
+                    enqueue_advice_job(kind, scenario, charge_free_use)
+                    return redirect('existing_scenario', scenario_id=scenario.scenario_id)
 
+                try:
+                    # First submission: element advice; second submission: factors advice
+                    advice = generate_advice(kind, scenario)
+                except Exception:
+                    # Undo the submission, as the rolled-back transaction used to
+                    if is_new_scenario:
+                        scenario.delete()
                     else:
-                        # Second submission: generate factors advice
-                        scenario.scenario_factor_advice = generate_factor_advice(scenario.scenario_input)
-                        scenario.save()
-                        # messages.info(request, _("Solution ideas generated."))
+                        apply_if_unchanged(
+                            Scenario, scenario.pk,
+                            {"scenario_form_submission_count": previous_count + 1},
+                            {"scenario_input": previous_input, "scenario_form_submission_count": previous_count},
+                        )
+                    raise
+
+                with transaction.atomic():
+                    # A parallel request for the same input may have applied its advice first
+                    if apply_advice(kind, scenario.pk, scenario.scenario_input, advice):
+                        # messages.info(request, _("Goal/situation review generated.") / _("Solution ideas generated."))
 
+                        # Count this as a free use (first or second submission)
+                        if charge_free_use:
+                            count_free_use("scenario_process", request.user.pk, MAX_FREE_USES)
 
-                        # Count this as a free use (second submission)
-                        if free_trial and not free_trial.has_used_free_trial and not subscription:
-                            free_trial.scenario_creation_attempts += 1
-                            if free_trial.scenario_creation_attempts >= MAX_FREE_USES:
-                                free_trial.has_used_free_trial = True
-                            free_trial.save()
-                        
+                        if kind == "element_advice":
+                            # Start on the factor advice while the user reads the element advice
+                            scenario.scenario_element_advice = advice
+                            schedule_factor_advice_speculation(scenario, get_factor_query_mode("scenario_process"))
 
-                        return redirect('existing_scenario', scenario_id=scenario.scenario_id)  # Redirect to refresh the page with the updated advice
+                return redirect('existing_scenario', scenario_id=scenario.scenario_id)  # Redirect to refresh the page with the updated advice
 
                               
         # Handle solution form submission
         elif 'submit_solution' in request.POST and solution_form:
             
             if solution_form.is_valid():
+                if advice_job and advice_job.status in ACTIVE_STATUSES:
+                    return redirect('existing_scenario', scenario_id=scenario.scenario_id) # Silent block while advice is generated
+
                 with transaction.atomic():
 
                 # Check if this is the first submission
@@ -212,15 +244,17 @@ def scenario_process_view(request, scenario_id=None):
                         scenario.solution_form_submission_count += 1
                         scenario.save()  
 
-                    if not scenario.scenario_solution_advice:
-                        scenario.scenario_solution_advice = generate_solution_advice(scenario.scenario_solution_input)
+                # Generated after the commit above; applied only if no parallel request did it first
+                if not scenario.scenario_solution_advice:
+                    if settings.ADVICE_JOBS_ENABLED:
+                        enqueue_advice_job("solution_advice", scenario, charge_free_use=False)
+                    else:
+                        apply_advice("solution_advice", scenario.pk, scenario.scenario_solution_input, generate_advice("solution_advice", scenario))
                         # messages.info(request, _("Strategic considerations generated."))
-                        scenario.save()
 
-                    return redirect('existing_scenario', scenario_id=scenario.scenario_id)  # Redirect to refresh the page
+                return redirect('existing_scenario', scenario_id=scenario.scenario_id)  # Redirect to refresh the page
 
                 
-        # Handle experience form submission
         elif 'submit_experience' in request.POST and experience_form:
             
             if experience_form.is_valid():
@@ -242,18 +276,20 @@ def scenario_process_view(request, scenario_id=None):
                     return redirect('existing_scenario', scenario_id=scenario.scenario_id)  # Redirect to refresh the page
 
 
+    advice_running = bool(advice_job and advice_job.status in ACTIVE_STATUSES)
+
     # Context for template rendering
     context = {
-        'free_trial': free_trial,
-        'subscription': subscription,
+        'entitlements': entitlements,
         "is_new_scenario": is_new_scenario,
         'scenario': scenario,
-        'scenario_form': scenario_form if not scenario or scenario.scenario_form_submission_count < 2 else None,
-        'solution_form': solution_form if scenario and scenario.solution_form_submission_count < 2 else None,
+        'scenario_form': scenario_form if (not scenario or scenario.scenario_form_submission_count < 2) and not advice_running else None,
+        'solution_form': solution_form if scenario and scenario.solution_form_submission_count < 2 and not advice_running else None,
         'experience_form': experience_form if scenario and not scenario.experience_submitted else None,
         'last_scenario_input': scenario.scenario_input if scenario else "",
         'last_solution_input': scenario.scenario_solution_input if scenario else "",
         'last_experience_input': scenario.user_experience if scenario and scenario.experience_submitted else "",  
+        'advice_job': advice_job,
     }
 
     return render(request, 'solutions/scenario_process.html', context)
@@ -262,8 +298,6 @@ def scenario_process_view(request, scenario_id=None):
 
 def scenario_quick_solution_view(request, scenario_id=None):
 
-    MAX_FREE_USES = 20
-    
     is_new_scenario = request.GET.get('new', 'false').lower() == 'true' or scenario_id is None
     scenario = None 
 
@@ -288,12 +322,15 @@ def scenario_quick_solution_view(request, scenario_id=None):
         return redirect('my_scenarios_quick_solution')
 
 
-    free_trial = None
-    subscription = None        
+    entitlements = None
     if request.user.is_authenticated:
-        # Fetch free trial and subscription status
-        free_trial = UserFreeTrialQuickSolution.objects.filter(user=request.user).first()
-        subscription = UserSubscription.objects.filter(user=request.user, subscription_status='active').first()
+        # Subscription and free trial state, cached per user (accounts.entitlement_utils)
+        entitlements = get_entitlements(request.user)
+
+    # Latest generation job of this scenario, shown as progress while it runs
+    advice_job = None
+    if scenario and scenario.pk and request.user.is_authenticated:
+        advice_job = latest_advice_job(["quick_solution"], scenario.pk, request.user)
 
 
     if request.method == 'POST':
@@ -308,68 +345,66 @@ def scenario_quick_solution_view(request, scenario_id=None):
                 return redirect(f"{reverse('login')}?next={request.path}")
       
             if scenario_form.is_valid():
-                with transaction.atomic():
                     
-                    # Check if the user can submit a scenario
-                    if not (free_trial and not free_trial.has_used_free_trial) and not subscription:   
-                        # No free trial left and no subscription
-                        # messages.error(request, _("You must have an active subscription to submit a scenario."))
-                        return redirect('subscription_plan')
-            
-                    ## New scenario submission
-                    #if is_new_scenario:
-
-                    #    # Check for exceeding scenario creation attempts
-                    #    if free_trial and free_trial.scenario_creation_attempts > 0 and not subscription:
-                    #        # messages.error(request, _("You have exceeded the free trial limit for scenario creation."))
-                    #        return redirect('subscription_plan')
-                        
-                    # Scenario submission
-                    scenario = scenario_form.save(commit=False)
-                    scenario.user = request.user
-                    scenario.scenario_input_time = timezone.now()
-                    scenario.save()
-                        
-                    # Generate quick solution
-                    try:
-                        scenario.scenario_quick_solution = generate_quick_solution(scenario.scenario_input)
-                        scenario.scenario_form_submission_count += 1  # Increment counter for each submission
-                        scenario.scenario_submitted = True
-                                    
-                        #if scenario.scenario_form_submission_count == 1:
-                            #messages.success(request, _("Scenario submitted and quick solution generated!"))
-                        # else:
-                            #messages.success(request, _("Scenario and quick solution updated!"))
-                    
-                        scenario.save(update_fields=["scenario_quick_solution", "scenario_form_submission_count", "scenario_submitted"])
+                # Check if the user can submit a scenario
+                if not can_use(entitlements, "quick_solution"):
+                    # No free trial left and no subscription
+                    # messages.error(request, _("You must have an active subscription to submit a scenario."))
+                    return redirect('subscription_plan')
 
-                    except Exception as e:
-                        # messages.error(request, _("Something went wrong while generating quick solution. Please try again."))
-                        
-                        return redirect('existing_scenario_quick_solution', scenario_id=scenario.scenario_id)  
-   
+                if advice_job and advice_job.status in ACTIVE_STATUSES:
+                    return redirect('existing_scenario_quick_solution', scenario_id=scenario.scenario_id) # Silent block while the solution is generated
+        
+                ## New scenario submission
+                #if is_new_scenario:
 
-                    # Mark the free trial as used
+                #    # Check for exceeding scenario creation attempts
+                #    if free_trial and free_trial.scenario_creation_attempts > 0 and not subscription:
+                #        # messages.error(request, _("You have exceeded the free trial limit for scenario creation."))
+                #        return redirect('subscription_plan')
                     
-                    if free_trial and not free_trial.has_used_free_trial and not subscription:
-                        free_trial.scenario_creation_attempts += 1
+                # Scenario submission, committed before the LLM call (see solutions.scenario_workflow_utils)
+                scenario = scenario_form.save(commit=False)
+                scenario.user = request.user
+                scenario.scenario_input_time = timezone.now()
+                scenario.save()
+                    
+                if settings.ADVICE_JOBS_ENABLED:
+                    # Generated by a Celery worker; the page shows the job's progress and reloads when it is done
+                    enqueue_advice_job("quick_solution", scenario, charge_free_use=charges_free_use(entitlements, "quick_solution"))
+                    return redirect('existing_scenario_quick_solution', scenario_id=scenario.scenario_id)
 
-                        if free_trial.scenario_creation_attempts >= MAX_FREE_USES:
-                            free_trial.has_used_free_trial = True
+                # Generate quick solution, outside any transaction
+                try:
+                    quick_solution = generate_advice("quick_solution", scenario)
+                except Exception as e:
+                    # messages.error(request, _("Something went wrong while generating quick solution. Please try again."))
+                    
+                    return redirect('existing_scenario_quick_solution', scenario_id=scenario.scenario_id)  
+
+                with transaction.atomic():
+                    # Applied only if the input was not changed by a parallel submission meanwhile
+                    if apply_advice("quick_solution", scenario.pk, scenario.scenario_input, quick_solution):
+                        #if scenario.scenario_form_submission_count == 1:
+                            #messages.success(request, _("Scenario submitted and quick solution generated!"))
+                        # else:
+                            #messages.success(request, _("Scenario and quick solution updated!"))
 
-                        free_trial.save()
+                        # Mark the free trial as used
+                        if charges_free_use(entitlements, "quick_solution"):
+                            count_free_use("quick_solution", request.user.pk, MAX_FREE_USES)
                         # messages.success(request, _("You have completed the free trial."))
 
-                    return redirect('existing_scenario_quick_solution', scenario_id=scenario.scenario_id)  # Redirect to refresh the page
+                return redirect('existing_scenario_quick_solution', scenario_id=scenario.scenario_id)  # Redirect to refresh the page
 
 
     # Context for template rendering
     context = {
-        'free_trial': free_trial,
-        'subscription': subscription,
+        'entitlements': entitlements,
         "is_new_scenario": is_new_scenario,
         'scenario': scenario,
-        'scenario_form': scenario_form,
+        'scenario_form': scenario_form if not (advice_job and advice_job.status in ACTIVE_STATUSES) else None,
+        'advice_job': advice_job,
         #'last_scenario_input': scenario.scenario_input if scenario else "",
     }
 
@@ -378,22 +413,30 @@ def scenario_quick_solution_view(request, scenario_id=None):
 
 
 @login_required
-def my_scenarios_view(request):
-    scenarios = Scenario.objects.filter(user=request.user).order_by('-scenario_input_time')
-    paginator = Paginator(scenarios, 10)  # Show 10 scenarios per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
+def advice_job_status_view(request, job_id):
+    # Polled by the scenario pages while their advice is generated
+    job = get_object_or_404(AdviceJob, job_id=job_id, user=request.user)
+    expire_stale_advice_jobs([job])
+
+    return JsonResponse({
+        "status": job.status,
+        "progress": job.progress,
+        "failed": job.status == "failed",
+    })
+
 
-    # Debugging outputs
-    print(f"Total scenarios for user {request.user.id}: {scenarios.count()}")
-    print(f"Page number requested: {page_number}")
-    print(f"Scenarios on this page: {[scenario.scenario_id for scenario in page_obj]}")
 
+@login_required
+def my_scenarios_view(request):
+    page_obj = listing_page(
+        Scenario, request.user, request.GET.get('page'),
+        input_preview=text_preview("scenario_input", 40),
+        has_experience=is_filled("user_experience"),
+    )
 
     return render(request, 'solutions/my_scenarios.html', {
         'page_obj': page_obj,
-        'total_scenarios': scenarios.count(),  # Total number of scenarios
+        'total_scenarios': page_obj.paginator.count,  # Total number of scenarios
     })
 
 
@@ -415,21 +458,15 @@ def delete_selected_comprehensive_solutions(request):
 
 @login_required
 def my_scenarios_quick_solution_view(request):
-    scenarios = ScenarioQuickSolution.objects.filter(user=request.user).order_by('-scenario_input_time')
-    paginator = Paginator(scenarios, 10)  # Show 10 scenarios per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-
-    # Debugging outputs
-    print(f"Total scenarios for user {request.user.id}: {scenarios.count()}")
-    print(f"Page number requested: {page_number}")
-    print(f"Scenarios on this page: {[scenario.scenario_id for scenario in page_obj]}")
-
+    page_obj = listing_page(
+        ScenarioQuickSolution, request.user, request.GET.get('page'),
+        input_preview=text_preview("scenario_input", 30),
+        solution_preview=text_preview("scenario_quick_solution", 30),
+    )
 
     return render(request, 'solutions/my_scenarios_quick_solutions.html', {
         'page_obj': page_obj,
-        'total_scenarios': scenarios.count(),  # Total number of scenarios
+        'total_scenarios': page_obj.paginator.count,  # Total number of scenarios
     })
 
 
@@ -449,108 +486,8 @@ def delete_selected_quick_solutions(request):
     return redirect("my_scenarios_quick_solution")
 
 
-def save_extracted_info(user, scenario, extracted_info):
-
-    # --- 1. Save Actors ---
-    actor_map = {}
-    for actor_data in extracted_info.get("actors", []):
-        actor_obj = Actors.objects.create(
-            user=user,
-            scenario=scenario,
-            name_or_alias=actor_data["name_or_alias"],
-            actor_type=actor_data["actor_type"]
-        )
-        actor_map[actor_data["actor_ref_id"]] = actor_obj
-
-
-
-    # --- 2. Individual Traits ---
-    for ind in extracted_info.get("individual_traits", []):
-        actor = actor_map.get(ind.get("actor"))
-        if actor and actor.actor_type == Actors.INDIVIDUAL:
-            IndividualTraits.objects.create(
-                user=user,
-                scenario=scenario,
-                actor=actor,                
-                cognitive_pattern=ind.get("cognitive_pattern"),
-                affect_pattern=ind.get("affect_pattern"),
-                action_pattern=ind.get("action_pattern"),
-                personality=ind.get("personality"),                    
-                beliefs_values=ind.get("beliefs_values"),
-                priorities=ind.get("priorities"),
-                life_style=ind.get("life_style"),
-                identity=ind.get("identity"),
-                capabilities=ind.get("capabilities"),
-                family=ind.get("family"),
-                marriage_intimate_relationship=ind.get("marriage_intimate_relationship"),
-                education=ind.get("education"),
-                occupation_job_industry=ind.get("occupation_job_industry"),
-                social_economic_status=ind.get("social_economic_status"),
-                social_network=ind.get("social_network"),
-                biological_characteristics=ind.get("biological_characteristics"),              
-            )
-
-    # --- 3. Group Traits ---
-    for grp in extracted_info.get("group_traits", []):
-        actor = actor_map.get(grp.get("actor"))
-        if actor and actor.actor_type == Actors.GROUP:
-            GroupTraits.objects.create(
-                user=user,
-                scenario=scenario,
-                actor=actor,               
-                group_type=grp.get("group_type"),
-                domain=grp.get("domain"),
-                size=grp.get("size"),
-                mission_vision_value=grp.get("mission_vision_value"),
-                goal_strategy=grp.get("goal_strategy"),
-                objectives_plan=grp.get("objectives_plan"),
-                governance=grp.get("governance"),
-                organizational_structure=grp.get("organizational_structure"),
-                operation_system=grp.get("operation_system"),
-                organizational_politics=grp.get("organizaional_politics"),
-                influence=grp.get("influence"),
-                leadership=grp.get("leadership"),
-                culture=grp.get("culture"),
-                performance=grp.get("performance"),
-                challenge=grp.get("challenge"),
-                funding_resources_budget=grp.get("funding_resources_budget"),
-            )
-
-
-    # --- 4. Save Interactions ---
-    interaction_map = {}
-    for inter in extracted_info.get("interactions", []):
-        actor = actor_map.get(inter["actor"])
-        interaction = Interactions.objects.create(
-            user=user,
-            scenario=scenario,
-            actor=actor,
-            behavior_description=inter.get("behavior_description"),
-            env=inter.get("env"),
-        )
-        interaction_map[inter["behavior_id"]] = interaction
-
-    # --- 5. Save InteractionRelations ---
-    for rel in extracted_info.get("interaction_relations", []):
-        relation = InteractionRelations.objects.create(
-            user=user,
-            scenario=scenario,
-            source=interaction_map.get(rel["source"]),
-            target=interaction_map.get(rel["target"]),
-            relation_description=rel.get("relation_description"),
-            related_actors_relationship_status=rel.get("related_actors_relationship_status"),
-        )
-        # add related actors (many-to-many)
-        for actor_ref_id in rel.get("related_actors", []):
-            if actor_ref_id in actor_map:
-                relation.related_actors.add(actor_map[actor_ref_id])
-
-
-
 def scenario_mining_view(request, scenario_id=None):
 
-    MAX_FREE_USES = 20
-
     is_new_scenario = request.GET.get('new', 'false').lower() == 'true' or scenario_id is None
     scenario = None 
 
@@ -575,14 +512,18 @@ def scenario_mining_view(request, scenario_id=None):
         return redirect('my_scenarios_mining')
 
 
-    free_trial = None
-    subscription = None
-    if request.user.is_authenticated:      
-        # Fetch subscription status and free trial status       
-        free_trial = UserFreeTrialScenarioMining.objects.filter(user=request.user).first()
-        subscription = UserSubscription.objects.filter(user=request.user, subscription_status='active').first()
+    entitlements = None
+    if request.user.is_authenticated:
+        # Subscription and free trial state, cached per user (accounts.entitlement_utils)
+        entitlements = get_entitlements(request.user)
 
-    task_ids = {}
+    # Latest extraction job of this experience, shown as progress while it runs
+    advice_job = None
+    if scenario and scenario.pk and request.user.is_authenticated:
+        advice_job = latest_advice_job(["scenario_mining"], scenario.pk, request.user)
+        if advice_job and advice_job.status == "failed" and request.method != 'POST':
+            # Offer the experience that failed again, not the previous submission
+            scenario_form = ScenarioForMiningForm(initial={'scenario_input': advice_job.input_text}, instance=scenario)
 
     if request.method == 'POST':
     
@@ -596,112 +537,121 @@ def scenario_mining_view(request, scenario_id=None):
                 return redirect(f"{reverse('login')}?next={request.path}")
                   
             if scenario_form.is_valid():
-                with transaction.atomic():
-                                          
-                    # Check if the user can submit a scenario
-                    if not (free_trial and not free_trial.has_used_free_trial) and not subscription:   
-                    # No free trial left and no subscription
-                        # messages.error(request, _("You must have an active subscription to submit a scenario."))
-                        return redirect('subscription_plan')
-        
-                    ## New scenario submission
-                    #if is_new_scenario:
-
-                    #    # Check for exceeding scenario creation attempts
-                    #    if free_trial and free_trial.scenario_creation_attempts > 0 and not subscription:
-                    #        # messages.error(request, _("You have exceeded the free trial limit for scenario creation."))
-                    #        return redirect('subscription_plan')
-                     
-                       
-                    # Scenario submission
+                                      
+                # Check if the user can submit a scenario
+                if not can_use(entitlements, "scenario_mining"):
+                # No free trial left and no subscription
+                    # messages.error(request, _("You must have an active subscription to submit a scenario."))
+                    return redirect('subscription_plan')
+    
+                ## New scenario submission
+                #if is_new_scenario:
+
+                #    # Check for exceeding scenario creation attempts
+                #    if free_trial and free_trial.scenario_creation_attempts > 0 and not subscription:
+                #        # messages.error(request, _("You have exceeded the free trial limit for scenario creation."))
+                #        return redirect('subscription_plan')
+                 
+                   
+                if advice_job and advice_job.status in ACTIVE_STATUSES:
+                    return redirect('existing_scenario_mining', scenario_id=scenario.scenario_id) # Silent block while the experience is mined
+
+                # A new experience is saved as a draft first, so the job has a row to submit. An edit of a
+                # submitted one is only saved with its extracted info, so a failed extraction leaves the
+                # previous submission as it was (see solutions.scenario_mining_utils)
+                if scenario.pk is None:
                     scenario = scenario_form.save(commit=False)
                     scenario.user = request.user
                     scenario.scenario_input_time = timezone.now()
                     scenario.save()
-                                          
-                    try:
-                        # Call LLM
-                        extracted_info = extract_info_from_scenario(scenario.scenario_input)
-
-                        # Save extracted info
-                        save_extracted_info(scenario.user, scenario, extracted_info)
-
-                        scenario.scenario_form_submission_count += 1  # Increment counter for each submission
-                        scenario.scenario_submitted = True
-                                    
-                        # if scenario.scenario_form_submission_count == 1:
-                            # messages.success(request, _("experience mining is done !"))
-                        # else:
-                            # messages.success(request, _("Submit new experience!"))
-                    
-                        scenario.save(update_fields=["scenario_form_submission_count", "scenario_submitted"])
+                else:
+                    scenario.scenario_input = scenario_form.cleaned_data['scenario_input']
+                submission_count = scenario.scenario_form_submission_count
+                charge_free_use = charges_free_use(entitlements, "scenario_mining")
 
+                if settings.ADVICE_JOBS_ENABLED:
+                    # Extracted by a Celery worker; the page shows the job's progress and reloads when it is done
+                    enqueue_advice_job("scenario_mining", scenario, charge_free_use)
+                    return redirect('existing_scenario_mining', scenario_id=scenario.scenario_id)
 
-                    except Exception as e:
-                        logger.exception("Error in extracting info")
-                        # messages.error(request, _("Something went wrong while extracting info."))
-                        return redirect('existing_scenario_mining', scenario_id=scenario.scenario_id)  
-                                        
-                    
-                    # Trigger independent async tasks
-
-                    actors_task = build_scenario_actors_task.delay(scenario.scenario_id)
-                    dynamics_task = build_scenario_dynamics_task.delay(scenario.scenario_id)
-                    needs_task = build_scenario_needs_task.delay(scenario.scenario_id)
-                    skills_resources_task = build_scenario_skills_resources_task.delay(scenario.scenario_id)
-                    analysis_prediction_task = build_scenario_analysis_prediction_task.delay(scenario.scenario_id)
-                    
-                    # Launch chord: run two updates in parallel, then build global
-                    workflow = chord(
-                        [update_individual_profile_task.s(scenario.user_id),
-                        update_group_profile_task.s(scenario.user_id)
-                        ]
-                    )(
-                        build_global_actors_profiles_task.s(user_id=scenario.user_id)
-                        | build_social_network_graph_task.s()
-                    )
-
-
-                    # Build social network graph (user-specific)
-                    # graph_task = build_social_network_graph_task.delay(scenario.user_id)
-                    
-                    task_ids = {
-                        "Actor": actors_task.id,
-                        "Dynamics": dynamics_task.id,
-                        "Needs": needs_task.id,
-                        "Skills_Resources": skills_resources_task.id,
-                        "Analysis_Prediction": analysis_prediction_task.id,
-                        #"Graph": graph_task.id,
-                        "Profile+Graph": workflow.id,
-                    }
-                                    
-                    # Mark the free trial as used
-                    
-                    if free_trial and not free_trial.has_used_free_trial and not subscription:
-                        free_trial.scenario_creation_attempts += 1
+                try:
+                    # Call LLM, outside any transaction
+                    extracted_info = generate_advice("scenario_mining", scenario)
+                except Exception as e:
+                    logger.exception("Error in extracting info")
+                    # messages.error(request, _("Something went wrong while extracting info."))
+                    return redirect('existing_scenario_mining', scenario_id=scenario.scenario_id)  
 
-                        if free_trial.scenario_creation_attempts >= MAX_FREE_USES:
-                            free_trial.has_used_free_trial = True
+                with transaction.atomic():
+                    # Applied only if no parallel submission of this scenario was applied meanwhile
+                    if apply_advice("scenario_mining", scenario.pk, scenario.scenario_input, extracted_info, submission_count):
+                        # if submission_count == 0:
+                            # messages.success(request, _("experience mining is done !"))
+                        # else:
+                            # messages.success(request, _("Submit new experience!"))
 
-                        free_trial.save()
+                        # Mark the free trial as used
+                        if charge_free_use:
+                            count_free_use("scenario_mining", request.user.pk, MAX_FREE_USES)
                         # messages.success(request, _("You have completed the free trial."))
 
-                    return redirect('existing_scenario_mining', scenario_id=scenario.scenario_id)  # Redirect to refresh the page
+                return redirect('existing_scenario_mining', scenario_id=scenario.scenario_id)  # Redirect to refresh the page
 
 
     # Context for template rendering
     context = {
-        'free_trial': free_trial,
-        'subscription': subscription,
+        'entitlements': entitlements,
         "is_new_scenario": is_new_scenario,
         'scenario': scenario,
-        'scenario_form': scenario_form,
-        "task_ids": task_ids,
+        'scenario_form': scenario_form if not (advice_job and advice_job.status in ACTIVE_STATUSES) else None,
+        'advice_job': advice_job,
     }
 
     return render(request, 'solutions/scenario_mining.html', context)
 
 
+# Push channel of the logged-in user as Server-Sent Events (solutions.event_stream_utils). Async, so an open
+# stream only holds a coroutine under the ASGI server instead of a worker thread.
+async def user_events_view(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponseForbidden()
+    if not event_stream_enabled():
+        return HttpResponse(status=204)  # EventSource stops reconnecting; the pages keep polling
+
+    response = StreamingHttpResponse(user_event_stream(user.pk), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # no proxy buffering
+    return response
+
+
+# Database connection usage of the process serving the request and backends on the Postgres side
+# (solutions.db_connection_utils). Staff only.
+@login_required
+def db_connection_stats_view(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    return JsonResponse({
+        "process": connection_stats(),
+        "postgres": postgres_backend_stats(),
+    })
+
+
+def scenario_mining_status_etag(request, scenario_id):
+    version = ScenarioPipelineStatus.objects.filter(scenario_id=scenario_id, user=request.user).values_list("version", flat=True).first()
+    return f"{scenario_id}-{version}" if version else None
+
+
+# All mining sections in one response; an unchanged version is answered with 304 Not Modified
+@login_required
+@condition(etag_func=scenario_mining_status_etag)
+def scenario_mining_status_view(request, scenario_id):
+    scenario = get_object_or_404(ScenarioForMining, scenario_id=scenario_id, user=request.user)
+    response = JsonResponse(pipeline_status_payload(scenario))
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @login_required
 def get_scenario_actors_traits_view(request, scenario_id):
     try:
@@ -749,20 +699,14 @@ def get_scenario_analysis_prediction_view(request, scenario_id):
 
 @login_required
 def my_scenarios_mining_view(request):
-    scenarios = ScenarioForMining.objects.filter(user=request.user).order_by('-scenario_input_time')
-    paginator = Paginator(scenarios, 10)  # Show 10 scenarios per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-
-    # Debugging outputs
-    print(f"Total scenarios for user {request.user.id}: {scenarios.count()}")
-    print(f"Page number requested: {page_number}")
-    print(f"Scenarios on this page: {[scenario.scenario_id for scenario in page_obj]}")
+    page_obj = listing_page(
+        ScenarioForMining, request.user, request.GET.get('page'),
+        input_preview=text_preview("scenario_input", 40),
+    )
 
     return render(request, 'solutions/my_scenarios_mining.html', {
         'page_obj': page_obj,
-        'total_scenarios': scenarios.count(),  # Total number of scenarios
+        'total_scenarios': page_obj.paginator.count,  # Total number of scenarios
     })
 
 
@@ -898,56 +842,62 @@ def get_social_network_graph_view(request):
 
 
 #For simulations
-def selected_actors_profiles(user, canonical_names):
+def individual_profile_traits(individual):
+    return {
+        "cognitive_pattern": individual.cognitive_pattern,
+        "affect_pattern": individual.affect_pattern,
+        "action_pattern": individual.action_pattern,
+        "personality": individual.personality,
+        "beliefs_values": individual.beliefs_values,
+        "priorities": individual.priorities,
+        "life_style": individual.life_style,
+        "identity": individual.identity,
+        "capabilities": individual.capabilities,
+        "family": individual.family,
+        "marriage_intimate_relationship": individual.marriage_intimate_relationship,
+        "education": individual.education,
+        "occupation_job_industry": individual.occupation_job_industry,
+        "social_economic_status": individual.social_economic_status,
+        "social_network": individual.social_network,
+        "biological_characteristics": individual.biological_characteristics,
+    }
+
+
+def group_profile_traits(group):
+    return {
+        "group_type": group.group_type,
+        "domain": group.domain,
+        "size": group.size,
+        "mission_vision_value": group.mission_vision_value,   
+        "goal_strategy": group.goal_strategy,    
+        "objectives_plan": group.objectives_plan,    
+        "governance": group.governance,   
+        "organizational_structure": group.organizational_structure,   
+        "operation_system": group.operation_system, 
+        "organizational_politics": group.organizational_politics,  
+        "influence": group.influence, 
+        "leadership": group.leading,
+        "culture": group.culture,    
+        "performance": group.performance,  
+        "challenge": group.challenge,   
+        "funding_resources_budget": group.funding_resources_budget,  
+    }
+
+
+async def selected_actors_profiles(user, canonical_names):
+    """Profiles of the selected actors, in selection order; two async queries for all of them."""
+    individuals, groups = {}, {}
+    async for individual in IndividualProfile.objects.filter(user=user, canonical_name__in=canonical_names).order_by("pk"):
+        individuals.setdefault(individual.canonical_name, individual)
+    async for group in GroupProfile.objects.filter(user=user, canonical_name__in=canonical_names).order_by("pk"):
+        groups.setdefault(group.canonical_name, group)
+
     profiles = []
     for name in canonical_names:
-        individual = IndividualProfile.objects.filter(user=user, canonical_name=name).first()
-        if individual:
-            profiles.append({
-                "canonical_name": name,
-                "traits": {
-                    "cognitive_pattern": individual.cognitive_pattern,
-                    "affect_pattern": individual.affect_pattern,
-                    "action_pattern": individual.action_pattern,
-                    "personality": individual.personality,
-                    "beliefs_values": individual.beliefs_values,
-                    "priorities": individual.priorities,
-                    "life_style": individual.life_style,
-                    "identity": individual.identity,
-                    "capabilities": individual.capabilities,
-                    "family": individual.family,
-                    "marriage_intimate_relationship": individual.marriage_intimate_relationship,
-                    "education": individual.education,
-                    "occupation_job_industry": individual.occupation_job_industry,
-                    "social_economic_status": individual.social_economic_status,
-                    "social_network": individual.social_network,
-                    "biological_characteristics": individual.biological_characteristics,
-                }
-            })
-        else:
-            group = GroupProfile.objects.filter(user=user, canonical_name=name).first()
-            if group:
-                profiles.append({
-                    "canonical_name": name,
-                    "traits": {
-                        "group_type": group.group_type,
-                        "domain": group.domain,
-                        "size": group.size,
-                        "mission_vision_value": group.mission_vision_value,   
-                        "goal_strategy": group.goal_strategy,    
-                        "objectives_plan": group.objectives_plan,    
-                        "governance": group.governance,   
-                        "organizational_structure": group.organizational_structure,   
-                        "operation_system": group.operation_system, 
-                        "organizational_politics": group.organizational_politics,  
-                        "influence": group.influence, 
-                        "leadership": group.leading,
-                        "culture": group.culture,    
-                        "performance": group.performance,  
-                        "challenge": group.challenge,   
-                        "funding_resources_budget": group.funding_resources_budget,  
-                    }
-                })
+        if name in individuals:
+            profiles.append({"canonical_name": name, "traits": individual_profile_traits(individuals[name])})
+        elif name in groups:
+            profiles.append({"canonical_name": name, "traits": group_profile_traits(groups[name])})
     return profiles
 
 
@@ -974,8 +924,10 @@ def selected_actors_relationship_statuses(user, canonical_names):
     return relations
 
 
+# The simulation views are async: under the ASGI server (tmbu.asgi, uvicorn workers) a request waiting on the
+# LLM holds no thread, so one worker serves many simulations at once. See manage.py benchmark_simulation_concurrency.
 @csrf_exempt
-def generate_simulation_view(request):
+async def generate_simulation_view(request):
     """
     Generate full simulation among selected actors for a given topic.
     """
@@ -999,27 +951,24 @@ def generate_simulation_view(request):
             )
 
         # Check login
-        if not request.user.is_authenticated:
+        user = await request.auser()
+        if not user.is_authenticated:
             return JsonResponse({"error": "Authentication required.", "redirect": reverse("login")}, status=401)
-
-        user = request.user
        
-        # Check subscription
-        subscription = UserSubscription.objects.filter(
-            user=user, subscription_status="active"
-        ).first()
-        if not subscription:
+        # Check subscription (cached per user, accounts.entitlement_utils)
+        entitlements = await aget_entitlements(user)
+        if not entitlements["subscribed"]:
             return JsonResponse(
                 {"error": "Subscription required.", "redirect": reverse("subscription_plan")},
                 status=402  # Payment Required
             )
 
         # Get traits + relationships
-        profiles = selected_actors_profiles(request.user, canonical_names)
-        relations = selected_actors_relationship_statuses(request.user, canonical_names)
+        profiles = await selected_actors_profiles(user, canonical_names)
+        relations = await sync_to_async(selected_actors_relationship_statuses)(user, canonical_names)
 
        
-        simulation = llm_generate_simulation(
+        simulation = await allm_generate_simulation(
             canonical_names=canonical_names,
             scenario=scenario,
             profiles=profiles,
@@ -1031,7 +980,7 @@ def generate_simulation_view(request):
             simulation["simulation"] = simulation["simulation"][:50]   # keep max 50
             
         
-        session = GeneratedSimulation.objects.create(
+        session = await GeneratedSimulation.objects.acreate(
             user=user,
             actors=canonical_names,
             scenario=scenario,
@@ -1051,7 +1000,7 @@ def generate_simulation_view(request):
 
 
 @csrf_exempt
-def live_simulation_view(request):
+async def live_simulation_view(request):
     """
     Live simulation: user plays one actor ("Me" or any other actor),
     LLM controls the others. Supports continuous turns.
@@ -1076,16 +1025,13 @@ def live_simulation_view(request):
             return JsonResponse({"error": "Message cannot be empty."}, status=400)
 
         # Check login
-        if not request.user.is_authenticated:
+        user = await request.auser()
+        if not user.is_authenticated:
             return JsonResponse({"error": "Authentication required.", "redirect": reverse("login")}, status=401)
 
-        user = request.user
-
-        # Check subscription
-        subscription = UserSubscription.objects.filter(
-            user=user, subscription_status="active"
-        ).first()
-        if not subscription:
+        # Check subscription (cached per user, accounts.entitlement_utils)
+        entitlements = await aget_entitlements(user)
+        if not entitlements["subscribed"]:
             return JsonResponse(
                 {"error": "Subscription required.", "redirect": reverse("subscription_plan")},
                 status=402  # Payment Required
@@ -1094,14 +1040,14 @@ def live_simulation_view(request):
         # --- start new session or continue existing ---
         if session_id:
             try:
-                session = LiveSimulation.objects.get(live_simulation_id=session_id, user=user)
+                session = await LiveSimulation.objects.aget(live_simulation_id=session_id, user=user)
             except LiveSimulation.DoesNotExist:
                 return JsonResponse({"error": "Invalid session ID."}, status=404)
         else:
-            profiles = selected_actors_profiles(request.user, canonical_names)
-            relations = selected_actors_relationship_statuses(request.user, canonical_names)
+            profiles = await selected_actors_profiles(user, canonical_names)
+            relations = await sync_to_async(selected_actors_relationship_statuses)(user, canonical_names)
 
-            session = LiveSimulation.objects.create(
+            session = await LiveSimulation.objects.acreate(
                 user=user,
                 actors=canonical_names,
                 scenario=scenario,
@@ -1119,7 +1065,7 @@ def live_simulation_view(request):
         history.append({"actor": user_actor, "type": "speech", "content": user_message})
 
         # --- call LLM ---
-        llm_response = llm_generate_live_simulation(
+        llm_response = await allm_generate_live_simulation(
             session=session,
             user_actor=user_actor,
             user_message=user_message,
@@ -1134,7 +1080,7 @@ def live_simulation_view(request):
         else:
             session.interactions.append({"actor": "Systems", "type": "error", "content": str(llm_response)})
 
-        session.save(update_fields=["interactions", "updated_at"])
+        await session.asave(update_fields=["interactions", "updated_at"])
 
         return JsonResponse({
             "session_id": session.live_simulation_id,
@@ -1148,31 +1094,15 @@ def live_simulation_view(request):
 
 @login_required
 def my_simulations_view(request):
-    generated = GeneratedSimulation.objects.filter(user=request.user).values(
-        "generated_simulation_id", "created_at", "scenario"
-    )
-    for g in generated:
-        g["id"] = g.pop("generated_simulation_id")
-        g["preview"] = g["scenario"]
-        g["type"] = "Generated"
-
-    live = LiveSimulation.objects.filter(user=request.user).values(
-        "live_simulation_id", "created_at", "scenario"
-    )
-    for l in live:
-        l["id"] = l.pop("live_simulation_id")
-        l["preview"] = l["scenario"]
-        l["type"] = "Live"
-
-    combined = sorted(list(generated) + list(live), key=lambda x: x["created_at"], reverse=True)
-
-    paginator = Paginator(combined, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page = simulation_history_page(request.user, before=request.GET.get("before"), after=request.GET.get("after"))
+    total_simulations, total_capped = count_simulations(request.user)
 
     return render(request, "solutions/my_simulations.html", {
-        "page_obj": page_obj,
-        "total_simulations": len(combined)
+        "simulations": page["simulations"],
+        "older_cursor": page["older_cursor"],
+        "newer_cursor": page["newer_cursor"],
+        "total_simulations": total_simulations,
+        "total_capped": total_capped,
     })
 
 def generated_simulation_detail(request, pk):
@@ -10,16 +10,22 @@ Unauthorized copying, distribution, or modification of this software is strictly
 
 # gunicorn.conf.py
 
+import os
 import multiprocessing
 
 # Bind to the development server's IP and port
 bind = "0.0.0.0:8000"
 
 # Number of worker processes: (2 * CPUs) + 1
-workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
 
-# Threads per worker: For handling concurrent requests
-threads = 2
+# Threads per worker: For handling concurrent requests. Each worker's database pool holds one connection per
+# thread (DB_POOL_MAX_SIZE), so workers * threads sizes the web tier's share of Postgres max_connections
+threads = int(os.getenv("GUNICORN_THREADS", 2))
+
+# Worker class: "uvicorn.workers.UvicornWorker" serves tmbu.asgi for the async views and the Server-Sent
+# Events push channel (app-async in docker-compose); the default serves tmbu.wsgi with threads
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
 
 # Timeout for worker processes (in seconds)
 timeout = 120
@@ -8,6 +8,9 @@ Unauthorized copying, distribution, or modification of this software is strictly
 
 
 import os
+import sys
+import json
+import multiprocessing
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import timedelta
@@ -25,6 +28,159 @@ DJANGO_SETTINGS_MODULE = os.getenv("DJANGO_SETTINGS_MODULE", "tmbu.settings")
 # LLM API
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Shared OpenAI rate limiter (requests and tokens per minute across web and Celery processes)
+OPENAI_RATE_LIMIT_BACKEND = os.getenv("OPENAI_RATE_LIMIT_BACKEND", "postgres")  # "postgres", "redis" or "off"
+OPENAI_RATE_LIMIT_REDIS_URL = os.getenv("OPENAI_RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+OPENAI_RATE_LIMIT_RPM = int(os.getenv("OPENAI_RATE_LIMIT_RPM", 500))
+OPENAI_RATE_LIMIT_TPM = int(os.getenv("OPENAI_RATE_LIMIT_TPM", 200000))
+OPENAI_RATE_LIMIT_MAX_WAIT = float(os.getenv("OPENAI_RATE_LIMIT_MAX_WAIT", 60))  # seconds a caller may queue
+OPENAI_RATE_LIMIT_RETRIES = int(os.getenv("OPENAI_RATE_LIMIT_RETRIES", 3))  # retries after a 429
+
+# Optional OpenAI-compatible endpoint, e.g. the local stand-in server (manage.py run_llm_stand_in_server)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Batch API mode for the non-interactive scenario mining tasks (actors, dynamics, needs, skills/resources, analysis).
+# Requests are queued, submitted as JSONL batches by Celery beat, and written back when the batch completes.
+OPENAI_BATCH_MODE = os.getenv("OPENAI_BATCH_MODE", "False").strip().lower() in ["true", "1"]
+OPENAI_BATCH_SUBMIT_INTERVAL = int(os.getenv("OPENAI_BATCH_SUBMIT_INTERVAL", 300))  # seconds between batch submissions
+OPENAI_BATCH_POLL_INTERVAL = int(os.getenv("OPENAI_BATCH_POLL_INTERVAL", 120))  # seconds between status polls
+OPENAI_BATCH_MAX_REQUESTS = int(os.getenv("OPENAI_BATCH_MAX_REQUESTS", 5000))  # requests per batch file
+OPENAI_BATCH_DISCOUNT = float(os.getenv("OPENAI_BATCH_DISCOUNT", 0.5))  # batch price as a share of the interactive price
+OPENAI_BATCH_MAX_ATTEMPTS = int(os.getenv("OPENAI_BATCH_MAX_ATTEMPTS", 2))  # batches a request may go unanswered in before it runs interactively
+
+# Scenario mining analysis engine: "separate" runs five LLM tasks, "consolidated" one structured completion
+SCENARIO_ANALYSIS_ENGINE = os.getenv("SCENARIO_ANALYSIS_ENGINE", "separate")
+
+# USD per 1M tokens, used for cost reports
+LLM_MODEL_PRICING = {
+    "gpt-4o-mini-2024-07-18": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4o-2024-08-06": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+}
+
+# Model routing per LLM helper. Each route lists size tiers in ascending order; the first tier whose
+# max_input_tokens covers the estimated prompt picks the model, max_tokens and timeout (seconds).
+# Helpers without a route use "default" (text) or "default_json" (JSON output).
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "True").strip().lower() in ["true", "1"]
+LLM_ROUTES = {
+    "default": [
+        {"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 600, "timeout": 60},
+    ],
+    "default_json": [
+        {"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 3000, "timeout": 120},
+    ],
+    "summarize_relationship_status": [
+        {"max_input_tokens": 1500, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 800, "timeout": 30},
+        {"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 3000, "timeout": 90},
+    ],
+    "aggregate_individual_traits": [
+        {"max_input_tokens": 4000, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 3000, "timeout": 90},
+        {"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 8000, "timeout": 240},
+    ],
+    "aggregate_group_traits": [
+        {"max_input_tokens": 4000, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 3000, "timeout": 90},
+        {"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 8000, "timeout": 240},
+    ],
+    "extract_info_from_scenario": [
+        {"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 4000, "timeout": 120},
+    ],
+    "llm_generate_live_simulation": [
+        {"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 1000, "timeout": 30},
+    ],
+    "judge_scenario_analysis": [
+        {"max_input_tokens": None, "model": "gpt-4o-mini-2024-07-18", "max_tokens": 300, "timeout": 60},
+    ],
+}
+# Optional JSON file with routes that replace the entries above, e.g. after running evaluate_llm_routes
+if os.getenv("LLM_ROUTES_FILE"):
+    with open(os.getenv("LLM_ROUTES_FILE"), encoding="utf-8") as routes_file:
+        LLM_ROUTES.update(json.load(routes_file))
+
+# Share of LLM prompts appended to a JSONL file, replayed offline by manage.py evaluate_llm_routes.
+# The file holds user scenario text, so keep it on the server and off by default.
+LLM_PROMPT_SAMPLE_PATH = os.getenv("LLM_PROMPT_SAMPLE_PATH") or None
+LLM_PROMPT_SAMPLE_RATE = float(os.getenv("LLM_PROMPT_SAMPLE_RATE", 0.05))
+
+# LLM fixtures for offline load testing. "record" appends every anonymized request/response pair to
+# LLM_FIXTURE_PATH (JSONL); replay them with manage.py run_llm_stand_in_server --fixtures <path>
+# and point OPENAI_BASE_URL at the stand-in.
+LLM_FIXTURE_MODE = os.getenv("LLM_FIXTURE_MODE", "off")  # "off" or "record"
+LLM_FIXTURE_PATH = os.getenv("LLM_FIXTURE_PATH") or None
+
+# LLM usage ledger (solutions.LLMUsageRecord), written in the background in batches
+LLM_USAGE_LEDGER_ENABLED = os.getenv("LLM_USAGE_LEDGER_ENABLED", "True").strip().lower() in ["true", "1"]
+LLM_USAGE_FLUSH_INTERVAL = float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", 5))  # seconds between writes
+LLM_USAGE_FLUSH_BATCH_SIZE = int(os.getenv("LLM_USAGE_FLUSH_BATCH_SIZE", 200))
+LLM_USAGE_BUFFER_SIZE = int(os.getenv("LLM_USAGE_BUFFER_SIZE", 10000))  # records kept in memory before dropping
+
+# How the factor advice and quick solution views build their Milvus queries: "llm" summary bullet points,
+# or "local" sentence/clause segmentation, which skips one LLM round-trip. Set per view, see manage.py compare_factor_query_modes.
+FACTOR_QUERY_MODE = os.getenv("FACTOR_QUERY_MODE", "llm")
+FACTOR_QUERY_MODES = {
+    "scenario_process": os.getenv("FACTOR_QUERY_MODE_SCENARIO_PROCESS", FACTOR_QUERY_MODE),
+    "scenario_quick_solution": os.getenv("FACTOR_QUERY_MODE_QUICK_SOLUTION", FACTOR_QUERY_MODE),
+}
+FACTOR_QUERY_MAX_SEGMENTS = int(os.getenv("FACTOR_QUERY_MAX_SEGMENTS", 12))  # queries per scenario in "local" mode
+
+# Cross-encoder re-ranking of the retrieved factors: FACTOR_RERANK_CANDIDATES Milvus hits per query are scored
+# on CPU and the best are kept within FACTOR_RERANK_TOKEN_BUDGET. Skipped under load; see manage.py evaluate_factor_rerank.
+FACTOR_RERANK_ENABLED = os.getenv("FACTOR_RERANK_ENABLED", "False").strip().lower() in ["true", "1"]
+FACTOR_RERANK_MODEL = os.getenv("FACTOR_RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")  # multilingual
+FACTOR_RERANK_CANDIDATES = int(os.getenv("FACTOR_RERANK_CANDIDATES", 8))  # Milvus hits per query
+FACTOR_RERANK_KEEP_PER_QUERY = int(os.getenv("FACTOR_RERANK_KEEP_PER_QUERY", 2))
+FACTOR_RERANK_TOKEN_BUDGET = int(os.getenv("FACTOR_RERANK_TOKEN_BUDGET", 1500))  # factor text tokens across all queries
+FACTOR_RERANK_BATCH_SIZE = int(os.getenv("FACTOR_RERANK_BATCH_SIZE", 32))
+FACTOR_RERANK_MAX_SECONDS = float(os.getenv("FACTOR_RERANK_MAX_SECONDS", 0.8))  # skip when the expected scoring time is longer
+FACTOR_RERANK_MAX_CONCURRENT = int(os.getenv("FACTOR_RERANK_MAX_CONCURRENT", 2))  # re-rankings running at once per process
+FACTOR_RERANK_MAX_LOAD = float(os.getenv("FACTOR_RERANK_MAX_LOAD", 0.85))  # 1-minute load average per CPU
+
+# Advice generation of the comprehensive and quick solution views and the info extraction of experience mining
+# run as Celery jobs (solutions.AdviceJob): the view returns at once and the page polls the job.
+# ADVICE_JOB_QUEUE routes them to their own workers, so interactive jobs never wait behind mining tasks.
+# See manage.py benchmark_advice_submissions.
+ADVICE_JOBS_ENABLED = os.getenv("ADVICE_JOBS_ENABLED", "True").strip().lower() in ["true", "1"]
+ADVICE_JOB_QUEUE = os.getenv("ADVICE_JOB_QUEUE") or None  # default Celery queue when unset
+ADVICE_JOB_STALE_SECONDS = int(os.getenv("ADVICE_JOB_STALE_SECONDS", 600))  # a job queued or running longer is failed
+
+# Push channel: Celery tasks publish per-user events (mining section done, advice job finished, social graph
+# rebuilt) that the pages receive over Server-Sent Events (solutions.event_stream_utils). The stream is served by
+# the ASGI app (app-async in docker-compose, nginx routes /events/ there); pages keep polling as a fallback.
+EVENT_STREAM_ENABLED = os.getenv("EVENT_STREAM_ENABLED", "False").strip().lower() in ["true", "1"]
+EVENT_STREAM_BACKEND = os.getenv("EVENT_STREAM_BACKEND", "postgres")  # "postgres" (LISTEN/NOTIFY), "redis" (pub/sub) or "memory" (one process: tests, runserver)
+EVENT_STREAM_REDIS_URL = os.getenv("EVENT_STREAM_REDIS_URL", "redis://localhost:6379/1")
+EVENT_STREAM_HEARTBEAT_SECONDS = int(os.getenv("EVENT_STREAM_HEARTBEAT_SECONDS", 15))  # keeps proxies from closing an idle stream
+EVENT_STREAM_MAX_SECONDS = int(os.getenv("EVENT_STREAM_MAX_SECONDS", 300))  # the browser reconnects after this
+
+# Per-request database query counts: the queries run and those the caches saved (sessions, entitlements,
+# solutions.cache_utils), logged and returned in an X-DB-Queries header. See solutions.request_stats_utils.
+REQUEST_STATS_ENABLED = os.getenv("REQUEST_STATS_ENABLED", "False").strip().lower() in ["true", "1"]
+REQUEST_STATS_SLOW_QUERY_COUNT = int(os.getenv("REQUEST_STATS_SLOW_QUERY_COUNT", 50))  # requests above this are logged as warnings
+
+# Speculative factor advice: after the first scenario submission a Celery task precomputes the factor advice,
+# and the second submission serves it when its input is (nearly) unchanged. See manage.py speculation_report.
+SPECULATIVE_FACTOR_ADVICE_ENABLED = os.getenv("SPECULATIVE_FACTOR_ADVICE_ENABLED", "True").strip().lower() in ["true", "1"]
+SPECULATIVE_FACTOR_ADVICE_MIN_SIMILARITY = float(os.getenv("SPECULATIVE_FACTOR_ADVICE_MIN_SIMILARITY", 0.97))  # difflib ratio of the two inputs
+SPECULATIVE_FACTOR_ADVICE_ABANDON_HOURS = int(os.getenv("SPECULATIVE_FACTOR_ADVICE_ABANDON_HOURS", 72))  # unused after this long counts as wasted
+
+# Coalescing of identical in-flight calls (quick solution, factor advice, social network graph).
+# "database" leases work across all gunicorn and Celery workers; "cache" needs a shared cache backend;
+# "local" only coalesces threads of one process.
+SINGLEFLIGHT_BACKEND = os.getenv("SINGLEFLIGHT_BACKEND", "database")  # "database", "cache", "local" or "off"
+SINGLEFLIGHT_LEASE_SECONDS = int(os.getenv("SINGLEFLIGHT_LEASE_SECONDS", 180))  # a leader running longer is taken over
+SINGLEFLIGHT_RESULT_TTL = int(os.getenv("SINGLEFLIGHT_RESULT_TTL", 10))  # seconds a finished result is reused by late duplicates
+SINGLEFLIGHT_WAIT_TIMEOUT = int(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", 240))  # a follower gives up waiting and runs the call
+SINGLEFLIGHT_POLL_INTERVAL = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", 0.5))
+
+# Token budgets for the user data embedded in prompts (profiles, relations, history).
+# Lowest-priority sections are trimmed first when a prompt exceeds its budget.
+PROMPT_TOKEN_BUDGETS = {
+    "default": 16000,
+    "aggregate_individual_traits": 24000,
+    "aggregate_group_traits": 24000,
+    "generate_global_actors_profiles": 20000,
+    "llm_generate_live_simulation": 12000,
+}
+PROMPT_MAX_FIELD_TOKENS = int(os.getenv("PROMPT_MAX_FIELD_TOKENS", 300))  # long fields are shortened before whole entries are dropped, except in sections saved back (profiles)
+
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY')
 
@@ -44,8 +200,49 @@ DEBUG = os.getenv('DJANGO_DEBUG', 'False').strip().lower() in ['true', '1']
  
 ALLOWED_HOSTS = [host.strip() for host in os.getenv("DJANGO_ALLOWED_HOSTS", "").split(",") if host.strip()]
 
-# Session backend (database, file, cache, or signed cookies)
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Caches (solutions.cache_utils). "default" is the shared tier every gunicorn and Celery process sees: sessions,
+# entitlements, singleflight. "local" is a per-process memory tier in front of it for hot values.
+# CACHE_BACKEND picks the shared tier: "redis" (needs the redis package), "db" (a table created by
+# manage.py createcachetable), "file" (one host only) or "locmem" (not shared: runserver and tests).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "db")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/2")
+CACHE_FILE_PATH = os.getenv("CACHE_FILE_PATH", "/tmp/tmbu_cache")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "tmbu")
+CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", 300))
+CACHE_LOCAL_TIMEOUT = int(os.getenv("CACHE_LOCAL_TIMEOUT", 30))  # short: the local tier is not invalidated across processes
+# Bounds of the db, file and locmem stand-ins (Redis evicts by its own maxmemory policy): past MAX_ENTRIES
+# a 1/CULL_FREQUENCY share of the entries is dropped
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 100000))
+CACHE_CULL_FREQUENCY = int(os.getenv("CACHE_CULL_FREQUENCY", 3))
+
+_SHARED_CACHE_BACKENDS = {
+    "redis": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_REDIS_URL},
+    "db": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "django_cache"},
+    "file": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": CACHE_FILE_PATH},
+    "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tmbu-shared"},
+}
+
+CACHES = {
+    "default": {
+        **_SHARED_CACHE_BACKENDS[CACHE_BACKEND],
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+        "TIMEOUT": CACHE_DEFAULT_TIMEOUT,
+        "OPTIONS": {} if CACHE_BACKEND == "redis" else {"MAX_ENTRIES": CACHE_MAX_ENTRIES, "CULL_FREQUENCY": CACHE_CULL_FREQUENCY},
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tmbu-local",
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+        "TIMEOUT": CACHE_LOCAL_TIMEOUT,
+        "OPTIONS": {"MAX_ENTRIES": 10000, "CULL_FREQUENCY": CACHE_CULL_FREQUENCY},
+    },
+}
+
+# Session backend (database, file, cache, or signed cookies). Cached database sessions: reads come from the
+# shared cache, writes go to both. The solutions backend is Django's cached_db that also counts the session
+# table reads the cache saved (solutions.request_stats_utils), none while CACHE_BACKEND is "db".
+SESSION_ENGINE = 'solutions.session_backend'
+SESSION_CACHE_ALIAS = "default"
 
 SESSION_COOKIE_HTTPONLY = True  # Default in Django
 SESSION_COOKIE_SECURE = True  # Enabled for production environments
@@ -135,11 +332,13 @@ SOCIALACCOUNT_ADAPTER = "accounts.adapters.CustomSocialAccountAdapter"
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'solutions.middleware.RequestStatsMiddleware',  # Counts DB queries run and saved by caches per request
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Enables language detection
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'solutions.middleware.LLMUsageContextMiddleware',  # Tags OpenAI calls with user and request id
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -177,6 +376,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'solutions.context_processors.event_stream',  # EVENT_STREAM_ENABLED for the page scripts
             ],
         },
     },
@@ -189,6 +389,43 @@ WSGI_APPLICATION = 'tmbu.wsgi.application'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
 
+# Database connections. Web processes borrow theirs from a psycopg pool per process and alias (Django's native
+# pool): a request holds a connection while it runs, and the pool caps what the process opens, also under ASGI
+# where every request runs its ORM calls in a thread of its own. Requests wait up to DB_POOL_TIMEOUT seconds for
+# a free connection (pool wait metrics: manage.py db_connection_status, db-connection-stats endpoint).
+# Prefork Celery processes run one task at a time and keep a persistent connection for DB_CONN_MAX_AGE seconds
+# instead (Celery closes obsolete ones around every task): a pool opened before the fork would be shared.
+# Every source of Postgres backends, summed by solutions.db_connection_utils.connection_budget():
+#   web      GUNICORN_WORKERS x GUNICORN_THREADS per alias (a thread holds at most one connection of each)
+#   async    GUNICORN_ASYNC_WORKERS x DB_ASYNC_POOL_MAX_SIZE per alias, plus one event stream listener each
+#   celery   CELERY_WORKER_CONCURRENCY per alias
+# The aliases are "default" and "ratelimit" (below).
+GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", 2))
+GUNICORN_ASYNC_WORKERS = int(os.getenv("GUNICORN_ASYNC_WORKERS", 2))  # of the app-async service (docker-compose)
+CELERY_WORKER_CONCURRENCY = int(os.getenv("CELERY_WORKER_CONCURRENCY", 4))
+_ASGI_WORKER = "uvicorn" in os.getenv("GUNICORN_WORKER_CLASS", "").lower()
+DB_PROCESS_ROLE = "celery" if "celery" in os.path.basename(sys.argv[0]) else "async" if _ASGI_WORKER else "web"
+DB_POOL_ENABLED = DB_PROCESS_ROLE != "celery" and os.getenv("DB_POOL_ENABLED", "True").strip().lower() in ["true", "1"]
+DB_ASYNC_POOL_MAX_SIZE = int(os.getenv("DB_ASYNC_POOL_MAX_SIZE", 10))  # async requests await OpenAI holding theirs
+DB_POOL_MAX_SIZE = DB_ASYNC_POOL_MAX_SIZE if _ASGI_WORKER else GUNICORN_THREADS
+DB_POOL_MIN_SIZE = min(int(os.getenv("DB_POOL_MIN_SIZE", 1)), DB_POOL_MAX_SIZE)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_CONN_MAX_AGE = 0 if DB_POOL_ENABLED else int(os.getenv("DB_CONN_MAX_AGE", 300))  # the pool keeps them instead
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 10))
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", f"tmbu-{DB_PROCESS_ROLE}")
+
+
+def _database_options(alias):
+    options = {
+        'application_name': DB_APPLICATION_NAME,  # tells web, async and Celery backends apart in pg_stat_activity
+        'connect_timeout': DB_CONNECT_TIMEOUT,
+    }
+    if DB_POOL_ENABLED:
+        options['pool'] = {'name': alias, 'min_size': DB_POOL_MIN_SIZE, 'max_size': DB_POOL_MAX_SIZE, 'timeout': DB_POOL_TIMEOUT}
+    return options
+
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -197,9 +434,20 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'),
         'PORT': os.getenv('POSTGRES_PORT'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,  # a kept or pooled connection is checked before a request or task reuses it
+        'OPTIONS': _database_options('default'),
     }
 }
 
+# Same database, separate connection: the OpenAI rate limiter and the singleflight leases commit
+# immediately, even when the calling view is inside transaction.atomic()
+DATABASES['ratelimit'] = {
+    **DATABASES['default'],
+    'OPTIONS': _database_options('ratelimit'),
+    'TEST': {'MIRROR': 'default'},
+}
+
 # Milvus connection settings
 #MILVUS_HOST = os.getenv('MILVUS_HOST', 'milvus-standalone')  # This is the service name defined in docker-compose
 #MILVUS_PORT_GRPC = os.getenv('MILVUS_PORT_GRPC', 19530)
@@ -209,6 +457,15 @@ MILVUS_MODE = os.getenv("MILVUS_MODE")
 MILVUS_URI = os.getenv("MILVUS_URI")
 MILVUS_TOKEN = os.getenv("MILVUS_TOKEN")
 
+# Knowledge base collections. With KB_LANGUAGE_PARTITIONING the factors live in a collection partitioned by
+# language (filled by manage.py migrate_kb_language_partitions) and searches only scan the query's language,
+# unless that language has fewer than KB_LANGUAGE_MIN_FACTORS factors. See manage.py benchmark_kb_language_routing.
+KB_COLLECTION_NAME = os.getenv("KB_COLLECTION_NAME", "kb_embeddings_collection")
+KB_PARTITIONED_COLLECTION_NAME = os.getenv("KB_PARTITIONED_COLLECTION_NAME", "kb_embeddings_by_language")
+KB_LANGUAGE_PARTITIONING = os.getenv("KB_LANGUAGE_PARTITIONING", "False").strip().lower() in ["true", "1"]
+KB_LANGUAGE_MIN_FACTORS = int(os.getenv("KB_LANGUAGE_MIN_FACTORS", 200))
+KB_LANGUAGE_COUNT_TTL = int(os.getenv("KB_LANGUAGE_COUNT_TTL", 600))  # seconds the per-language factor counts are cached
+
 # MINIO keys
 #MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
 #MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
@@ -250,6 +507,10 @@ STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
 STRIPE_PRICE_ID = os.getenv('STRIPE_PRICE_ID')
 
+# Subscription and free trial state of a user, cached by accounts.entitlement_utils on the shared cache.
+# Stripe webhooks and free use counts invalidate it; the expiry is a safety net.
+ENTITLEMENT_CACHE_SECONDS = int(os.getenv("ENTITLEMENT_CACHE_SECONDS", 60))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -310,6 +571,20 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Run with: celery -A tmbu beat (the celery-beat service of docker-compose)
+CELERY_BEAT_SCHEDULE = {}
+if OPENAI_BATCH_MODE:
+    CELERY_BEAT_SCHEDULE.update({
+        'submit-llm-batches': {
+            'task': 'solutions.tasks.submit_llm_batches_task',
+            'schedule': OPENAI_BATCH_SUBMIT_INTERVAL,
+        },
+        'poll-llm-batches': {
+            'task': 'solutions.tasks.poll_llm_batches_task',
+            'schedule': OPENAI_BATCH_POLL_INTERVAL,
+        },
+    })
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,